@@ -1,22 +1,98 @@
-from graph import graph
+import argparse
+from graph import graph, contract_review_graph
 from state import ProcurementState
+from utils.profiling import enable_profiling, PROFILE_DIR
+from utils.llm_gateway import gateway_metrics
+from utils.output_repair import repair_stats
+from utils.run_planner import plan_workflow, format_plan
+from utils.output_utils import save_markdown
+from utils.batch_mode import run_deferred
+from utils.deadline import format_deadline_report
 
 def main():
+    parser = argparse.ArgumentParser(description="Run the procurement workflow.")
+    parser.add_argument(
+        "--profile", nargs="?", const=PROFILE_DIR, default=None, metavar="DIR",
+        help=f"Capture cProfile, tracemalloc and collapsed-stack output per node (default dir: {PROFILE_DIR})",
+    )
+    parser.add_argument(
+        "--review-loop", action="store_true",
+        help="After the workflow, review and revise ./outputs/6.final_contract.md until it is Acceptable",
+    )
+    parser.add_argument("--max-review-iterations", type=int, default=None, metavar="N")
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Render every workflow prompt without calling the model and report tokens, cost, latency and context overflows",
+    )
+    parser.add_argument(
+        "--analysis", action="store_true",
+        help="After ingestion, write the supplier comparison (1.rfp_comparative_analysis.md) within the same run",
+    )
+    parser.add_argument(
+        "--deadline", type=float, default=None, metavar="SECONDS",
+        help="Run-level time budget: steps switch to cheaper strategies as it runs out and report per-node use",
+    )
+    parser.add_argument(
+        "--deferred", nargs="?", const="openai", default=None, choices=["openai", "local"],
+        help="Run the LLM steps as batch rounds (OpenAI Batch API, or 'local' stand-in) instead of live calls",
+    )
+    args = parser.parse_args()
+
+    if args.deferred:
+        print("\n📦 Running Procurement Workflow in deferred batch mode...\n")
+        result = run_deferred(backend=args.deferred)
+        print("\n✅ Deferred Run State:")
+        print(result)
+        return
+
+    if args.dry_run:
+        print("\n🧪 Planning Procurement Workflow (dry run, no model calls)...\n")
+        report = format_plan(plan_workflow())
+        print(report)
+        save_markdown(report, filename="dry_run_plan.md")
+        return
+
+    if args.profile:
+        enable_profiling(args.profile)
+
     print("\n🚀 Running Procurement Workflow...\n")
 
     # Initialize state with input directory
     state: ProcurementState = {
         "input_files": {"proposal_pdfs": "./data/proposals/"},  # Ensure this directory has PDFs
         "output_files": {},
-        "steps": {}
+        "steps": {},
+        "config": {},
     }
+    if args.max_review_iterations:
+        state["config"]["review_max_iterations"] = args.max_review_iterations
+    if args.deadline:
+        state["config"]["deadline_s"] = args.deadline
+    if args.analysis:
+        state["config"]["supplier_analysis"] = True
 
     # Invoke the graph
     result = graph.invoke(state)
 
+    if args.review_loop:
+        print("\n⚖️ Running Contract Review Loop...\n")
+        result = contract_review_graph.invoke(result)
+        for iteration in result.get("review_iterations", []):
+            print(iteration)
+
     # Display the final workflow state
     print("\n✅ Final Graph Execution State:")
     print(result)
 
+    if result.get("deadline"):
+        report = format_deadline_report(result["deadline"])
+        print(f"\n{report}")
+        save_markdown(report, filename="deadline_report.md")
+
+    print("\n📈 LLM Gateway Metrics:")
+    print(gateway_metrics())
+    print("\n🩹 Structured Output Repairs:")
+    print(repair_stats())
+
 if __name__ == "__main__":
     main()
@@ -1,17 +1,37 @@
 from langgraph.graph import StateGraph, START, END
 from state import ProcurementState
-from nodes import proposal_processor  # Importing the tool
+from nodes import proposal_processor, supplier_analysis, analysis_router, contract_review, contract_revision, review_loop_router  # Importing the tools
+from utils.profiling import profile_node
+from utils.deadline import deadline_node
 
 # ✅ Define graph with a meaningful name
 rfp_analysis_workflow = StateGraph(ProcurementState)
 
 rfp_analysis_workflow.add_edge(START, "ProposalProcessor")
 
-# ✅ Add ProposalProcessor node
-rfp_analysis_workflow.add_node("ProposalProcessor", proposal_processor)
+# ✅ Add ProposalProcessor node (profiled when utils.profiling.enable_profiling() is on)
+rfp_analysis_workflow.add_node("ProposalProcessor", profile_node("ProposalProcessor", deadline_node("ProposalProcessor", proposal_processor)))
 
-# ✅ Define edges (Link START → ProposalProcessor → END)
-rfp_analysis_workflow.add_edge("ProposalProcessor", END)
+# ✅ Optional first comparison under the same run deadline (START → ProposalProcessor → [SupplierAnalysis] → END)
+rfp_analysis_workflow.add_node("SupplierAnalysis", profile_node("SupplierAnalysis", deadline_node("SupplierAnalysis", supplier_analysis)))
+rfp_analysis_workflow.add_conditional_edges(
+    "ProposalProcessor", analysis_router, {"analyze": "SupplierAnalysis", "done": END}
+)
+rfp_analysis_workflow.add_edge("SupplierAnalysis", END)
 
 # ✅ Compile graph
 graph = rfp_analysis_workflow.compile()
+
+# ✅ Contract review ↔ revision cycle (START → ContractReview ⇄ ContractRevision → END)
+contract_review_workflow = StateGraph(ProcurementState)
+
+contract_review_workflow.add_edge(START, "ContractReview")
+contract_review_workflow.add_node("ContractReview", profile_node("ContractReview", deadline_node("ContractReview", contract_review)))
+contract_review_workflow.add_node("ContractRevision", profile_node("ContractRevision", deadline_node("ContractRevision", contract_revision)))
+
+contract_review_workflow.add_conditional_edges(
+    "ContractReview", review_loop_router, {"revise": "ContractRevision", "done": END}
+)
+contract_review_workflow.add_edge("ContractRevision", "ContractReview")
+
+contract_review_graph = contract_review_workflow.compile()
@@ -1,5 +1,13 @@
+import os
+import time
 from typing import Dict
 from tools.pdf_vectorizer import process_and_store_pdfs  # Importing the tool
+from utils.output_utils import save_markdown
+from utils.deadline import current_deadline, deadline_from_state
+from workflow import run_tool_step, save_step_output
+
+REVIEW_MAX_ITERATIONS = 3
+REVIEW_TIME_BUDGET_SECONDS = 900
 
 def proposal_processor(state: Dict) -> Dict:
     """
@@ -7,12 +15,164 @@ def proposal_processor(state: Dict) -> Dict:
     """
     pdf_dir = state["input_files"].get("proposal_pdfs", "./data/proposals/")
 
-    # Invoke the tool and check for errors
+    # Invoke the tool and record its outcome ("degraded" at the deadline, "empty" without PDFs to store)
     result = process_and_store_pdfs.invoke(pdf_dir)
+    state["steps"]["ProposalProcessor"] = "completed" if result["status"] == "success" else result["status"]
+
+    deadline = current_deadline()
+    if (state.get("config") or {}).get("supplier_analysis") and deadline and deadline.expired():
+        # ✅ Decided here so the skip is part of the node's state (see analysis_router)
+        state["steps"]["SupplierAnalysis"] = "skipped"
+        state["deadline"]["skipped"].append("SupplierAnalysis (deadline expired during ingestion)")
+
+    return state
+
+def supplier_analysis(state: Dict) -> Dict:
+    """
+    Node to write the first supplier comparison (./outputs/1.rfp_comparative_analysis.md) right after
+    ingestion. As a node it runs under the run deadline, so retrieval keeps fewer chunks per supplier
+    (utils.deadline.limit_chunks) when the budget runs low.
+    """
+    report = run_tool_step("tools.rfp_analyzer", "supplier_analysis_tool")
+    filename = save_step_output("SupplierAnalysis", report)
+    state["output_files"]["SupplierAnalysis"] = os.path.join("./outputs", filename)
+    state["steps"]["SupplierAnalysis"] = "completed"
+    return state
+
+def analysis_router(state: Dict) -> str:
+    """
+    Runs SupplierAnalysis after ingestion when state["config"]["supplier_analysis"] is set, ingestion stored
+    chunks (a degraded ingestion may have stored only some PDFs) and proposal_processor did not skip it for
+    the deadline.
+    """
+    requested = (state.get("config") or {}).get("supplier_analysis")
+    ingestion = state["steps"].get("ProposalProcessor")
+    skipped = state["steps"].get("SupplierAnalysis") == "skipped"
+    return "analyze" if requested and ingestion in ("completed", "degraded") and not skipped else "done"
+
+# ---------------------------------------------------------------------------
+# Contract review → revise loop
+# ---------------------------------------------------------------------------
+# The review tools (crewai) and the token callback (langchain-community) are imported inside the nodes, so
+# that building the graphs, and running plain ingestion, does not require them.
+
+def contract_review(state: Dict) -> Dict:
+    """
+    Node to review ./outputs/6.final_contract.md. The first pass is a section-level review;
+    after a revision only the diff introduced by that revision is re-reviewed. A contract whose previous
+    pass was blocked by the pre-check has never had an LLM review, so it gets the section-level one.
+    """
+    from langchain_community.callbacks import get_openai_callback
+    from tools.legal_review import (
+        load_document_map, review_sections, review_contract_diff, render_review_markdown,
+        run_precheck, precheck_review, merge_precheck_findings,
+    )
+    from tools.revise_contract import read_markdown_file, DOCUMENTS_DIR, REVIEW_FILE
+
+    iterations = state.setdefault("review_iterations", [])
+    contract_text, documents = load_document_map()
+    previous_path = state["output_files"].get("ContractRevisionPrevious")
+
+    iteration = {"iteration": len(iterations) + 1, "started_at": time.time()}
+    start = time.perf_counter()
+    precheck = run_precheck(contract_text)
+    with get_openai_callback() as cb:
+        if precheck["blocking"]:
+            # ✅ Mechanical issues (e.g. template placeholders) make a full LLM review pointless
+            review = precheck_review(precheck)
+            iteration["review_mode"] = "precheck"
+        elif iterations and previous_path and iterations[-1]["review_mode"] != "precheck":
+            previous_review = read_markdown_file(os.path.join(DOCUMENTS_DIR, REVIEW_FILE))
+            review = review_contract_diff(read_markdown_file(previous_path), contract_text, documents, previous_review)
+            iteration["review_mode"] = "diff"
+        else:
+            review, _ = review_sections(contract_text, documents)
+            iteration["review_mode"] = "sections"
 
-    if result["status"] == "success":
-        state["steps"]["ProposalProcessor"] = "completed"
+    if review is None:
+        # ✅ The revision did not change anything, so there is nothing left to converge on
+        iteration.update(verdict=iterations[-1]["verdict"], stalled=True)
     else:
-        state["steps"]["ProposalProcessor"] = "failed"
+        if not precheck["blocking"]:
+            review = merge_precheck_findings(review, precheck)
+        iteration["verdict"] = review["final_verdict"]
+        save_markdown(render_review_markdown(review), filename=REVIEW_FILE)
 
+    iteration.update(
+        review_seconds=round(time.perf_counter() - start, 3),
+        review_tokens=cb.total_tokens,
+        review_cost_usd=cb.total_cost,
+    )
+    iterations.append(iteration)
+    print(f"⚖️ Review iteration {iteration['iteration']} ({iteration['review_mode']}): {iteration['verdict']}")
+    # ✅ Decided here, not in the router, so that a revision skipped for the deadline is part of the node's state
+    iteration["next_step"] = next_review_step(state)
+
+    state["output_files"]["ContractReview"] = os.path.join(DOCUMENTS_DIR, REVIEW_FILE)
+    state["steps"]["ContractReview"] = "completed"
     return state
+
+def contract_revision(state: Dict) -> Dict:
+    """
+    Node to apply the latest review to the contract (patch mode with full-regeneration fallback).
+    The pre-revision contract is kept so the next review only has to look at the diff.
+    """
+    from langchain_community.callbacks import get_openai_callback
+    from tools.revise_contract import revise_contract_with_patches, read_markdown_file, DOCUMENTS_DIR, CONTRACT_FILE, REVIEW_FILE
+
+    iteration = state["review_iterations"][-1]
+    contract_text = read_markdown_file(os.path.join(DOCUMENTS_DIR, CONTRACT_FILE))
+    review_feedback = read_markdown_file(os.path.join(DOCUMENTS_DIR, REVIEW_FILE))
+
+    previous_file = f"6.final_contract.iter{iteration['iteration']}.md"
+    save_markdown(contract_text, filename=previous_file)
+
+    start = time.perf_counter()
+    with get_openai_callback() as cb:
+        revised_contract, info = revise_contract_with_patches(contract_text, review_feedback)
+    save_markdown(revised_contract, filename=CONTRACT_FILE)
+
+    iteration.update(
+        revision_mode=info["mode"],
+        revision_seconds=round(time.perf_counter() - start, 3),
+        revision_tokens=cb.total_tokens,
+        revision_cost_usd=cb.total_cost,
+    )
+
+    state["output_files"]["ContractRevisionPrevious"] = os.path.join(DOCUMENTS_DIR, previous_file)
+    state["output_files"]["ContractRevision"] = os.path.join(DOCUMENTS_DIR, CONTRACT_FILE)
+    state["steps"]["ContractRevision"] = "completed"
+    return state
+
+def next_review_step(state: Dict) -> str:
+    """
+    Decides whether to revise again after the latest review: stops once the verdict is Acceptable, the revision
+    stalled, the max-iterations / time budget (overridable via state["config"]) is used up, or the run deadline
+    is close. A revision skipped for the deadline is recorded in state["deadline"]["skipped"].
+    """
+    from tools.legal_review import verdict_rank
+
+    config = state.get("config") or {}
+    max_iterations = config.get("review_max_iterations", REVIEW_MAX_ITERATIONS)
+    time_budget = config.get("review_time_budget_seconds", REVIEW_TIME_BUDGET_SECONDS)
+
+    iterations = state["review_iterations"]
+    last = iterations[-1]
+    elapsed = time.time() - iterations[0]["started_at"]
+
+    if verdict_rank(last["verdict"]) == 0 or last.get("stalled"):
+        return "done"
+    if len(iterations) >= max_iterations or elapsed >= time_budget:
+        print(f"⏱ Review loop stopped after {len(iterations)} iteration(s) / {elapsed:.0f}s with verdict: {last['verdict']}")
+        return "done"
+    deadline = deadline_from_state(state)
+    if deadline and deadline.low():
+        # ✅ Another revise → review round is optional; keep the current contract and finish on time
+        state["deadline"]["skipped"].append(f"ContractRevision after iteration {len(iterations)} ({last['verdict']})")
+        print(f"⏱ Review loop stopped with {deadline.remaining():.0f}s left before the deadline, verdict: {last['verdict']}")
+        return "done"
+    return "revise"
+
+def review_loop_router(state: Dict) -> str:
+    """Routes on the decision contract_review recorded for the latest iteration (see next_review_step)."""
+    return state["review_iterations"][-1]["next_step"]
@@ -0,0 +1,222 @@
+"""
+Long-running workflow service: a local HTTP API in front of a persistent job queue.
+
+    python service.py --port 8080 --workers 1
+
+    POST /runs                          {"workflow": "procurement" | "contract_review", "review_loop": false,
+                                         "input_files": {...}, "config": {...}}  -> 202 {"job_id": ...}
+    GET  /runs                          recent jobs
+    GET  /runs/<job_id>                 status, timings, final state or error
+    GET  /runs/<job_id>/artifacts       output files recorded in the final state, and the job's archived files
+    GET  /runs/<job_id>/artifacts/<key> one output (state key or filename) as this job saved it
+    GET  /health                        queue counts, workers and LLM gateway metrics
+
+The compiled graphs, LLM clients and the vector store are created once at startup and shared by every run.
+Runs read and write the shared ./outputs directory, so jobs run one at a time (MAX_WORKERS).
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from graph import graph, contract_review_graph
+from utils.job_queue import JobQueue, JOB_QUEUE_PATH
+from utils.llm_gateway import gateway_metrics
+from utils.vector_store import get_vector_store
+from utils.artifact_store import get_artifact_store, start_run
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_WORKERS = 1
+MAX_WORKERS = 1  # Tools read their inputs from ./outputs, so two concurrent jobs would consume each other's files
+IDLE_POLL_SECONDS = 1.0
+DEFAULT_INPUT_FILES = {"proposal_pdfs": "./data/proposals/"}
+WORKFLOWS = ("procurement", "contract_review")
+
+
+def warm_up():
+    """
+    Imports every tool module (LLM clients, prompts, parsers) and opens the vector store before the first job.
+    Tools whose optional dependencies (e.g. crewai) are missing are skipped; their nodes import them lazily.
+    """
+    import importlib
+
+    started = time.perf_counter()
+    for module_name in ("tools.rfp_analyzer", "tools.legal_review", "tools.revise_contract",
+                        "tools.negotiation_email_writer", "tools.counter_offer_generator"):
+        try:
+            importlib.import_module(module_name)
+        except ModuleNotFoundError as e:
+            print(f"⚠️ Not preloading {module_name}: {e}")
+    print(f"📦 Vector store ready ({get_vector_store().count()} chunks)")
+    print(f"🔥 Warm-up finished in {time.perf_counter() - started:.1f}s")
+
+
+def run_job(job):
+    """Runs one queued workflow job and returns the final graph state."""
+    payload = job["payload"]
+    state = {
+        "input_files": payload.get("input_files") or dict(DEFAULT_INPUT_FILES),
+        "output_files": {},
+        "steps": {},
+        "config": payload.get("config") or {},
+    }
+    if job["kind"] == "contract_review":
+        return contract_review_graph.invoke(state)
+
+    result = graph.invoke(state)
+    if payload.get("review_loop"):
+        result = contract_review_graph.invoke(result)
+    return result
+
+
+class Worker(threading.Thread):
+    def __init__(self, queue, wake_event, name):
+        super().__init__(daemon=True, name=name)
+        self.queue = queue
+        self.wake_event = wake_event
+        self.current_job = None
+
+    def run(self):
+        while True:
+            job = self.queue.claim()
+            if job is None:
+                self.wake_event.wait(IDLE_POLL_SECONDS)
+                self.wake_event.clear()
+                continue
+            self.current_job = job["id"]
+            start_run(job["id"])  # ✅ The job's artifacts are archived under a manifest named after the job
+            print(f"▶️ [{self.name}] Running {job['kind']} job {job['id']}")
+            try:
+                self.queue.complete(job["id"], run_job(job))
+                print(f"✅ [{self.name}] Job {job['id']} succeeded")
+            except Exception as e:
+                traceback.print_exc()
+                self.queue.fail(job["id"], f"{type(e).__name__}: {e}")
+                print(f"❌ [{self.name}] Job {job['id']} failed: {e}")
+            finally:
+                self.current_job = None
+
+
+class WorkflowService:
+    def __init__(self, queue_path=JOB_QUEUE_PATH, workers=DEFAULT_WORKERS):
+        if not 1 <= workers <= MAX_WORKERS:
+            raise ValueError(f"workers must be between 1 and {MAX_WORKERS}: runs share ./outputs")
+        self.queue = JobQueue(queue_path)
+        self.wake_event = threading.Event()
+        self.workers = [Worker(self.queue, self.wake_event, f"worker-{i + 1}") for i in range(workers)]
+
+    def start(self):
+        requeued, failed = self.queue.requeue_interrupted()
+        if requeued:
+            print(f"↩️ Requeued {requeued} job(s) interrupted by the previous shutdown")
+        if failed:
+            print(f"❌ Failed {failed} job(s) interrupted too many times")
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, request):
+        if not isinstance(request, dict):
+            raise ValueError("Request body must be a JSON object")
+        workflow = request.get("workflow", "procurement")
+        if workflow not in WORKFLOWS:
+            raise ValueError(f"Unknown workflow '{workflow}', expected one of {', '.join(WORKFLOWS)}")
+        for key in ("input_files", "config"):
+            if not isinstance(request.get(key) or {}, dict):
+                raise ValueError(f"'{key}' must be a JSON object")
+        payload = {key: request[key] for key in ("input_files", "config", "review_loop") if key in request}
+        job_id = self.queue.enqueue(workflow, payload)
+        self.wake_event.set()
+        return job_id
+
+    def health(self):
+        return {
+            "queue": self.queue.counts(),
+            "workers": {worker.name: worker.current_job for worker in self.workers},
+            "llm_gateway": gateway_metrics(),
+        }
+
+
+def make_handler(service):
+    class ServiceHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload=None, body=None, content_type="application/json"):
+            data = body.encode("utf-8") if body is not None else json.dumps(payload, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/runs":
+                return self._reply(404, {"error": "Not found"})
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                job_id = service.submit(request)
+            except ValueError as e:  # Also covers malformed JSON
+                return self._reply(400, {"error": str(e)})
+            self._reply(202, {"job_id": job_id, "status_url": f"/runs/{job_id}"})
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path == "/health":
+                return self._reply(200, service.health())
+            if path == "/runs":
+                return self._reply(200, {"jobs": service.queue.list()})
+
+            match = re.fullmatch(r"/runs/([0-9a-f]+)(?:/artifacts(?:/([\w.-]+))?)?", path)
+            job = service.queue.get(match.group(1)) if match else None
+            if job is None:
+                return self._reply(404, {"error": "Not found"})
+
+            artifacts = ((job["result"] or {}).get("output_files") or {})
+            if not path.endswith("/artifacts") and match.group(2) is None:
+                return self._reply(200, job)
+            try:
+                archived = get_artifact_store().manifest(job["id"])["artifacts"]  # The worker archives under the job ID
+            except KeyError:  # The job saved nothing
+                archived = {}
+            if match.group(2) is None:
+                return self._reply(200, {"job_id": job["id"], "artifacts": artifacts, "archived": sorted(archived)})
+            # ✅ Served from this job's manifest: later jobs overwrite ./outputs, never the archived versions
+            key = match.group(2)
+            filename = os.path.basename(artifacts[key]) if key in artifacts else key
+            if filename not in archived:
+                return self._reply(404, {"error": f"No artifact '{key}' for job {job['id']}"})
+            content = get_artifact_store().load(filename, job["id"])
+            self._reply(200, body=content, content_type="text/markdown; charset=utf-8")
+
+        def log_message(self, format, *args):
+            print(f"🌐 {self.address_string()} {format % args}")
+
+    return ServiceHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the procurement workflow as a local HTTP service.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVICE_WORKERS", DEFAULT_WORKERS)), help=f"Concurrent workflow runs (at most {MAX_WORKERS})")
+    parser.add_argument("--queue", default=JOB_QUEUE_PATH, help="SQLite file holding the job queue")
+    args = parser.parse_args()
+    if not 1 <= args.workers <= MAX_WORKERS:
+        parser.error(f"--workers must be between 1 and {MAX_WORKERS}: runs share ./outputs")
+
+    warm_up()
+    service = WorkflowService(args.queue, args.workers)
+    service.start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"\n🚀 Workflow service listening on http://{args.host}:{args.port} with {args.workers} worker(s)\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down (running jobs will be requeued on next start)")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
-from typing import TypedDict, Dict
+from typing import TypedDict, Dict, List, Any
 
 class ProcurementState(TypedDict):
     input_files: Dict[str, str]  # Tracks {step_name: file_path}
     output_files: Dict[str, str]  # Tracks {step_name: output_file_path}
     steps: Dict[str, str]  # Tracks {step_name: status}, e.g., "completed" / "pending"
+    config: Dict[str, Any]  # Optional run settings, e.g. {"review_max_iterations": 3}
+    review_iterations: List[Dict[str, Any]]  # One entry per review → revise iteration (verdict, timings, tokens, cost)
+    deadline: Dict[str, Any]  # Run deadline (config["deadline_s"]) and per-node budget use, see utils.deadline
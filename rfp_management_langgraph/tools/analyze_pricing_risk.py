@@ -3,12 +3,13 @@ import os
 import json
 from collections import defaultdict
 from langchain.prompts import PromptTemplate
-from langchain.chat_models import ChatOpenAI
+from utils.llm_gateway import get_llm
 from langchain.output_parsers import StructuredOutputParser, ResponseSchema
+from utils.output_repair import repairing_parser
 from crewai.tools import tool
 
 # Initialize the LLM
-llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.7)
+llm = get_llm(temperature=0.7, step="pricing_risk")
 
 @tool
 def pricing_risk_analysis_tool():
@@ -125,7 +126,7 @@ def generate_pricing_risk_report(pricing_data: dict):
         partial_variables={"format_instructions": format_instructions}
     )
 
-    chain = prompt_template | llm | output_parser
+    chain = prompt_template | llm | repairing_parser(output_parser, "pricing_risk_report")
     risk_report = chain.invoke({"context": context})
     
     return risk_report["pricing_risk_report"]
\ No newline at end of file
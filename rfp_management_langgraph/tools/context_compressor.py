@@ -0,0 +1,139 @@
+import os
+import hashlib
+from langchain.prompts import PromptTemplate
+from utils.llm_gateway import get_llm
+from utils.token_utils import count_tokens, truncate_to_tokens
+from utils.run_planner import outputs_suppressed
+
+# Initialize LLM (low temperature: digests must stay faithful to the source)
+llm = get_llm(temperature=0.0, priority="bulk", step="document_digest")
+
+# ✅ Compression settings
+COMPRESS_CONTEXT = os.getenv("COMPRESS_CONTEXT", "false").lower() == "true"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+DIGEST_CACHE_DIR = "./outputs/.digest_cache/"
+DIGEST_VERSION = "v1"  # Bump when the digest prompts change to invalidate cached digests
+MAX_PARALLEL_DIGESTS = 4
+
+digest_prompt_template = PromptTemplate(
+    input_variables=["document_name", "target_tokens", "document"],
+    template="""
+    You are a **procurement analyst** preparing a briefing for contract drafting and legal review.
+
+    Condense the document below into a **factual digest of at most {target_tokens} tokens**.
+
+    **Keep verbatim wherever possible:**
+    - Supplier names, prices, fees, discounts, percentages and currency amounts.
+    - Contract terms, lock-in periods, renewal and termination conditions.
+    - SLA figures (uptime, response/resolution times, penalties) and compliance standards.
+    - Agreed negotiation positions, concessions and counteroffers.
+
+    **Drop:** greetings, repetition, generic commentary and formatting-only content.
+    Return markdown bullet points only.
+
+    **Document ({document_name}):**
+    ```markdown
+    {document}
+    ```
+    """
+)
+
+reduce_prompt_template = PromptTemplate(
+    input_variables=["target_tokens", "digests"],
+    template="""
+    You are a **procurement analyst**. Merge the document digests below into one briefing of
+    **at most {target_tokens} tokens**. Remove duplicated facts, keep every number, term and
+    negotiated position, and keep one `### <document>` heading per source document.
+
+    {digests}
+    """
+)
+
+digest_chain = digest_prompt_template | llm
+reduce_chain = reduce_prompt_template | llm
+
+
+def _content(message):
+    return message.content if hasattr(message, "content") else message
+
+
+def _cache_path(kind, *parts):
+    key = hashlib.sha256("\x00".join([DIGEST_VERSION, kind, *map(str, parts)]).encode("utf-8")).hexdigest()
+    return os.path.join(DIGEST_CACHE_DIR, f"{kind}_{key}.md")
+
+
+def _read_cache(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    return None
+
+
+def _write_cache(path, content):
+    if outputs_suppressed():
+        return
+    os.makedirs(DIGEST_CACHE_DIR, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def format_context(documents):
+    """Formats {doc: content} the same way the tools' load_documents() concatenates them."""
+    return "".join(f"\n### {doc}\n" + content + "\n\n" for doc, content in documents.items())
+
+
+def digest_documents(documents, target_tokens):
+    """
+    Map step: produces a digest of each document, reusing cached digests keyed by document hash.
+    Missing digests are generated in parallel. Returns {doc: digest}.
+    """
+    digests, pending = {}, []
+    for doc, content in documents.items():
+        path = _cache_path("digest", doc, target_tokens, content)
+        cached = _read_cache(path)
+        if cached is not None:
+            digests[doc] = cached
+        else:
+            pending.append((doc, content, path))
+
+    if pending:
+        print(f"🗜 Digesting {len(pending)} document(s) (cached: {len(digests)})...")
+        inputs = [
+            {"document_name": doc, "target_tokens": target_tokens, "document": content}
+            for doc, content, _ in pending
+        ]
+        results = digest_chain.batch(inputs, config={"max_concurrency": MAX_PARALLEL_DIGESTS})
+        for (doc, _, path), result in zip(pending, results):
+            digests[doc] = _content(result)
+            _write_cache(path, digests[doc])
+
+    return {doc: digests[doc] for doc in documents}
+
+
+def compress_documents(documents, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Map-reduce context compression. Documents that fit their share of the budget are kept verbatim,
+    larger ones are replaced by cached digests, and if the combined context still exceeds the budget
+    a reduce step merges the digests (truncating as a last resort). Returns the context string.
+    """
+    context = format_context(documents)
+    total_tokens = count_tokens(context)
+    if total_tokens <= token_budget or not documents:
+        return context
+
+    share = max(token_budget // len(documents), 1)
+    oversized = {doc: content for doc, content in documents.items() if count_tokens(content) > share}
+    digests = digest_documents(oversized, share)
+    compressed = {doc: digests.get(doc, content) for doc, content in documents.items()}
+
+    context = format_context(compressed)
+    if count_tokens(context) > token_budget:
+        path = _cache_path("reduce", token_budget, context)
+        reduced = _read_cache(path)
+        if reduced is None:
+            reduced = _content(reduce_chain.invoke({"target_tokens": token_budget, "digests": context}))
+            _write_cache(path, reduced)
+        context = truncate_to_tokens(reduced, token_budget)
+
+    print(f"🗜 Context compressed from {total_tokens} to {count_tokens(context)} tokens (budget {token_budget}).")
+    return context
@@ -1,13 +1,18 @@
 import os
 import json
 from langchain.prompts import PromptTemplate
-from langchain.chat_models import ChatOpenAI
+from utils.llm_gateway import get_llm
 from langchain.schema.runnable import RunnableLambda
 from langchain.output_parsers import StructuredOutputParser, ResponseSchema
+from utils.output_repair import repairing_parser
 from crewai.tools import tool
+from utils.profiling import memory_snapshot
+from utils.prompt_assembly import StablePrefixPrompt
+from utils.output_utils import load_markdown
+from tools.context_compressor import compress_documents, COMPRESS_CONTEXT, CONTEXT_TOKEN_BUDGET
 
 # Initialize LLM
-llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.5)
+llm = get_llm(temperature=0.5, step="contract_generation")
 
 # Define the file paths in ./outputs/
 DOCUMENTS_DIR = "./outputs/"
@@ -20,17 +25,22 @@ DOCUMENTS = [
     "5a.counteroffer_strategy.md",
 ]
 
-def load_documents():
-    """Reads and combines negotiation-related documents."""
-    context_data = ""
+def load_documents(compress=False, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Reads and combines negotiation-related documents.
+    With compress=True, documents are digested (map-reduce, cached by hash) to fit token_budget.
+    """
+    documents = {}
     for doc in DOCUMENTS:
-        file_path = os.path.join(DOCUMENTS_DIR, doc)
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                context_data += f"\n### {doc}\n" + f.read() + "\n\n"
+        content = load_markdown(os.path.join(DOCUMENTS_DIR, doc))
+        if content is not None:
+            documents[doc] = content
         else:
             print(f"⚠️ Warning: {doc} not found!")
-    return context_data
+
+    if compress:
+        return compress_documents(documents, token_budget)
+    return "".join(f"\n### {doc}\n" + content + "\n\n" for doc, content in documents.items())
 
 # Define structured output schema
 response_schemas = [
@@ -39,13 +49,11 @@ response_schemas = [
 output_parser = StructuredOutputParser.from_response_schemas(response_schemas)
 format_instructions = output_parser.get_format_instructions()
 
-# Define prompt for LLM
-prompt_template = PromptTemplate(
-    input_variables=["context"],
-    template="""
+# Define prompt for LLM: static instructions, template and format instructions first, negotiation data last
+CONTRACT_INSTRUCTIONS = """
     You are an AI-powered legal assistant specializing in contract drafting.
     
-    Based on the following negotiation data, generate a **comprehensive Master Service Agreement (MSA)**
+    Based on the negotiation data provided, generate a **comprehensive Master Service Agreement (MSA)**
     between the client and the supplier.
     
     Ensure the contract includes:
@@ -140,24 +148,29 @@ prompt_template = PromptTemplate(
     **Date:** ___________________
     ```
     
-    Now, generate a **fully detailed contract** using the above template while integrating the information provided below:
-    
+    Now, generate a **fully detailed contract** using the above template while integrating the negotiation data provided at the end of this prompt.
+"""
+
+contract_prompt = StablePrefixPrompt(
+    name="contract_generation",
+    static_parts=[CONTRACT_INSTRUCTIONS, format_instructions],
+    dynamic_template="""
     **Negotiation Data:**
     ```json
     {context}
     ```
-
-    {format_instructions}
     """,
-    partial_variables={"format_instructions": format_instructions}
+    input_variables=["context"],
 )
+prompt_template = contract_prompt.template
 
 # Create a chain
-chain = prompt_template | llm | output_parser
+chain = contract_prompt.chain(llm, repairing_parser(output_parser, "contract"))
 
 @tool
 def generate_contract():
     """Generates a structured contract using LLM and negotiation data."""
-    context = load_documents()
+    with memory_snapshot("prompt_construction.contract"):
+        context = load_documents(compress=COMPRESS_CONTEXT)
     contract = chain.invoke({"context": context})
     return contract["contract"]
@@ -0,0 +1,111 @@
+import re
+import time
+from crewai.tools import tool
+from utils.contract_sections import split_sections
+
+# ✅ Template placeholders left over from the contract_generator MSA template
+PLACEHOLDER_PATTERNS = [
+    re.compile(r"__\[[^\]\n]+\]__"),  # __[Supplier Name]__, __[Client Organization]__
+    re.compile(r"(?<!__)\[(?:Date|Supplier Name|Client Organization|State/Country Law|Insert[^\]\n]*|TBD|TBC)\]", re.IGNORECASE),
+    re.compile(r"\$\s?XX\b"),  # $XX per TB/month
+    re.compile(r"\bX\s?TB\b"),  # exceeds X TB/month
+]
+
+# ✅ Compliance standards that must be named in the contract
+COMPLIANCE_PATTERNS = {
+    "GDPR": re.compile(r"\bGDPR\b|General Data Protection Regulation", re.IGNORECASE),
+    "SOC2": re.compile(r"\bSOC\s?-?\s?2\b", re.IGNORECASE),
+    "ISO27001": re.compile(r"\bISO(?:/IEC)?\s?-?\s?27001\b", re.IGNORECASE),
+}
+
+# ✅ Clauses that must appear somewhere in the contract
+CLAUSE_PATTERNS = {
+    "price_protection": (re.compile(r"price[\s-]+protection|price\s+(?:cap|lock|freeze)|prices?\s+will\s+remain\s+fixed", re.IGNORECASE), "price-protection clause"),
+    "termination": (re.compile(r"\bterminat(?:e|ion)\b", re.IGNORECASE), "termination clause"),
+    "payment_terms": (re.compile(r"\bnet\s?\d+\b|payment\s+terms", re.IGNORECASE), "payment terms"),
+    "governing_law": (re.compile(r"governing\s+law|governed\s+by", re.IGNORECASE), "governing-law clause"),
+    "dispute_resolution": (re.compile(r"arbitration|mediation|dispute\s+resolution", re.IGNORECASE), "dispute-resolution clause"),
+}
+
+SLA_HEADING_RE = re.compile(r"service\s+level|\bSLAs?\b", re.IGNORECASE)
+SLA_COLUMN_RE = re.compile(r"uptime|availability|response|resolution|credit|penalt", re.IGNORECASE)
+TABLE_SEPARATOR_RE = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(?:\|\s*:?-{3,}:?\s*)*\|?\s*$")
+
+
+def parse_tables(markdown_text):
+    """Returns markdown tables as lists of rows (each row a list of cell strings, header first)."""
+    tables, block = [], []
+    for line in markdown_text.splitlines() + [""]:
+        if line.strip().startswith("|"):
+            block.append(line)
+            continue
+        if len(block) >= 2 and TABLE_SEPARATOR_RE.match(block[1]):
+            rows = [block[0]] + block[2:]
+            tables.append([[cell.strip() for cell in row.strip().strip("|").split("|")] for row in rows])
+        block = []
+    return tables
+
+
+def _issue(rule, severity, message, section=None):
+    return {"rule": rule, "severity": severity, "message": message, "section": section}
+
+
+def precheck_contract(contract_text):
+    """
+    Runs fast deterministic checks over the contract markdown: leftover template placeholders,
+    missing compliance standards, a missing SLA table and missing key clauses.
+    Returns {"issues": [...], "blocking": bool, "elapsed_ms": float}. Placeholders are blocking,
+    since an LLM review of an unfinished template is wasted. Severities are blocker, major and minor.
+    """
+    start = time.perf_counter()
+    issues = []
+
+    for section in split_sections(contract_text):
+        label = section["title"] or "Preamble"
+        found = sorted({match.group(0) for pattern in PLACEHOLDER_PATTERNS for match in pattern.finditer(section["text"])})
+        if found:
+            issues.append(_issue(
+                "placeholder", "blocker",
+                f"Template placeholders left unfilled: {', '.join(found)}", label,
+            ))
+
+    for standard, pattern in COMPLIANCE_PATTERNS.items():
+        if not pattern.search(contract_text):
+            issues.append(_issue("compliance", "major", f"No mention of {standard} compliance."))
+
+    # Keyword checks for clauses miss alternative wordings, so they are reported without affecting the verdict
+    for rule, (pattern, description) in CLAUSE_PATTERNS.items():
+        if not pattern.search(contract_text):
+            issues.append(_issue(rule, "minor", f"No {description} found."))
+
+    sla_sections = [s for s in split_sections(contract_text, max_level=3) if SLA_HEADING_RE.search(s["title"])]
+    sla_tables = [
+        table for table in parse_tables(contract_text)
+        if any(SLA_COLUMN_RE.search(cell) for cell in table[0]) and len(table) > 1
+    ]
+    if not sla_sections:
+        issues.append(_issue("sla_section", "major", "No Service Level Agreement section found."))
+    if not sla_tables:
+        issues.append(_issue("sla_table", "major", "No SLA table with uptime/response/penalty columns found."))
+
+    return {
+        "issues": issues,
+        "blocking": any(issue["severity"] == "blocker" for issue in issues),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def format_precheck_report(result):
+    """Renders precheck results as a markdown bullet list."""
+    if not result["issues"]:
+        return "- ✅ No mechanical issues found."
+    return "\n".join(
+        f"- **[{issue['severity'].upper()}]** {issue['message']}" + (f" _(section: {issue['section']})_" if issue["section"] else "")
+        for issue in result["issues"]
+    )
+
+
+@tool
+def precheck_contract_tool(contract_text: str):
+    """Runs deterministic (non-LLM) checks on a contract in markdown and returns the findings as markdown."""
+    return format_precheck_report(precheck_contract(contract_text))
@@ -1,19 +1,51 @@
 import os
-from langchain_community.chat_models import ChatOpenAI
+import hashlib
+from utils.llm_gateway import get_llm
 from langchain.prompts import PromptTemplate
 from crewai.tools import tool
-from rfp_management_crew.utils.output_utils import save_markdown
+from utils.output_utils import save_markdown, load_markdown
+from utils.run_planner import outputs_suppressed
+from tools.negotiation_email_writer import generate_supplier_emails, default_suppliers, supplier_excerpt
+from utils.contract_sections import slugify
 
 # ✅ Initialize LLM
-llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.7)
+llm = get_llm(temperature=0.7, step="counteroffer")
 
 def read_markdown_file(file_path):
     """Reads the contents of a markdown file."""
-    if not os.path.exists(file_path):
+    content = load_markdown(file_path)
+    if content is None:
         print(f"⚠️ Warning: {file_path} not found!")
         return ""
-    with open(file_path, "r", encoding="utf-8") as file:
-        return file.read()
+    return content
+
+COUNTEROFFER_INPUTS = [
+    "./outputs/1.rfp_comparative_analysis.md",
+    "./outputs/2.pricing_risk_analysis.md",
+    "./outputs/3.negotiation_charter.md",
+    "./outputs/4.negotiation_email.md",
+]
+COUNTEROFFER_FILE = "./outputs/5a.counteroffer_strategy.md"
+COUNTEROFFER_INPUTS_HASH_FILE = "./outputs/.5a.counteroffer_strategy.inputs.sha256"
+
+def counteroffer_inputs_hash():
+    """Hash of the documents the counteroffer strategy is derived from."""
+    digest = hashlib.sha256()
+    for path in COUNTEROFFER_INPUTS:
+        digest.update(path.encode("utf-8") + b"\x00" + read_markdown_file(path).encode("utf-8") + b"\x00")
+    return digest.hexdigest()
+
+def load_or_generate_counteroffers():
+    """
+    Reuses ./outputs/5a.counteroffer_strategy.md when its input documents are unchanged since it was
+    generated; otherwise regenerates it.
+    """
+    if os.path.exists(COUNTEROFFER_FILE) and os.path.exists(COUNTEROFFER_INPUTS_HASH_FILE):
+        with open(COUNTEROFFER_INPUTS_HASH_FILE, "r", encoding="utf-8") as f:
+            if f.read().strip() == counteroffer_inputs_hash():
+                print("✅ Reusing existing counteroffer strategy (inputs unchanged)")
+                return read_markdown_file(COUNTEROFFER_FILE)
+    return generate_counteroffers()
 
 
 def generate_counteroffers():
@@ -76,6 +108,9 @@ def generate_counteroffers():
     counteroffer_content = chain.invoke({"context": context})
     counteroffer_content = counteroffer_content.content if hasattr(counteroffer_content, "content") else counteroffer_content
     save_markdown(counteroffer_content, filename="5a.counteroffer_strategy.md")
+    if not outputs_suppressed():  # The strategy file was not rewritten, so its inputs hash must not be either
+        with open(COUNTEROFFER_INPUTS_HASH_FILE, "w", encoding="utf-8") as f:
+            f.write(counteroffer_inputs_hash())
     print("I am here")
     print("Saving Counter Offer strategy")
     return counteroffer_content
@@ -86,8 +121,8 @@ def generate_final_negotiation_email():
     CrewAI tool to generate the final supplier negotiation email incorporating counteroffers.
     """
     # ✅ Read input markdown files
-    counteroffers = generate_counteroffers()
-    negotiation_email = read_markdown_file("./outputs/negotiation_email.md")
+    counteroffers = load_or_generate_counteroffers()
+    negotiation_email = read_markdown_file("./outputs/4.negotiation_email.md")
     
     # ✅ Combine context for LLM
     context = f"""
@@ -130,3 +165,65 @@ def generate_final_negotiation_email():
     final_email_content = chain.invoke({"context": context})
     
     return final_email_content.content if hasattr(final_email_content, "content") else final_email_content
+
+# ✅ Shared instructions first, supplier-specific details last (same prefix for every supplier)
+supplier_final_prompt_template = PromptTemplate(
+    input_variables=["shared_context", "supplier", "supplier_context"],
+    template="""
+        You are a **Big 4 Consulting Director** responsible for supplier negotiations.
+        Based on the strategic counteroffers and this supplier's own negotiation history, generate a **final supplier negotiation email** that:
+        
+        - Acknowledges previous discussions and supplier response.
+        - Presents refined counteroffers in a persuasive and strategic manner.
+        - Maintains a **formal and professional tone**.
+        - Includes a **strong call to action** for finalizing terms.
+        
+        **Email Structure:**
+        - **Subject:** Refining Our Supplier Engagement – Final Negotiation Terms
+        - **Salutation**
+        - **Introduction**: Reference previous discussions and supplier engagement.
+        - **Revised Offer Details**: Present counteroffers with justification.
+        - **Final Call to Action**: Push for agreement or final negotiation round.
+        
+        Ensure the email is **concise, data-backed, and business-oriented**. Do not mention other suppliers by name.
+        
+        ---
+        **Strategic Counteroffers:**
+        {shared_context}
+        ---
+
+        **Supplier:** {supplier}
+
+        **Supplier-Specific Context:**
+        {supplier_context}
+        """
+)
+
+def generate_supplier_final_emails(suppliers=None):
+    """
+    Generates a final negotiation email per supplier concurrently, reusing the counteroffer strategy
+    when its inputs are unchanged. Each supplier's own initial email (4.negotiation_email.<supplier>.md)
+    is used when present. Returns {supplier: email}.
+    """
+    suppliers = suppliers or default_suppliers()
+    counteroffers = load_or_generate_counteroffers()
+    rfp_analysis = read_markdown_file("./outputs/1.rfp_comparative_analysis.md")
+
+    supplier_contexts = {}
+    for supplier in suppliers:
+        context = f"**RFP Findings:**\n{supplier_excerpt(rfp_analysis, supplier)}"
+        initial_email = load_markdown(f"4.negotiation_email.{slugify(supplier)}.md")
+        if initial_email is not None:
+            context += f"\n\n**Initial Negotiation Email:**\n{initial_email}"
+        supplier_contexts[supplier] = context
+
+    print(f"✉️ Generating final negotiation emails for {len(suppliers)} supplier(s)...")
+    return generate_supplier_emails(supplier_final_prompt_template, counteroffers, supplier_contexts, "5.counter_offer_email")
+
+@tool
+def generate_final_negotiation_emails_per_supplier():
+    """
+    CrewAI tool to generate tailored final negotiation emails for every shortlisted supplier concurrently.
+    """
+    emails = generate_supplier_final_emails()
+    return "\n\n---\n\n".join(f"## {supplier}\n\n{email}" for supplier, email in emails.items())
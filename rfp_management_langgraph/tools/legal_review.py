@@ -1,13 +1,23 @@
 import os
+import re
 import json
+import difflib
 from langchain.prompts import PromptTemplate
-from langchain.chat_models import ChatOpenAI
+from utils.llm_gateway import get_llm
 from langchain.schema.runnable import RunnableLambda
 from langchain.output_parsers import StructuredOutputParser, ResponseSchema
+from utils.output_repair import repairing_parser
 from crewai.tools import tool
+from utils.profiling import memory_snapshot
+from utils.run_planner import outputs_suppressed
+from utils.prompt_assembly import StablePrefixPrompt
+from utils.output_utils import load_markdown
+from utils.contract_sections import split_sections, hash_text
+from tools.contract_prechecker import precheck_contract
+from tools.context_compressor import compress_documents, COMPRESS_CONTEXT, CONTEXT_TOKEN_BUDGET
 
 # Initialize LLM
-llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.5)
+llm = get_llm(temperature=0.5, priority="interactive", step="contract_review")
 
 # Define document directory
 DOCUMENTS_DIR = "./outputs/"
@@ -21,26 +31,41 @@ DOCUMENTS = [
     "6.final_contract.md",  # The final contract to be reviewed
 ]
 
-def load_documents():
-    """Reads and combines all negotiation documents and the final contract."""
-    context_data = ""
+# Section-level (incremental) review settings
+SECTION_REVIEW_CACHE = os.path.join(DOCUMENTS_DIR, ".section_review_cache.json")
+MAX_PARALLEL_REVIEWS = 4
+SECTION_CONTEXT_CHARS = 6000  # Budget for the context slice sent with each section
+VERDICT_RANK = {"acceptable": 0, "minor fixes": 1, "major revisions": 2}
+
+def load_document_map():
+    """Reads all negotiation documents and the final contract. Returns (contract_text, {doc: content})."""
+    documents = {}
     contract_text = ""
 
     for doc in DOCUMENTS:
-        file_path = os.path.join(DOCUMENTS_DIR, doc)
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-                if "final_contract" in doc:
-                    contract_text = content  # Identify the final contract separately
-                else:
-                    context_data += f"\n### {doc}\n" + content + "\n\n"
+        content = load_markdown(os.path.join(DOCUMENTS_DIR, doc))
+        if content is not None:
+            if "final_contract" in doc:
+                contract_text = content  # Identify the final contract separately
+            else:
+                documents[doc] = content
         else:
             print(f"⚠️ Warning: {doc} not found!")
 
     if not contract_text:
         raise ValueError("❌ Error: Final contract document not found in ./outputs/!")
 
+    return contract_text, documents
+
+def load_documents(compress=False, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Reads and combines all negotiation documents and the final contract.
+    With compress=True, the negotiation documents are digested (map-reduce, cached by hash) to fit token_budget.
+    """
+    contract_text, documents = load_document_map()
+    if compress:
+        return contract_text, compress_documents(documents, token_budget)
+    context_data = "".join(f"\n### {doc}\n" + content + "\n\n" for doc, content in documents.items())
     return contract_text, context_data
 
 # Define structured output schema
@@ -52,15 +77,8 @@ response_schemas = [
 output_parser = StructuredOutputParser.from_response_schemas(response_schemas)
 format_instructions = output_parser.get_format_instructions()
 
-# Define prompt for LLM
-prompt_template = PromptTemplate(
-    input_variables=["contract", "context"],
-    template="""
-    You are an **AI-powered legal contract reviewer** specializing in procurement and supplier negotiations.
-    
-    Your task is to review the **final contract** and compare it against the provided **negotiation documents**.
-    Highlight any **deviations, missing clauses, risks, or non-compliance issues**.
-
+# ✅ Static review instructions (kept byte-identical across calls so provider prompt caching applies)
+REVIEW_CRITERIA = """
     ---
     ## **📌 Review Criteria:**
     - **Pricing & Payment Terms:** Ensure alignment with negotiated pricing & risk mitigation strategies.  
@@ -69,7 +87,22 @@ prompt_template = PromptTemplate(
     - **Regulatory Compliance:** Verify **GDPR, SOC2, ISO27001, and other obligations** are present.  
     - **Dispute Resolution:** Assess arbitration clauses for fairness & clarity.  
     - **Exit Clauses & Contract Flexibility:** Confirm renegotiation, termination, and renewal terms exist.  
+"""
 
+# Define prompt for LLM: instructions, criteria and format instructions first, documents last
+review_prompt = StablePrefixPrompt(
+    name="contract_review",
+    static_parts=[
+        """
+    You are an **AI-powered legal contract reviewer** specializing in procurement and supplier negotiations.
+    
+    Your task is to review the **final contract** and compare it against the provided **negotiation documents**.
+    Highlight any **deviations, missing clauses, risks, or non-compliance issues**.
+""",
+        REVIEW_CRITERIA,
+        format_instructions,
+    ],
+    dynamic_template="""
     ---
     ## **📜 Reference Negotiation Documents:**
     ```markdown
@@ -81,24 +114,18 @@ prompt_template = PromptTemplate(
     ```markdown
     {contract}
     ```
-
-    ---
-    {format_instructions}
     """,
-    partial_variables={"format_instructions": format_instructions}
+    input_variables=["contract", "context"],
 )
+prompt_template = review_prompt.template
 
 # Create a chain
-chain = prompt_template | llm | output_parser
-
-@tool
-def review_contract():
-    """Runs the contract review process using LLM."""
-    contract_text, context = load_documents()
-    review = chain.invoke({"contract": contract_text, "context": context})
+chain = review_prompt.chain(llm, repairing_parser(output_parser, "contract_review"))
 
+def render_review_markdown(review):
+    """Renders a review dict (key_deviations, recommended_corrections, final_verdict) as the review report."""
     # ✅ Generate Markdown output with correct formatting
-    markdown_output = f"""\
+    return f"""\
 # 📄 Contract Review Report
 
 ## 🔍 Key Deviations Identified
@@ -111,12 +138,272 @@ def review_contract():
 **{review["final_verdict"]}**
     """
 
-    return markdown_output
+def precheck_review(precheck):
+    """Turns blocking precheck results into a review dict, used instead of an LLM review."""
+    messages = [issue["message"] + (f" (section: {issue['section']})" if issue["section"] else "") for issue in precheck["issues"]]
+    return {
+        "key_deviations": "\n".join(messages),
+        "recommended_corrections": "\n".join(f"Resolve: {message}" for message in messages),
+        "final_verdict": "Major Revisions",
+    }
+
+def merge_precheck_findings(review, precheck):
+    """
+    Adds non-blocking deterministic findings to an LLM review. Major findings (e.g. a missing compliance
+    standard) raise the verdict to Major Revisions; minor ones are only reported and the LLM verdict stands.
+    """
+    if not precheck["issues"]:
+        return review
+    merged = dict(review)
+    deviations = format_as_list(review["key_deviations"])
+    extra = [f"[Pre-check] {issue['message']}" for issue in precheck["issues"] if issue["message"] not in deviations]
+    merged["key_deviations"] = "\n".join([deviations, *extra])
+    if any(issue["severity"] in ("blocker", "major") for issue in precheck["issues"]):
+        merged["final_verdict"] = worst_verdict([review["final_verdict"], "Major Revisions"])
+    return merged
+
+def run_precheck(contract_text):
+    """Runs the deterministic pre-checker and reports whether the LLM review can be skipped."""
+    precheck = precheck_contract(contract_text)
+    print(f"🧪 Pre-check found {len(precheck['issues'])} issue(s) in {precheck['elapsed_ms']} ms")
+    if precheck["blocking"]:
+        print("⛔ Contract still contains template placeholders, skipping LLM review.")
+    return precheck
+
+@tool
+def review_contract():
+    """Runs the contract review process using LLM."""
+    with memory_snapshot("prompt_construction.review"):
+        contract_text, context = load_documents(compress=COMPRESS_CONTEXT)
+
+    precheck = run_precheck(contract_text)
+    if precheck["blocking"]:
+        return render_review_markdown(precheck_review(precheck))
+
+    review = chain.invoke({"contract": contract_text, "context": context})
+
+    return render_review_markdown(merge_precheck_findings(review, precheck))
 
 def format_as_list(text):
     """Ensures that LLM-generated text is properly formatted into markdown bullet points or numbered lists."""
+    if isinstance(text, list):
+        text = "\n".join(str(item) for item in text)
     formatted_text = "\n".join(
         f"- {line.strip()}" if not line.strip().startswith(("*", "-", "•")) else line.strip()
         for line in text.split("\n") if line.strip()
     )
     return formatted_text
+
+# ---------------------------------------------------------------------------
+# Section-level incremental review
+# ---------------------------------------------------------------------------
+
+section_review_prompt = StablePrefixPrompt(
+    name="contract_section_review",
+    static_parts=[
+        """
+    You are an **AI-powered legal contract reviewer** specializing in procurement and supplier negotiations.
+
+    You are reviewing **one section** of a final contract. Compare it against the excerpts of the
+    negotiation documents provided and report only issues that concern this section
+    (deviations, missing terms, risks, or non-compliance). If the section is fine, say so.
+""",
+        REVIEW_CRITERIA,
+        format_instructions,
+    ],
+    dynamic_template="""
+    ---
+    ## **📜 Relevant Negotiation Document Excerpts:**
+    ```markdown
+    {context}
+    ```
+
+    ---
+    ## **📝 Contract Section: {section_title}**
+    ```markdown
+    {section}
+    ```
+    """,
+    input_variables=["section_title", "section", "context"],
+)
+
+section_chain = section_review_prompt.chain(llm, repairing_parser(output_parser, "section_review"))
+
+def _terms(text):
+    """Lower-cased content words used to match contract sections to context excerpts."""
+    return {word for word in re.findall(r"[a-z0-9]{4,}", text.lower())}
+
+def select_relevant_context(section_text, documents, max_chars=SECTION_CONTEXT_CHARS):
+    """
+    Picks the negotiation document paragraphs that share the most terms with a contract section,
+    up to max_chars, so each section is reviewed against its own slice of context.
+    """
+    section_terms = _terms(section_text)
+    scored = []
+    for doc, content in documents.items():
+        for paragraph in re.split(r"\n\s*\n", content):
+            overlap = len(section_terms & _terms(paragraph))
+            if overlap:
+                scored.append((overlap, doc, paragraph.strip()))
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    excerpts, used = [], 0
+    for _, doc, paragraph in scored:
+        if used + len(paragraph) > max_chars:
+            continue
+        excerpts.append(f"[{doc}]\n{paragraph}")
+        used += len(paragraph)
+    return "\n\n".join(excerpts)
+
+def load_section_cache():
+    if not os.path.exists(SECTION_REVIEW_CACHE):
+        return {}
+    with open(SECTION_REVIEW_CACHE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_section_cache(cache):
+    if outputs_suppressed():
+        return
+    os.makedirs(os.path.dirname(SECTION_REVIEW_CACHE), exist_ok=True)
+    with open(SECTION_REVIEW_CACHE, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+
+def verdict_rank(verdict):
+    """Severity of a verdict: 0 = Acceptable, 1 = Minor Fixes, 2 = Major Revisions (unknown counts as 1)."""
+    lowered = str(verdict).lower()
+    return max((rank for label, rank in VERDICT_RANK.items() if label in lowered), default=1)
+
+def worst_verdict(verdicts):
+    """Returns the most severe of the given verdicts (Major Revisions > Minor Fixes > Acceptable)."""
+    return max(verdicts, key=verdict_rank) if verdicts else "Acceptable"
+
+def merge_section_reviews(sections, reviews):
+    """Merges per-section reviews into the single key_deviations / recommended_corrections / final_verdict shape."""
+    deviations, corrections, verdicts = [], [], []
+    for section in sections:
+        review = reviews[section["id"]]
+        label = section["title"] or "Preamble"
+        verdicts.append(review["final_verdict"])
+        for key, target in (("key_deviations", deviations), ("recommended_corrections", corrections)):
+            text = format_as_list(review[key])
+            target.extend(f"- **[{label}]** {line.lstrip('-*• ').strip()}" for line in text.split("\n") if line.strip())
+
+    return {
+        "key_deviations": "\n".join(deviations) or "- No deviations identified.",
+        "recommended_corrections": "\n".join(corrections) or "- No corrections required.",
+        "final_verdict": worst_verdict(verdicts),
+    }
+
+def review_sections(contract_text, documents, max_concurrency=MAX_PARALLEL_REVIEWS):
+    """
+    Reviews a contract section by section. Sections whose text and context slice are unchanged since the
+    last run are served from the cache; the rest are reviewed in parallel. Returns (merged_review, stats).
+    """
+    sections = split_sections(contract_text)
+    cache = load_section_cache()
+
+    reviews, pending, live_keys = {}, [], set()
+    for section in sections:
+        context = select_relevant_context(section["text"], documents)
+        cache_key = hash_text(section["hash"] + hash_text(context))
+        live_keys.add(cache_key)
+        if cache_key in cache:
+            reviews[section["id"]] = cache[cache_key]
+        else:
+            pending.append((section, context, cache_key))
+
+    if pending:
+        print(f"🔍 Reviewing {len(pending)}/{len(sections)} new or changed sections...")
+        inputs = [
+            {"section_title": section["title"] or "Preamble", "section": section["text"], "context": context}
+            for section, context, _ in pending
+        ]
+        results = section_chain.batch(inputs, config={"max_concurrency": max_concurrency})
+        for (section, _, cache_key), review in zip(pending, results):
+            reviews[section["id"]] = review
+            cache[cache_key] = review
+    else:
+        print("✅ All contract sections unchanged since last review, reusing cached findings.")
+
+    # ✅ Keep only entries for sections that still exist
+    save_section_cache({key: value for key, value in cache.items() if key in live_keys})
+
+    stats = {"sections": len(sections), "reviewed": len(pending), "cached": len(sections) - len(pending)}
+    return merge_section_reviews(sections, reviews), stats
+
+@tool
+def review_contract_by_section():
+    """Runs an incremental, section-level contract review: only new or changed sections are sent to the LLM."""
+    with memory_snapshot("prompt_construction.section_review"):
+        contract_text, documents = load_document_map()
+
+    precheck = run_precheck(contract_text)
+    if precheck["blocking"]:
+        return render_review_markdown(precheck_review(precheck))
+
+    review, _ = review_sections(contract_text, documents)
+    return render_review_markdown(merge_precheck_findings(review, precheck))
+
+# ---------------------------------------------------------------------------
+# Diff-only re-review (used by the review -> revise loop)
+# ---------------------------------------------------------------------------
+
+diff_review_prompt = StablePrefixPrompt(
+    name="contract_diff_review",
+    static_parts=[
+        """
+    You are an **AI-powered legal contract reviewer** specializing in procurement and supplier negotiations.
+
+    The contract was revised to address a previous review. You are given the **previous review findings**
+    and the **unified diff of the revision**. Examine **only the changes**:
+    - Decide which previous findings are now resolved and which remain open.
+    - Flag any **new deviations, risks, or non-compliance** introduced by the changed lines.
+    - Do not raise issues about unchanged text unless they are still-open previous findings.
+""",
+        format_instructions,
+    ],
+    dynamic_template="""
+    ---
+    ## **🗂 Previous Review Findings:**
+    ```markdown
+    {previous_review}
+    ```
+
+    ---
+    ## **📜 Relevant Negotiation Document Excerpts:**
+    ```markdown
+    {context}
+    ```
+
+    ---
+    ## **✏️ Revision Diff:**
+    ```diff
+    {diff}
+    ```
+    """,
+    input_variables=["previous_review", "diff", "context"],
+)
+
+diff_chain = diff_review_prompt.chain(llm, repairing_parser(output_parser, "diff_review"))
+
+def contract_diff(previous_contract, contract_text):
+    """Unified diff between two contract versions (empty string when identical)."""
+    return "".join(difflib.unified_diff(
+        previous_contract.splitlines(keepends=True),
+        contract_text.splitlines(keepends=True),
+        fromfile="before", tofile="after", n=2,
+    ))
+
+def review_contract_diff(previous_contract, contract_text, documents, previous_review):
+    """
+    Re-reviews a revised contract by sending only the revision diff and the previous findings to the LLM.
+    Returns the review dict, or None when the contract did not change.
+    """
+    diff = contract_diff(previous_contract, contract_text)
+    if not diff:
+        return None
+    return diff_chain.invoke({
+        "previous_review": previous_review,
+        "diff": diff,
+        "context": select_relevant_context(diff, documents),
+    })
@@ -1,18 +1,21 @@
 import os
-from langchain_community.chat_models import ChatOpenAI
+import re
+from utils.llm_gateway import get_llm
 from langchain.prompts import PromptTemplate
 from crewai.tools import tool
+from utils.contract_sections import slugify
+from utils.output_utils import save_markdown, load_markdown
 
 # ✅ Initialize LLM
-llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.7)
+llm = get_llm(temperature=0.7, step="negotiation_email")
 
 def read_markdown_file(file_path):
     """Reads the contents of a markdown file."""
-    if not os.path.exists(file_path):
+    content = load_markdown(file_path)
+    if content is None:
         print(f"⚠️ Warning: {file_path} not found!")
         return ""
-    with open(file_path, "r", encoding="utf-8") as file:
-        return file.read()
+    return content
 
 @tool
 def generate_negotiation_email():
@@ -64,3 +67,106 @@ def generate_negotiation_email():
     email_content = chain.invoke({"context": context})
     
     return email_content.content if hasattr(email_content, "content") else email_content
+
+# ---------------------------------------------------------------------------
+# Per-supplier emails
+# ---------------------------------------------------------------------------
+
+MAX_PARALLEL_EMAILS = 5
+SUPPLIER_EXCERPT_CHARS = 4000
+
+# ✅ Static instructions and shared context come first so every supplier's prompt shares the same prefix
+supplier_prompt_template = PromptTemplate(
+    input_variables=["shared_context", "supplier", "supplier_context"],
+    template="""
+        You are a **Big 4 Consulting Director** crafting supplier negotiation emails.
+        Using the shared analysis and the supplier-specific findings, write a **highly professional and strategic email**
+        addressed to the named supplier only.
+
+        **Email Structure:**
+        - **Subject:** Strategic Supplier Engagement: Key Negotiation Points & Next Steps
+        - **Salutation**
+        - **Introduction (Concise, Impactful)**: Reference this supplier's proposal & evaluation.
+        - **Key Findings from Supplier Evaluation**: Pricing competitiveness, risk factors, unique value proposition.
+        - **Areas for Negotiation**: Price adjustments, contract flexibility, SLA enhancements, additional value adds.
+        - **Call to Action (CTA)**: Request supplier response & meeting scheduling.
+
+        Ensure the email is clear, persuasive, and maintains a **formal tone**.
+        Do not mention other suppliers by name.
+
+        ---
+        **Shared Analysis:**
+        {shared_context}
+        ---
+
+        **Supplier:** {supplier}
+
+        **Supplier-Specific Findings:**
+        {supplier_context}
+        """
+)
+
+def supplier_excerpt(text, supplier, max_chars=SUPPLIER_EXCERPT_CHARS):
+    """Returns the paragraphs and table rows of a markdown document that mention the supplier."""
+    pattern = re.compile(re.escape(supplier), re.IGNORECASE)
+    excerpts = [
+        block.strip() for block in re.split(r"\n\s*\n", text) if pattern.search(block)
+    ]
+    return "\n\n".join(excerpts)[:max_chars] or "No supplier-specific findings available."
+
+def default_suppliers():
+    """Suppliers stored in the proposal vector store (imported lazily to avoid opening the store on import)."""
+    from tools.rfp_analyzer import get_unique_suppliers
+    return sorted(get_unique_suppliers())
+
+def generate_supplier_emails(prompt_template, shared_context, supplier_contexts, filename_prefix):
+    """
+    Generates one email per supplier concurrently; every prompt shares the same context prefix and only
+    the trailing supplier section differs. supplier_contexts maps supplier -> supplier-specific context.
+    Returns {supplier: email}; each is saved to ./outputs/<filename_prefix>.<supplier>.md.
+    """
+    suppliers = list(supplier_contexts)
+    inputs = [
+        {"shared_context": shared_context, "supplier": supplier, "supplier_context": supplier_contexts[supplier]}
+        for supplier in suppliers
+    ]
+    chain = prompt_template | llm
+    results = chain.batch(inputs, config={"max_concurrency": MAX_PARALLEL_EMAILS})
+
+    emails = {}
+    for supplier, result in zip(suppliers, results):
+        emails[supplier] = result.content if hasattr(result, "content") else result
+        save_markdown(emails[supplier], filename=f"{filename_prefix}.{slugify(supplier)}.md")
+    return emails
+
+def generate_supplier_negotiation_emails(suppliers=None):
+    """
+    Generates a tailored negotiation email for every supplier in parallel.
+    Returns {supplier: email}; each email is also saved to ./outputs/4.negotiation_email.<supplier>.md.
+    """
+    suppliers = suppliers or default_suppliers()
+
+    # ✅ Read input markdown files once for all suppliers
+    rfp_analysis = read_markdown_file("./outputs/1.rfp_comparative_analysis.md")
+    pricing_risk = read_markdown_file("./outputs/2.pricing_risk_analysis.md")
+    negotiation_charter = read_markdown_file("./outputs/3.negotiation_charter.md")
+
+    shared_context = f"""
+        **Pricing Risk Analysis:**
+        {pricing_risk}
+
+        **Negotiation Charter:**
+        {negotiation_charter}
+        """
+
+    print(f"✉️ Generating negotiation emails for {len(suppliers)} supplier(s)...")
+    supplier_contexts = {supplier: supplier_excerpt(rfp_analysis, supplier) for supplier in suppliers}
+    return generate_supplier_emails(supplier_prompt_template, shared_context, supplier_contexts, "4.negotiation_email")
+
+@tool
+def generate_negotiation_emails_per_supplier():
+    """
+    CrewAI tool to generate tailored negotiation emails for every shortlisted supplier concurrently.
+    """
+    emails = generate_supplier_negotiation_emails()
+    return "\n\n---\n\n".join(f"## {supplier}\n\n{email}" for supplier, email in emails.items())
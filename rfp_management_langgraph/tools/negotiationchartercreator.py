@@ -3,12 +3,13 @@ import os
 import json
 from collections import defaultdict
 from langchain.prompts import PromptTemplate
-from langchain.chat_models import ChatOpenAI
+from utils.llm_gateway import get_llm
 from langchain.output_parsers import StructuredOutputParser, ResponseSchema
+from utils.output_repair import repairing_parser
 from crewai.tools import tool
 
 # Initialize the LLM
-llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.7)
+llm = get_llm(temperature=0.7, step="negotiation_charter")
 
 @tool
 def negotiation_charter_creator_tool():
@@ -106,7 +107,7 @@ def generate_price_forecast_langchain(historical_data: dict):
         partial_variables={"format_instructions": format_instructions}
     )
 
-    chain = prompt_template | llm | output_parser
+    chain = prompt_template | llm | repairing_parser(output_parser, "price_forecast")
     forecast_data = chain.invoke({"context": context})
 
     return forecast_data
@@ -177,7 +178,7 @@ def generate_negotiation_charter(price_forecast: dict):
         partial_variables={"format_instructions": format_instructions}
     )
 
-    chain = prompt_template | llm | output_parser
+    chain = prompt_template | llm | repairing_parser(output_parser, "negotiation_charter")
     negotiation_charter = chain.invoke({"context": context})
 
     return negotiation_charter["negotiation_charter"]
@@ -1,12 +1,16 @@
 import os
-import fitz  # PyMuPDF for reading PDFs
-import chromadb
 import re
 from dotenv import load_dotenv
 from openai import OpenAI
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings  # Use the updated package for embeddings
 from langchain_core.tools import tool
+from utils.profiling import memory_snapshot
+from utils.bm25_index import BM25Index
+from utils.vector_store import get_vector_store
+from utils.field_extractor import extract_fields, summarize_fields, save_supplier_fields
+from utils.pdf_text_cache import load_pdf_pages
+from utils.deadline import current_deadline, degrade
 
 # Load environment variables (ensure OPENAI_API_KEY and EMBEDDING_MODEL are set in your .env file)
 load_dotenv()
@@ -14,15 +18,24 @@ load_dotenv()
 # Initialize the OpenAI client (for generating embeddings)
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+# ✅ Precompiled metadata patterns
+SUPPLIER_RE = re.compile(r"Company Name:\s*([\w\s]+)")
+CONTACT_RE = re.compile(r"Contact:\s*([\w\s]+)")
+EMAIL_RE = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+")
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
 def extract_metadata(text):
     """
     Extracts supplier metadata from text using regex.
     Returns a dictionary with supplier, contact_person, and email.
     """
     metadata = {}
-    supplier_match = re.search(r"Company Name:\s*([\w\s]+)", text)
-    contact_match = re.search(r"Contact:\s*([\w\s]+)", text)
-    email_match = re.search(r"[\w\.-]+@[\w\.-]+\.\w+", text)
+    supplier_match = SUPPLIER_RE.search(text)
+    contact_match = CONTACT_RE.search(text)
+    email_match = EMAIL_RE.search(text)
     
     metadata["supplier"] = supplier_match.group(1).strip() if supplier_match else "Unknown"
     metadata["contact_person"] = contact_match.group(1).strip() if contact_match else "Unknown"
@@ -30,6 +43,37 @@ def extract_metadata(text):
     
     return metadata
 
+def extract_pdf(file_path, text_splitter, write_cache=True):
+    """
+    Loads one PDF (through the extracted-text cache), extracts its metadata and rule-based fields and splits
+    the full text into chunks. Writes nothing but (with write_cache) the text cache entry.
+    Returns (document metadata, fields, chunk metadata, chunks).
+    """
+    filename = os.path.basename(file_path)
+    with memory_snapshot(f"ingestion.{filename}"):
+        # ✅ Per-page text comes from the extracted-text cache when this PDF was parsed before
+        extracted = load_pdf_pages(file_path, write_cache=write_cache)
+        pages = extracted["pages"]
+        text = "\n".join(pages)
+        source = "cache" if extracted["cached"] else f"PyMuPDF, {extracted['timings']['extract_ms']} ms"
+        print(f"Loaded {filename}: {extracted['page_count']} pages ({source})")
+
+        # Extract metadata from the full document text
+        metadata = extract_metadata(text)
+
+        # ✅ Rule-based pricing/contract fields with page locations (sidecar JSON + scalar metadata)
+        fields = extract_fields(pages)
+        chunk_metadata = {**metadata, "source_file": filename, **summarize_fields(fields)}
+
+        # Split the full text into chunks
+        return metadata, fields, chunk_metadata, text_splitter.split_text(text)
+
+def prepare_pdf(file_path, text_splitter):
+    """extract_pdf() that also saves the supplier's fields sidecar. Returns (chunk metadata, chunks)."""
+    metadata, fields, chunk_metadata, chunks = extract_pdf(file_path, text_splitter)
+    save_supplier_fields(metadata["supplier"], os.path.basename(file_path), metadata, fields)
+    return chunk_metadata, chunks
+
 @tool
 def process_and_store_pdfs(pdf_dir: str):
     """
@@ -39,35 +83,35 @@ def process_and_store_pdfs(pdf_dir: str):
     
     Args:
         pdf_dir (str): The directory containing PDF files.
+
+    Returns {"status": "success" | "degraded" | "empty", "processed_files": chunks stored}: "degraded" when the
+    run deadline stopped ingestion before every PDF was stored, "empty" when the directory held nothing to store.
     """
-    chroma_client = chromadb.PersistentClient(path="./chroma_db")
-    
-    # Create or get a collection without a built-in embedding function (since we're generating embeddings manually)
-    collection = chroma_client.get_or_create_collection(name="rfp_proposals")
+    # Vector store backend (ChromaDB by default, see utils.vector_store); embeddings are generated manually
+    vector_store = get_vector_store()
     
     # Set up the text splitter for chunking
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
     
     # Lists for batch insertion into ChromaDB
     all_ids, all_documents, all_embeddings, all_metadatas = [], [], [], []
     
     # Process each PDF in the directory
+    deadline = current_deadline()
+    stopped_at_deadline = False
     for filename in os.listdir(pdf_dir):
         if filename.endswith(".pdf"):
-            file_path = os.path.join(pdf_dir, filename)
-            doc = fitz.open(file_path)
-            text = "\n".join([page.get_text("text") for page in doc])
-            
-            # Extract metadata from the full document text
-            metadata = extract_metadata(text)
-            
-            # Split the full text into chunks
-            chunks = text_splitter.split_text(text)
+            if deadline and deadline.expired():
+                # ✅ Out of time: store what has been embedded so far instead of blocking the run
+                degrade(f"ingestion stopped at the deadline before {filename}")
+                stopped_at_deadline = True
+                break
+            metadata, chunks = prepare_pdf(os.path.join(pdf_dir, filename), text_splitter)
             
             for i, chunk in enumerate(chunks):
                 chunk_id = f"{filename}_chunk_{i}"
                 # Generate embedding using OpenAIEmbeddings (manual embedding)
-                embedding = OpenAIEmbeddings(model="text-embedding-ada-002").embed_query(chunk)
+                embedding = OpenAIEmbeddings(model=EMBEDDING_MODEL).embed_query(chunk)
                 
                 if embedding is None:
                     print(f"Embedding generation failed for {chunk_id}. Skipping.")
@@ -80,15 +124,24 @@ def process_and_store_pdfs(pdf_dir: str):
                 
                 print(f"Processed {chunk_id} | Supplier: {metadata.get('supplier', 'Unknown')}")
     
-    # Batch insert into ChromaDB if we have any valid chunks
+    # Batch insert into the vector store if we have any valid chunks
     if all_ids:
-        collection.add(
+        vector_store.add(
             ids=all_ids,
             documents=all_documents,
             embeddings=all_embeddings,
             metadatas=all_metadatas
         )
         print(f"Successfully stored {len(all_ids)} chunks in ChromaDB with embeddings and metadata.")
-        return {"status": "success", "processed_files": len(all_ids)}
+
+        # ✅ Keep the keyword (BM25) index in sync with the vector store
+        bm25_index = BM25Index.load()
+        bm25_index.add(all_ids, all_documents, all_metadatas)
+        bm25_index.save()
+        return {"status": "degraded" if stopped_at_deadline else "success", "processed_files": len(all_ids)}
+    elif stopped_at_deadline:
+        print("Deadline expired before any PDF was ingested.")
+        return {"status": "degraded", "processed_files": 0}
     else:
-        print("No valid chunks to store.")
\ No newline at end of file
+        print("No valid chunks to store.")
+        return {"status": "empty", "processed_files": 0}
\ No newline at end of file
@@ -1,10 +1,15 @@
 import os
-from langchain.chat_models import ChatOpenAI
+from utils.llm_gateway import get_llm
 from langchain.prompts import PromptTemplate
+from langchain.output_parsers import StructuredOutputParser, ResponseSchema
+from utils.output_repair import repairing_parser
+from utils.deadline import current_deadline, degrade
 from crewai.tools import tool
+from utils.contract_sections import split_sections, join_sections, apply_section_edits, PatchError
+from utils.output_utils import load_markdown
 
 # ✅ Initialize LLM
-llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.2)  # Lower temperature for precise legal adjustments
+llm = get_llm(temperature=0.2, priority="interactive", step="contract_revision")  # Lower temperature for precise legal adjustments
 
 # ✅ Define file paths
 DOCUMENTS_DIR = "./outputs/"
@@ -13,25 +18,14 @@ REVIEW_FILE = "7.contract_review.md"
 
 def read_markdown_file(file_path):
     """Reads the contents of a markdown file."""
-    if not os.path.exists(file_path):
+    content = load_markdown(file_path)
+    if content is None:
         print(f"⚠️ Warning: {file_path} not found!")
         return ""
-    with open(file_path, "r", encoding="utf-8") as file:
-        return file.read()
-
-@tool
-def generate_revised_contract():
-    """
-    CrewAI tool to revise the final contract by **incorporating review feedback** with **minimal structure changes**.
-    """
-
-    # ✅ Read input markdown files
-    contract_text = read_markdown_file(os.path.join(DOCUMENTS_DIR, CONTRACT_FILE))
-    review_feedback = read_markdown_file(os.path.join(DOCUMENTS_DIR, REVIEW_FILE))
-
-    if not contract_text or not review_feedback:
-        return "⚠️ Error: Missing contract or review feedback file."
+    return content
 
+def regenerate_full_contract(contract_text, review_feedback):
+    """Asks the LLM to re-emit the entire contract with the review feedback applied."""
     # ✅ Combine context for LLM
     context = f"""
     **Final Contract (Before Review):**
@@ -71,3 +65,112 @@ def generate_revised_contract():
     )
 
     return revised_contract_content
+
+@tool
+def generate_revised_contract():
+    """
+    CrewAI tool to revise the final contract by **incorporating review feedback** with **minimal structure changes**.
+    """
+
+    # ✅ Read input markdown files
+    contract_text = read_markdown_file(os.path.join(DOCUMENTS_DIR, CONTRACT_FILE))
+    review_feedback = read_markdown_file(os.path.join(DOCUMENTS_DIR, REVIEW_FILE))
+
+    if not contract_text or not review_feedback:
+        return "⚠️ Error: Missing contract or review feedback file."
+
+    return regenerate_full_contract(contract_text, review_feedback)
+
+# ---------------------------------------------------------------------------
+# Patch mode: the LLM returns per-section edits that are applied locally
+# ---------------------------------------------------------------------------
+
+patch_response_schemas = [
+    ResponseSchema(
+        name="edits",
+        type="array",
+        description=(
+            'List of edits, one per section that must change. Each edit is an object with "section_id" '
+            '(exactly as listed) and either "replacement" (the full new markdown text of that section, '
+            'including its heading) or "diff" (a unified diff against that section only).'
+        ),
+    ),
+]
+patch_output_parser = StructuredOutputParser.from_response_schemas(patch_response_schemas)
+
+patch_prompt_template = PromptTemplate(
+    input_variables=["sections", "review_feedback"],
+    template="""
+    You are a **legal contract expert** with deep experience in supplier agreements and procurement law.
+
+    Your task: **Incorporate the review feedback into the contract** by returning edits for **only the sections that need to change**.
+    Do not return sections that stay the same.
+
+    **Instructions:**
+    - **Only modify sections where corrections are needed based on the review.**
+    - **DO NOT restructure, rephrase excessively, or introduce unnecessary changes.**
+    - **Keep each section's heading and markdown formatting unchanged.**
+    - **Use the section IDs exactly as given in the `[section_id: ...]` markers.**
+
+    ---
+    **Contract Sections:**
+    {sections}
+
+    ---
+    **Contract Review Feedback:**
+    {review_feedback}
+    ---
+
+    {format_instructions}
+    """,
+    partial_variables={"format_instructions": patch_output_parser.get_format_instructions()}
+)
+
+patch_chain = patch_prompt_template | llm | repairing_parser(patch_output_parser, "contract_patch")
+
+def format_sections_for_prompt(sections):
+    return "\n".join(f"[section_id: {section['id']}]\n{section['text'].rstrip()}\n" for section in sections)
+
+def revise_contract_with_patches(contract_text, review_feedback):
+    """
+    Revises the contract by applying LLM-proposed per-section edits locally.
+    Falls back to full regeneration if the edits cannot be parsed, validated or applied, unless the run
+    deadline is close, in which case the contract is returned unchanged.
+    Returns (revised_contract, info) where info records the mode used and the edited sections.
+    """
+    sections = split_sections(contract_text)
+    try:
+        result = patch_chain.invoke({
+            "sections": format_sections_for_prompt(sections),
+            "review_feedback": review_feedback,
+        })
+        edits = result.get("edits") or []
+        if not isinstance(edits, list):
+            raise PatchError("'edits' must be a list.")
+        patched_sections = apply_section_edits(sections, edits)
+    except Exception as e:  # Malformed output or a patch that does not apply
+        deadline = current_deadline()
+        if deadline and deadline.low():
+            degrade("contract revision: patch failed and full regeneration skipped")
+            return contract_text, {"mode": "unchanged", "error": str(e)}
+        print(f"⚠️ Patch revision failed ({e}), falling back to full regeneration.")
+        return regenerate_full_contract(contract_text, review_feedback), {"mode": "full", "error": str(e)}
+
+    edited = [edit["section_id"] for edit in edits]
+    print(f"✅ Applied {len(edited)} section edit(s): {', '.join(edited) or 'none'}")
+    return join_sections(patched_sections), {"mode": "patch", "edited_sections": edited}
+
+@tool
+def generate_patched_contract():
+    """
+    CrewAI tool to revise 6.final_contract.md by applying **per-section edits** from the review feedback,
+    instead of regenerating the whole contract. Falls back to full regeneration when a patch fails.
+    """
+    contract_text = read_markdown_file(os.path.join(DOCUMENTS_DIR, CONTRACT_FILE))
+    review_feedback = read_markdown_file(os.path.join(DOCUMENTS_DIR, REVIEW_FILE))
+
+    if not contract_text or not review_feedback:
+        return "⚠️ Error: Missing contract or review feedback file."
+
+    revised_contract, _ = revise_contract_with_patches(contract_text, review_feedback)
+    return revised_contract
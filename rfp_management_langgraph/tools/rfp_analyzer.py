@@ -1,51 +1,129 @@
 import os
-import chromadb
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+import re
+from langchain_openai import OpenAIEmbeddings
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
+from langchain.output_parsers import StructuredOutputParser, ResponseSchema
 from dotenv import load_dotenv
 from langchain_core.tools import tool
+from utils.profiling import memory_snapshot
+from utils.prompt_assembly import StablePrefixPrompt
+from utils.bm25_index import BM25Index
+from utils.vector_store import get_vector_store
+from utils.llm_gateway import get_llm
+from utils.output_repair import repairing_parser
+from utils.deadline import limit_chunks
+from utils.field_extractor import sidecar_scoring_fields
+from utils.supplier_scoring import SUPPLIER_FIELDS, coerce_supplier_fields, score_suppliers, format_ranking_table
 
 # Load environment variables (ensure OPENAI_API_KEY is set)
 load_dotenv()
 
-# ✅ Initialize ChromaDB client
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
-collection = chroma_client.get_collection(name="rfp_proposals")
+# ✅ Initialize vector store (backend chosen by VECTOR_STORE_BACKEND, opened lazily on first use)
+vector_store = get_vector_store()
 
 # ✅ Initialize LLM and Embeddings
 embedding_function = OpenAIEmbeddings()
-llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.7)
+llm = get_llm(temperature=0.7, step="comparison_report")
+extraction_llm = get_llm(temperature=0.7, priority="bulk", step="supplier_extraction")  # Per-supplier extraction yields to interactive calls
 
 def get_unique_suppliers():
     """
-    Retrieves all unique supplier names from metadata stored in ChromaDB.
+    Retrieves all unique supplier names from metadata stored in the vector store.
     """
-    results = collection.get(include=["metadatas"])
+    results = vector_store.get(include=["metadatas"])
     suppliers = {metadata["supplier"] for metadata in results["metadatas"] if "supplier" in metadata}
     return list(suppliers)
 
 def retrieve_chunks_for_supplier(supplier_name):
     """
-    Retrieves all proposal chunks for a given supplier using metadata filtering in ChromaDB.
+    Retrieves all proposal chunks for a given supplier using metadata filtering in the vector store.
+    Only the first chunks are kept when the run deadline is close (see utils.deadline.limit_chunks).
     """
-    results = collection.get(
+    results = vector_store.get(
         where={"supplier": supplier_name}, 
         include=["documents"]
     )
-    return results["documents"] if results and "documents" in results else []
+    documents = results["documents"] if results and "documents" in results else []
+    return limit_chunks(documents, "supplier retrieval")
+
+def retrieve_chunks_by_supplier(suppliers=None):
+    """
+    Retrieves every supplier's proposal chunks in one vector store read, grouped by supplier name.
+    Only the first chunks per supplier are kept when the run deadline is close.
+    """
+    groups = vector_store.get_grouped(key="supplier", values=suppliers, include=["documents"])
+    return {
+        supplier: limit_chunks(group["documents"], "supplier retrieval")
+        for supplier, group in groups.items() if supplier is not None
+    }
+
+_bm25_index = None
+
+def get_bm25_index():
+    """Loads the persisted BM25 index once per process."""
+    global _bm25_index
+    if _bm25_index is None:
+        _bm25_index = BM25Index.load()
+    return _bm25_index
+
+def _normalize_scores(scores):
+    if not scores:
+        return {}
+    low, high = min(scores.values()), max(scores.values())
+    return {key: (value - low) / (high - low) if high > low else 1.0 for key, value in scores.items()}
+
+def hybrid_search(query, top_k=5, supplier=None, alpha=0.5, use_vectors=True):
+    """
+    Hybrid retrieval over proposal chunks: BM25 keyword scores fused with vector similarity.
+    alpha weights the vector side (0 = keywords only). With use_vectors=False no embedding call is made.
+    Returns a list of {"id", "document", "metadata", "score"} dicts, best first.
+    """
+    candidates = top_k * 4
+    index = get_bm25_index()
+    keyword_scores = dict(index.search(query, top_k=candidates, supplier=supplier))
+
+    vector_scores, vector_hits = {}, {}
+    if use_vectors and alpha > 0:
+        results = vector_store.query(
+            embedding_function.embed_query(query),
+            top_k=candidates,
+            where={"supplier": supplier} if supplier else None,
+        )
+        for doc_id, document, metadata, distance in zip(
+            results["ids"], results["documents"], results["metadatas"], results["distances"]
+        ):
+            vector_scores[doc_id] = 1.0 / (1.0 + distance)
+            vector_hits[doc_id] = (document, metadata)
+    else:
+        alpha = 0.0
+
+    keyword_scores, vector_scores = _normalize_scores(keyword_scores), _normalize_scores(vector_scores)
+    fused = {
+        doc_id: (1 - alpha) * keyword_scores.get(doc_id, 0.0) + alpha * vector_scores.get(doc_id, 0.0)
+        for doc_id in set(keyword_scores) | set(vector_scores)
+    }
+
+    hits = []
+    for doc_id, score in sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]:
+        if doc_id in vector_hits:
+            document, metadata = vector_hits[doc_id]
+        else:
+            doc = index.get(doc_id)
+            document, metadata = doc["text"], doc["metadata"]
+        hits.append({"id": doc_id, "document": document, "metadata": metadata, "score": round(score, 4)})
+    return hits
 
 @tool
 def supplier_analysis_tool():
     """
     CrewAI tool for retrieving and analyzing supplier proposals, generating a detailed markdown report.
     """
-    suppliers = get_unique_suppliers()
+    chunks_by_supplier = retrieve_chunks_by_supplier()
     supplier_data = {}
     
-    for supplier in suppliers:
+    for supplier, documents in chunks_by_supplier.items():
         print(f"Processing {supplier}...")
-        documents = retrieve_chunks_for_supplier(supplier)
         if not documents:
             print(f"⚠️ No data found for {supplier}, skipping.")
             continue
@@ -58,16 +136,9 @@ def supplier_analysis_tool():
     report = generate_supplier_comparison_report(supplier_data)
     return report
 
-def extract_supplier_details(supplier_name, documents):
-    """
-    Uses LLM to extract relevant supplier proposal details in a structured markdown format.
-    """
-    context = "\n".join(documents)
-    
-    prompt_template = PromptTemplate(
-        input_variables=["supplier", "context"],
-        template="""
-        Extract structured information from the supplier proposal for {supplier}.
+# ✅ Static extraction instructions form a stable prompt prefix shared by every supplier's call
+EXTRACTION_INSTRUCTIONS = """
+        Extract structured information from the supplier proposal given at the end of this prompt.
         
         Return the extracted details in the following structured markdown format:
         
@@ -115,28 +186,37 @@ def extract_supplier_details(supplier_name, documents):
         ## ✅ Final Recommendation
         - **Top Supplier Recommendation**: 
         - **Key Justifications**: 
-        - **Next Steps**: 
-        
+        - **Next Steps**:
+"""
+
+extraction_prompt = StablePrefixPrompt(
+    name="supplier_extraction",
+    static_parts=[EXTRACTION_INSTRUCTIONS],
+    dynamic_template="""
+        Supplier: {supplier}
+
         Proposal Data:
         ```
         {context}
         ```
-        """
-    )
-    
-    chain = prompt_template | llm
-    extracted_data = chain.invoke({"supplier": supplier_name, "context": context})
-    return extracted_data.content if hasattr(extracted_data, "content") else extracted_data
+        """,
+    input_variables=["supplier", "context"],
+)
+extraction_chain = extraction_prompt.chain(extraction_llm)
 
-def generate_supplier_comparison_report(supplier_data):
+def extract_supplier_details(supplier_name, documents):
     """
-    Uses LLM to generate a comprehensive markdown report comparing supplier proposals.
+    Uses LLM to extract relevant supplier proposal details in a structured markdown format.
     """
-    comparison_text = "\n\n".join([f"## {supplier}\n{data}" for supplier, data in supplier_data.items()])
+    with memory_snapshot(f"prompt_construction.{supplier_name}"):
+        context = "\n".join(documents)
     
-    prompt_template = PromptTemplate(
-        input_variables=["comparison_text"],
-        template="""
+    extracted_data = extraction_chain.invoke({"supplier": supplier_name, "context": context})
+    return extracted_data.content if hasattr(extracted_data, "content") else extracted_data
+
+comparison_report_prompt = PromptTemplate(
+    input_variables=["comparison_text"],
+    template="""
         Generate a highly detailed supplier proposal evaluation report in a professional markdown format based on the following extracted data:
         
         {comparison_text}
@@ -170,8 +250,275 @@ def generate_supplier_comparison_report(supplier_data):
         
         Return the report in a **professionally formatted markdown style** with tables, bullet points, and clear sections.
         """
-    )
+)
+
+def generate_supplier_comparison_report(supplier_data, hierarchical=None):
+    """
+    Uses LLM to generate a comprehensive markdown report comparing supplier proposals.
+    Pools larger than HIERARCHICAL_COMPARISON_THRESHOLD are compared hierarchically unless hierarchical is given.
+    """
+    if hierarchical is None:
+        hierarchical = len(supplier_data) > HIERARCHICAL_COMPARISON_THRESHOLD
+    if hierarchical:
+        return generate_hierarchical_comparison_report(supplier_data)
+
+    with memory_snapshot("prompt_construction.comparison"):
+        comparison_text = "\n\n".join([f"## {supplier}\n{data}" for supplier, data in supplier_data.items()])
     
-    chain = prompt_template | llm
+    chain = comparison_report_prompt | llm
+    report = chain.invoke({"comparison_text": comparison_text})
+    return report.content if hasattr(report, "content") else report
+
+# ---------------------------------------------------------------------------
+# Hierarchical (map-reduce) comparison for large supplier pools
+# ---------------------------------------------------------------------------
+
+HIERARCHICAL_COMPARISON_THRESHOLD = int(os.getenv("HIERARCHICAL_COMPARISON_THRESHOLD", "10"))
+COMPARISON_GROUP_SIZE = int(os.getenv("COMPARISON_GROUP_SIZE", "5"))  # Suppliers (or summaries) per prompt
+COMPARISON_FAN_OUT = int(os.getenv("COMPARISON_FAN_OUT", "4"))  # Group prompts in flight at once
+SCORE_CRITERIA = {
+    "technical_fit": "Technical Fit (10)",
+    "pricing": "Pricing & Cost (10)",
+    "slas_support": "SLAs & Support (10)",
+    "compliance": "Compliance (10)",
+    "overall": "Overall Score",
+}
+
+group_llm = get_llm(temperature=0.3, step="supplier_group_comparison")
+
+group_output_parser = StructuredOutputParser.from_response_schemas([
+    ResponseSchema(
+        name="summary",
+        description="Compact markdown comparison of this group: a '### <supplier>' heading and at most 5 bullets per supplier "
+                    "(pricing, key capabilities, SLAs, compliance, main risks), then one line on how they compare.",
+    ),
+    ResponseSchema(
+        name="scores",
+        type="list",
+        description="One object per supplier: {\"supplier\": name, " + ", ".join(f'\"{key}\": 0-10' for key in SCORE_CRITERIA) + "}",
+    ),
+])
+
+group_comparison_prompt = StablePrefixPrompt(
+    name="supplier_group_comparison",
+    static_parts=[
+        """
+        Compare the supplier proposals given at the end of this prompt. They are one group of a larger pool,
+        so score every supplier on an absolute 0-10 scale (not relative to this group) and keep the summary compact:
+        it replaces the full profiles in the final report.
+        """,
+        group_output_parser.get_format_instructions(),
+    ],
+    dynamic_template="""
+        Supplier profiles:
+
+        {profiles}
+        """,
+    input_variables=["profiles"],
+)
+group_comparison_chain = group_comparison_prompt.chain(group_llm, repairing_parser(group_output_parser, "supplier_group_comparison"))
+
+summary_merge_prompt = StablePrefixPrompt(
+    name="supplier_summary_merge",
+    static_parts=[
+        """
+        Merge the supplier group summaries given at the end of this prompt into one compact markdown summary.
+        Keep every supplier with its '### <supplier>' heading and at most 3 bullets of distinguishing facts
+        (pricing, capabilities, SLAs, compliance, risks). Do not drop suppliers and do not invent facts.
+        Return only the merged summary.
+        """,
+    ],
+    dynamic_template="""
+        Group summaries:
+
+        {summaries}
+        """,
+    input_variables=["summaries"],
+)
+summary_merge_chain = summary_merge_prompt.chain(group_llm)
+
+def _groups(items, group_size):
+    return [items[start:start + group_size] for start in range(0, len(items), group_size)]
+
+def _supplier_key(name):
+    """Supplier name without case, punctuation, spacing or markdown, e.g. "**Acme Corp.**" -> "acmecorp"."""
+    return re.sub(r"[\W_]+", "", str(name or "")).casefold()
+
+def _coerce_scores(scores, suppliers):
+    """
+    Keeps score rows for the group's own suppliers (in prompt order), with every criterion as a number in
+    [0, 10] or None. Rows are matched by normalised name; a row whose name matches no supplier is matched by
+    position when there is exactly one row per supplier.
+    """
+    rows = [row for row in scores if isinstance(row, dict)] if isinstance(scores, list) else []
+    by_key = {_supplier_key(supplier): supplier for supplier in suppliers}
+    matched = [by_key.get(_supplier_key(row.get("supplier"))) for row in rows]
+    if len(rows) == len(suppliers):
+        claimed = set(matched)
+        matched = [supplier or (suppliers[i] if suppliers[i] not in claimed else None) for i, supplier in enumerate(matched)]
+    coerced = {}
+    for row, supplier in zip(rows, matched):
+        if supplier is None or supplier in coerced:
+            continue
+        values = {}
+        for key in SCORE_CRITERIA:
+            try:
+                values[key] = min(max(float(row.get(key)), 0.0), 10.0)
+            except (TypeError, ValueError):
+                values[key] = None
+        coerced[supplier] = values
+    return coerced
+
+def format_group_scores(scores):
+    """Markdown table of carried-forward scores, best overall first; suppliers without scores are listed last."""
+    header = "| **Supplier** | " + " | ".join(f"**{label}**" for label in SCORE_CRITERIA.values()) + " |"
+    lines = [header, "|" + "---|" * (len(SCORE_CRITERIA) + 1)]
+    for supplier, values in sorted(scores.items(), key=lambda item: (item[1].get("overall") is None, -(item[1].get("overall") or 0))):
+        cells = ["-" if values.get(key) is None else f"{values[key]:g}" for key in SCORE_CRITERIA]
+        lines.append(f"| {supplier} | " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+def generate_hierarchical_comparison_report(supplier_data, group_size=None, fan_out=None):
+    """
+    Map-reduce comparison: suppliers are compared in groups of group_size (fan_out groups in parallel), each
+    group yielding a compact summary and per-supplier scores. Summaries are merged group-wise, level by level,
+    until at most group_size remain; the scores are carried forward unchanged. The final report is written from
+    the merged summaries and the score table, so the number of sequential LLM rounds grows with log(suppliers).
+    """
+    group_size = max(2, group_size or COMPARISON_GROUP_SIZE)
+    config = {"max_concurrency": fan_out or COMPARISON_FAN_OUT}
+    groups = _groups(list(supplier_data), group_size)
+
+    with memory_snapshot("prompt_construction.comparison_groups"):
+        inputs = [{"profiles": "\n\n".join(f"## {supplier}\n{supplier_data[supplier]}" for supplier in group)} for group in groups]
+    results = group_comparison_chain.batch(inputs, config=config, return_exceptions=True)
+
+    summaries, scores = [], {supplier: {} for supplier in supplier_data}
+    for group, group_input, result in zip(groups, inputs, results):
+        if isinstance(result, Exception):
+            # ✅ One failed group must not sink the report: its raw profiles go forward unscored
+            print(f"⚠️ Group comparison failed for {', '.join(group)}: {type(result).__name__}: {result}")
+            summaries.append(group_input["profiles"])
+            continue
+        summaries.append(result["summary"])
+        scores.update(_coerce_scores(result.get("scores"), group))
+    levels = [len(summaries)]
+
+    while len(summaries) > group_size:
+        merge_inputs = [{"summaries": "\n\n---\n\n".join(group)} for group in _groups(summaries, group_size)]
+        merged = summary_merge_chain.batch(merge_inputs, config=config, return_exceptions=True)
+        summaries = []
+        for merge_input, message in zip(merge_inputs, merged):
+            if isinstance(message, Exception):
+                # ✅ Like a failed group: its summaries go forward concatenated, still one entry for the next level
+                print(f"⚠️ Summary merge failed: {type(message).__name__}: {message}")
+                summaries.append(merge_input["summaries"])
+                continue
+            summaries.append(message.content if hasattr(message, "content") else message)
+        levels.append(len(summaries))
+    print(f"🌲 Hierarchical comparison: {len(supplier_data)} suppliers -> " + " -> ".join(f"{n} summaries" for n in levels) + " -> report")
+
+    comparison_text = "\n\n".join(summaries) + "\n\n## Scores from the group comparisons\n" + format_group_scores(scores)
+    chain = comparison_report_prompt | llm
     report = chain.invoke({"comparison_text": comparison_text})
     return report.content if hasattr(report, "content") else report
+
+# ---------------------------------------------------------------------------
+# Structured extraction with local scoring and ranking
+# ---------------------------------------------------------------------------
+
+MAX_PARALLEL_EXTRACTIONS = 4
+
+field_output_parser = StructuredOutputParser.from_response_schemas([
+    ResponseSchema(name=name, type=field_type, description=description)
+    for name, (field_type, description) in SUPPLIER_FIELDS.items()
+])
+
+field_extraction_prompt = StablePrefixPrompt(
+    name="supplier_field_extraction",
+    static_parts=[
+        """
+        Extract the following fields from the supplier proposal given at the end of this prompt.
+        Use only facts stated in the proposal. Convert prices to numbers in USD and periods to months.
+        Use null for anything the proposal does not state.
+        """,
+        field_output_parser.get_format_instructions(),
+    ],
+    dynamic_template="""
+        Supplier: {supplier}
+
+        Proposal Data:
+        ```
+        {context}
+        ```
+        """,
+    input_variables=["supplier", "context"],
+)
+field_extraction_chain = field_extraction_prompt.chain(extraction_llm, field_output_parser)
+
+def extract_supplier_fields(supplier_documents):
+    """
+    Extracts typed fields for every supplier in parallel.
+    supplier_documents maps supplier -> list of proposal chunks. Returns {supplier: fields}.
+    """
+    suppliers = list(supplier_documents)
+    inputs = [{"supplier": s, "context": "\n".join(supplier_documents[s])} for s in suppliers]
+    results = field_extraction_chain.batch(inputs, config={"max_concurrency": MAX_PARALLEL_EXTRACTIONS})
+    fields = {}
+    for supplier, result in zip(suppliers, results):
+        fields[supplier] = coerce_supplier_fields(result)
+        # ✅ Fill gaps from the rule-based fields extracted at ingestion time
+        for name, value in sidecar_scoring_fields(supplier).items():
+            if fields[supplier].get(name) is None:
+                fields[supplier][name] = value
+    return fields
+
+def generate_ranked_comparison_report(ranking_table):
+    """
+    Uses LLM to write the comparison report from the locally computed ranking table only.
+    """
+    prompt_template = PromptTemplate(
+        input_variables=["ranking_table"],
+        template="""
+        Generate a concise supplier proposal evaluation report in a professional markdown format.
+        The ranking below was computed deterministically from the suppliers' proposals; **do not change the
+        ranks or scores**, explain them.
+
+        ## 📊 EXECUTIVE SUMMARY
+        - High-level findings on supplier strengths, weaknesses, and rankings.
+
+        ## 🔝 OVERALL SUPPLIER RANKING
+        - Reproduce the ranking table as given.
+
+        ## 🔍 KEY DIFFERENCES BETWEEN SUPPLIERS
+        - Pricing, contract lock-in, SLAs and compliance differences visible in the table.
+
+        ## 🔥 NEGOTIATION & OPTIMIZATION STRATEGIES
+        - Negotiation levers for each shortlisted supplier based on its weakest criteria.
+
+        ## ✅ FINAL RECOMMENDATION
+        - Best supplier selection, justification and next steps.
+
+        **Ranking Table:**
+        {ranking_table}
+        """
+    )
+
+    chain = prompt_template | llm
+    report = chain.invoke({"ranking_table": ranking_table})
+    return report.content if hasattr(report, "content") else report
+
+@tool
+def structured_supplier_analysis_tool(weights: dict = None):
+    """
+    Extracts typed pricing/SLA/compliance fields per supplier, scores and ranks suppliers locally with
+    configurable weights, and writes the comparison report from the compact ranking table only.
+    """
+    supplier_documents = {supplier: documents for supplier, documents in retrieve_chunks_by_supplier().items() if documents}
+
+    if not supplier_documents:
+        return "No valid supplier proposals found. Check vector DB."
+
+    fields = extract_supplier_fields(supplier_documents)
+    ranked = score_suppliers(fields, weights)
+    return generate_ranked_comparison_report(format_ranking_table(ranked))
@@ -0,0 +1,260 @@
+"""
+Content-addressed, versioned archive of everything written through save_markdown.
+
+    outputs/.artifacts/blobs/<2-char prefix>/<sha256>.z   zlib-compressed content, written once per distinct content
+    outputs/.artifacts/runs/<run_id>.json                 manifest: filename -> sha256, size, saved_at
+    outputs/.artifacts/index.json                         filename -> latest {sha256, run_id, saved_at}
+
+    python -m utils.artifact_store runs
+    python -m utils.artifact_store show 7.contract_review.md [--run RUN_ID]
+    python -m utils.artifact_store diff RUN_A RUN_B [FILENAME]
+    python -m utils.artifact_store restore RUN_ID [--target ./outputs]
+"""
+import argparse
+import contextvars
+import contextlib
+import difflib
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialised
+    fcntl = None
+
+ARTIFACT_STORE_DIR = "./outputs/.artifacts/"
+COMPRESSION_LEVEL = 6
+
+_current_run = contextvars.ContextVar("artifact_run", default=None)
+_default_run = None
+_lock = threading.Lock()
+
+
+def atomic_write(path, data):
+    """Writes bytes or text to path via a temporary file and os.replace, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data if isinstance(data, bytes) else data.encode("utf-8"))
+    os.replace(tmp_path, path)
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Exclusive lock on path shared by threads (_lock) and, through flock, by other processes."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _lock, open(path, "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def start_run(run_id=None):
+    """Starts a new artifact run for the current context (e.g. one service job) and returns its ID."""
+    run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    _current_run.set(run_id)
+    return run_id
+
+
+def current_run():
+    """The run set by start_run() in this context, else one run per process created on first use."""
+    global _default_run
+    run_id = _current_run.get()
+    if run_id is None:
+        with _lock:
+            if _default_run is None:
+                _default_run = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+            run_id = _default_run
+    return run_id
+
+
+class ArtifactStore:
+    def __init__(self, root=ARTIFACT_STORE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self.lock_path = os.path.join(root, ".lock")
+        self._index = None
+        self._index_version = None
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], f"{digest}.z")
+
+    def _manifest_path(self, run_id):
+        return os.path.join(self.root, "runs", f"{run_id}.json")
+
+    def put_blob(self, content):
+        """Stores content once (deduplicated by sha256) and returns its digest."""
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            atomic_write(path, zlib.compress(data, COMPRESSION_LEVEL))
+        return digest
+
+    def get_blob(self, digest):
+        with open(self._blob_path(digest), "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+    def _index_file_version(self):
+        # Every write replaces index.json with a new file, so the inode changes even within one mtime tick
+        if not os.path.exists(self.index_path):
+            return None
+        stat = os.stat(self.index_path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def index(self):
+        """filename -> latest entry; re-read only when index.json changed on disk."""
+        version = self._index_file_version()
+        if self._index is None or version != self._index_version:
+            self._index, self._index_version = _read_json(self.index_path, {}), version
+        return self._index
+
+    def save(self, filename, content, run_id=None):
+        """Archives one artifact version under the run's manifest and makes it the latest for filename."""
+        run_id = run_id or current_run()
+        digest = self.put_blob(content)
+        entry = {"sha256": digest, "size": len(content.encode("utf-8")), "saved_at": time.time()}
+        # ✅ Read-modify-write of the manifest and the index under a lock other processes (service workers) honour too
+        with file_lock(self.lock_path):
+            manifest_path = self._manifest_path(run_id)
+            manifest = _read_json(manifest_path, {"run_id": run_id, "created_at": time.time(), "artifacts": {}})
+            manifest["artifacts"][filename] = entry
+            atomic_write(manifest_path, json.dumps(manifest, indent=2))
+
+            index = _read_json(self.index_path, {})
+            index[filename] = {**entry, "run_id": run_id}
+            atomic_write(self.index_path, json.dumps(index, indent=2))
+            self._index, self._index_version = index, self._index_file_version()
+        return digest
+
+    def latest(self, filename):
+        """Latest archived content of filename (one index lookup and one blob read), or None."""
+        entry = self.index().get(filename)
+        return self.get_blob(entry["sha256"]) if entry else None
+
+    def manifest(self, run_id):
+        manifest = _read_json(self._manifest_path(run_id), None)
+        if manifest is None:
+            raise KeyError(f"Unknown artifact run: {run_id}")
+        return manifest
+
+    def load(self, filename, run_id):
+        entry = self.manifest(run_id)["artifacts"].get(filename)
+        return self.get_blob(entry["sha256"]) if entry else None
+
+    def runs(self):
+        runs_dir = os.path.join(self.root, "runs")
+        if not os.path.isdir(runs_dir):
+            return []
+        manifests = [_read_json(os.path.join(runs_dir, name), {}) for name in os.listdir(runs_dir) if name.endswith(".json")]
+        return sorted(
+            ({"run_id": m["run_id"], "created_at": m["created_at"], "artifacts": len(m["artifacts"])} for m in manifests),
+            key=lambda run: run["created_at"],
+        )
+
+    def restore(self, run_id, target_dir="./outputs"):
+        """
+        Writes every artifact of a past run back into target_dir and makes those versions the latest in the
+        index again. Returns the restored paths.
+        """
+        paths = []
+        artifacts = self.manifest(run_id)["artifacts"]
+        for filename, entry in artifacts.items():
+            path = os.path.join(target_dir, filename)
+            atomic_write(path, self.get_blob(entry["sha256"]))
+            paths.append(path)
+        with file_lock(self.lock_path):
+            index = _read_json(self.index_path, {})
+            index.update({filename: {**entry, "run_id": run_id} for filename, entry in artifacts.items()})
+            atomic_write(self.index_path, json.dumps(index, indent=2))
+            self._index, self._index_version = index, self._index_file_version()
+        return paths
+
+    def diff(self, run_a, run_b, filename=None):
+        """
+        Compares two runs: {"added", "removed", "unchanged", "changed": {filename: unified diff}}.
+        Unchanged files are detected by digest alone, without reading their blobs.
+        """
+        a, b = self.manifest(run_a)["artifacts"], self.manifest(run_b)["artifacts"]
+        names = [filename] if filename else sorted(set(a) | set(b))
+        result = {"added": [], "removed": [], "unchanged": [], "changed": {}}
+        for name in names:
+            if name not in a:
+                result["added"].append(name)
+            elif name not in b:
+                result["removed"].append(name)
+            elif a[name]["sha256"] == b[name]["sha256"]:
+                result["unchanged"].append(name)
+            else:
+                result["changed"][name] = "".join(difflib.unified_diff(
+                    self.get_blob(a[name]["sha256"]).splitlines(keepends=True),
+                    self.get_blob(b[name]["sha256"]).splitlines(keepends=True),
+                    fromfile=f"{run_a}/{name}", tofile=f"{run_b}/{name}",
+                ))
+        return result
+
+
+_store = None
+
+
+def get_artifact_store():
+    global _store
+    with _lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, diff and restore archived workflow artifacts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("runs")
+    show = commands.add_parser("show")
+    show.add_argument("filename")
+    show.add_argument("--run", default=None)
+    diff = commands.add_parser("diff")
+    diff.add_argument("run_a")
+    diff.add_argument("run_b")
+    diff.add_argument("filename", nargs="?")
+    restore = commands.add_parser("restore")
+    restore.add_argument("run_id")
+    restore.add_argument("--target", default="./outputs")
+    args = parser.parse_args()
+
+    store = get_artifact_store()
+    if args.command == "runs":
+        for run in store.runs():
+            print(f"{run['run_id']}  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run['created_at']))}  {run['artifacts']} artifacts")
+    elif args.command == "show":
+        content = store.load(args.filename, args.run) if args.run else store.latest(args.filename)
+        print(content if content is not None else f"No archived version of {args.filename}")
+    elif args.command == "diff":
+        result = store.diff(args.run_a, args.run_b, args.filename)
+        for label in ("added", "removed", "unchanged"):
+            if result[label]:
+                print(f"{label}: {', '.join(result[label])}")
+        for patch in result["changed"].values():
+            print(patch)
+    elif args.command == "restore":
+        for path in store.restore(args.run_id, args.target):
+            print(f"Restored {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import contextvars
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from utils.run_planner import dry_run_step, stub_response, suppress_outputs, suppressible_outputs
+from utils.artifact_store import get_artifact_store, start_run
+
+BATCH_DIR = "./outputs/batches/"
+BATCH_BACKEND = os.getenv("BATCH_BACKEND", "openai")  # "openai" (Batch API) or "local" (stand-in through the gateway)
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_SECONDS = 30
+MAX_IDLE_ROUNDS = 2  # Consecutive rounds that return no new result before a deferred run gives up
+DEFERRED_MARKER = "[deferred result pending]"
+ROLES = {"human": "user", "ai": "assistant", "system": "system", "tool": "tool"}
+
+# The deferred run of this context, so a batch run never captures the live calls of other runs in the process
+_current_batch_run = contextvars.ContextVar("batch_run", default=None)
+_lock = threading.Lock()
+
+
+def to_openai_messages(input):
+    """Converts a prompt value, string or message list into chat completion messages."""
+    if hasattr(input, "to_messages"):
+        input = input.to_messages()
+    if isinstance(input, str):
+        return [{"role": "user", "content": input}]
+    return [{"role": ROLES.get(getattr(m, "type", "human"), "user"), "content": str(getattr(m, "content", m))} for m in input]
+
+
+def request_body(model, temperature, messages, **kwargs):
+    return {"model": model, "temperature": temperature, "messages": messages, **kwargs}
+
+
+def request_id(body):
+    """Deterministic custom_id, so a prompt rendered again in a later round finds its result."""
+    return hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+
+class BatchRun:
+    """
+    Collects prompts instead of sending them, and serves results of earlier rounds. Results are kept in
+    <run_dir>/results.jsonl so an interrupted run resumes without resubmitting completed requests.
+    """
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.results_path = os.path.join(run_dir, "results.jsonl")
+        self.results = {}
+        self.pending = {}
+        self.waiting = 0  # Calls whose prompt depends on a result that is still pending
+        os.makedirs(run_dir, exist_ok=True)
+        if os.path.exists(self.results_path):
+            with open(self.results_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.results[entry["custom_id"]] = entry["content"]
+
+    def resolve(self, body, prompt_text):
+        """Returns (content, is_final) for a request: the stored result, or a placeholder while it is deferred."""
+        custom_id = request_id(body)
+        with _lock:
+            if custom_id in self.results:
+                return self.results[custom_id], True
+            if DEFERRED_MARKER in prompt_text:
+                self.waiting += 1
+            else:
+                self.pending[custom_id] = body
+        suppress_outputs(True)  # ✅ Anything derived from a placeholder must not reach ./outputs or the caches
+        return stub_response(prompt_text, DEFERRED_MARKER), False
+
+    def start_round(self):
+        self.pending, self.waiting = {}, 0
+        suppress_outputs(False)
+
+    def write_requests(self, round_number):
+        path = os.path.join(self.run_dir, f"round{round_number}.requests.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for custom_id, body in self.pending.items():
+                f.write(json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}) + "\n")
+        return path
+
+    def store_results(self, results):
+        """Keeps the results of a round and returns how many of them are new."""
+        new = {custom_id: content for custom_id, content in results.items() if custom_id not in self.results}
+        with open(self.results_path, "a", encoding="utf-8") as f:
+            for custom_id, content in new.items():
+                f.write(json.dumps({"custom_id": custom_id, "content": content}) + "\n")
+        self.results.update(new)
+        return len(new)
+
+
+def active_batch_run():
+    return _current_batch_run.get()
+
+
+def parse_batch_output(lines):
+    """Maps Batch API output lines to {custom_id: content}; failed requests are left out and retried next round."""
+    results = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        response = entry.get("response") or {}
+        if entry.get("error") or response.get("status_code") != 200:
+            print(f"⚠️ Batch request {entry.get('custom_id')} failed: {entry.get('error') or response.get('status_code')}")
+            continue
+        results[entry["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return results
+
+
+class OpenAIBatchClient:
+    """Submits a requests file to the OpenAI Batch API and waits for its output file."""
+
+    def __init__(self, poll_seconds=BATCH_POLL_SECONDS):
+        from openai import OpenAI
+        self.client = OpenAI(base_url=os.getenv("LLM_GATEWAY_BASE_URL") or None)
+        self.poll_seconds = poll_seconds
+
+    def run(self, requests_path):
+        with open(requests_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window=BATCH_COMPLETION_WINDOW,
+        )
+        print(f"📤 Submitted batch {batch.id} ({requests_path})")
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(self.poll_seconds)
+            batch = self.client.batches.retrieve(batch.id)
+            print(f"⏳ Batch {batch.id}: {batch.status} ({batch.request_counts.completed}/{batch.request_counts.total})")
+        if not batch.output_file_id:
+            raise RuntimeError(f"Batch {batch.id} ended as {batch.status} without output")
+        return batch.id, parse_batch_output(self.client.files.content(batch.output_file_id).text.splitlines())
+
+
+class LocalBatchClient:
+    """Stand-in for the Batch API: runs the requests file through the LLM gateway at bulk priority."""
+
+    def run(self, requests_path):
+        from concurrent.futures import ThreadPoolExecutor
+        from utils.llm_gateway import get_gateway
+
+        with open(requests_path, "r", encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        gateway = get_gateway()
+
+        def execute(request):
+            body = dict(request["body"])
+            model, temperature, messages = body.pop("model"), body.pop("temperature"), body.pop("messages")
+            client = gateway.client(model, temperature, **body)
+            try:
+                message = gateway.call(model, "bulk", lambda: client.invoke([(m["role"], m["content"]) for m in messages]))
+            except Exception as e:  # Reported per request, like the Batch API; it is resubmitted next round
+                return json.dumps({"custom_id": request["custom_id"], "error": {"message": f"{type(e).__name__}: {e}"}})
+            return json.dumps({
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "body": {"choices": [{"message": {"role": "assistant", "content": message.content}}]}},
+            })
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            lines = list(pool.map(execute, requests))
+        output_path = requests_path.replace(".requests.jsonl", ".output.jsonl")
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return f"local:{os.path.basename(output_path)}", parse_batch_output(lines)
+
+
+def get_batch_client(backend=None):
+    backend = backend or BATCH_BACKEND
+    if backend == "openai":
+        return OpenAIBatchClient()
+    if backend == "local":
+        return LocalBatchClient()
+    raise ValueError(f"Unknown batch backend: {backend}")
+
+
+def run_deferred(run_id=None, steps=None, backend=None, max_rounds=None):
+    """
+    Runs the workflow's LLM steps in deferred (batch) mode. Each round replays the steps in order, serving
+    results collected so far. New prompts are gathered into one batch instead of being sent, and the round
+    stops after the first step that is still waiting. Prompts that depend on a pending result are not
+    submitted. Every dependent LLM call costs one round, so rounds continue until a round completes with
+    nothing pending (every step has then run on real results and written its artifacts, including the
+    documents of STEP_OUTPUT_FILES steps, which their tools return instead of saving), until MAX_IDLE_ROUNDS
+    rounds in a row return no new result, or until the optional max_rounds.
+    Returns a state-like dict with per-step status, output files and per-round batch stats.
+    """
+    from workflow import run_tool_step, save_step_output, workflow_steps
+
+    run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
+    batch_run = BatchRun(os.path.join(BATCH_DIR, run_id))
+    client = get_batch_client(backend)
+    steps = steps or workflow_steps()
+    state = {"steps": {}, "output_files": {}, "batch_rounds": [], "run_dir": batch_run.run_dir}
+    start_run(f"deferred-{run_id}")  # ✅ The artifact manifest of this run lists exactly what it wrote
+
+    batch_token = _current_batch_run.set(batch_run)
+    idle_rounds = 0
+    try:
+        with suppressible_outputs():  # ✅ Placeholder-derived writes stay suppressed for this run only
+            for round_number in itertools.count(1):
+                if max_rounds and round_number > max_rounds:
+                    print(f"⏱ Deferred run stopped after {max_rounds} rounds with steps still pending")
+                    break
+                batch_run.start_round()
+                for name, module_name, attribute in steps:
+                    with dry_run_step(name):
+                        try:
+                            save_step_output(name, run_tool_step(module_name, attribute))  # Not written while results are pending
+                            error = None
+                        except Exception as e:  # Placeholder output a step cannot consume yet
+                            error = f"{type(e).__name__}: {e}"
+                    if batch_run.pending or batch_run.waiting:
+                        state["steps"][name] = "pending"
+                        break
+                    state["steps"][name] = "failed" if error else "completed"
+                    if error:
+                        print(f"❌ {name} failed: {error}")
+
+                if not batch_run.pending:
+                    if batch_run.waiting:
+                        raise RuntimeError("Prompts are waiting on results that were never requested")
+                    break
+                requests_path = batch_run.write_requests(round_number)
+                started = time.perf_counter()
+                batch_id, results = client.run(requests_path)
+                new_results = batch_run.store_results(results)
+                state["batch_rounds"].append({
+                    "round": round_number, "batch_id": batch_id, "requests": len(batch_run.pending),
+                    "results": len(results), "seconds": round(time.perf_counter() - started, 1),
+                })
+                print(f"📥 Round {round_number}: {len(results)}/{len(batch_run.pending)} results from {batch_id}")
+                idle_rounds = 0 if new_results else idle_rounds + 1
+                if idle_rounds >= MAX_IDLE_ROUNDS:
+                    print(f"❌ Deferred run stopped: {idle_rounds} rounds in a row returned no new result")
+                    break
+    finally:
+        _current_batch_run.reset(batch_token)
+
+    # ✅ Artifacts written by this run (placeholder rounds never write, so these hold real results only)
+    try:
+        written = get_artifact_store().manifest(f"deferred-{run_id}")["artifacts"]
+    except KeyError:  # Nothing was written
+        written = {}
+    state["output_files"] = {filename: os.path.join("./outputs", filename) for filename in sorted(written)}
+    return state
@@ -0,0 +1,95 @@
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+BM25_INDEX_PATH = "./bm25_index.json"  # Persisted next to ./chroma_db
+K1 = 1.5
+B = 0.75
+
+# Keeps identifiers like "27001", "4.2", "gpt-4o" and "soc2" intact
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Local inverted index with Okapi BM25 scoring over proposal chunks.
+    Documents can be added incrementally; re-adding an ID replaces the old version.
+    """
+
+    def __init__(self):
+        self.docs = {}  # doc_id -> {"text", "metadata", "length"}
+        self.postings = defaultdict(dict)  # term -> {doc_id: term frequency}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def remove(self, doc_id):
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self.total_length -= doc["length"]
+        for term in set(tokenize(doc["text"])):
+            self.postings[term].pop(doc_id, None)
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def add(self, ids, documents, metadatas=None):
+        metadatas = metadatas or [{} for _ in ids]
+        for doc_id, text, metadata in zip(ids, documents, metadatas):
+            self.remove(doc_id)
+            terms = Counter(tokenize(text))
+            length = sum(terms.values())
+            self.docs[doc_id] = {"text": text, "metadata": dict(metadata), "length": length}
+            self.total_length += length
+            for term, frequency in terms.items():
+                self.postings[term][doc_id] = frequency
+
+    def search(self, query, top_k=5, supplier=None):
+        """
+        Returns the top_k (doc_id, score) pairs for the query, optionally restricted to one supplier.
+        """
+        if not self.docs:
+            return []
+        n_docs = len(self.docs)
+        avg_length = self.total_length / n_docs
+        scores = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                doc = self.docs[doc_id]
+                if supplier is not None and doc["metadata"].get("supplier") != supplier:
+                    continue
+                norm = frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * doc["length"] / avg_length))
+                scores[doc_id] += idf * norm
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def get(self, doc_id):
+        return self.docs.get(doc_id)
+
+    def save(self, path=BM25_INDEX_PATH):
+        """Writes the index atomically (documents only; postings are rebuilt on load)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({doc_id: {"text": d["text"], "metadata": d["metadata"]} for doc_id, d in self.docs.items()}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=BM25_INDEX_PATH):
+        index = cls()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            index.add(list(stored), [d["text"] for d in stored.values()], [d["metadata"] for d in stored.values()])
+        return index
@@ -0,0 +1,156 @@
+import hashlib
+import re
+
+# Matches markdown headings such as "## 3. Service Level Agreements (SLAs)"
+HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+PREAMBLE_ID = "preamble"
+# Old-file start line of a unified diff hunk, e.g. "@@ -12,0 +13,2 @@"
+HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+def slugify(title):
+    """Turns a heading title into a stable section ID, e.g. '2. Pricing & Payment' -> '2-pricing-payment'."""
+    slug = re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
+    return slug or "section"
+
+
+def hash_text(text):
+    """Content hash used to detect changed sections (trailing whitespace is ignored)."""
+    normalized = "\n".join(line.rstrip() for line in text.strip().splitlines())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def split_sections(markdown_text, max_level=2):
+    """
+    Splits contract markdown into sections at headings of level <= max_level ('#' and '##' by default).
+    Returns a list of dicts with id, title, level, text and hash. Text before the first heading becomes
+    the 'preamble' section. Joining every section's text reproduces the original document exactly.
+    """
+    boundaries = [m for m in HEADING_RE.finditer(markdown_text) if len(m.group(1)) <= max_level]
+
+    sections = []
+    seen_ids = {}
+
+    def add_section(section_id, title, level, text):
+        count = seen_ids.get(section_id, 0)
+        seen_ids[section_id] = count + 1
+        if count:
+            section_id = f"{section_id}-{count + 1}"  # ✅ Keep IDs unique for repeated headings
+        sections.append({"id": section_id, "title": title, "level": level, "text": text, "hash": hash_text(text)})
+
+    first_start = boundaries[0].start() if boundaries else len(markdown_text)
+    if markdown_text[:first_start]:
+        add_section(PREAMBLE_ID, "", 0, markdown_text[:first_start])
+
+    for i, match in enumerate(boundaries):
+        end = boundaries[i + 1].start() if i + 1 < len(boundaries) else len(markdown_text)
+        title = match.group(2).replace("**", "").strip()
+        add_section(slugify(title), title, len(match.group(1)), markdown_text[match.start():end])
+
+    return sections
+
+
+def join_sections(sections):
+    """Inverse of split_sections."""
+    return "".join(section["text"] for section in sections)
+
+
+class PatchError(ValueError):
+    """Raised when a section edit cannot be validated or applied."""
+
+
+def apply_unified_diff(text, diff):
+    """
+    Applies the hunks of a unified diff to text. Hunks are located by their context/removed lines
+    rather than line numbers, so diffs against a single section apply cleanly. Hunks that only add
+    lines have nothing to match and are placed by the line number in their header.
+    """
+    lines = text.splitlines(keepends=True)
+    hunks, current = [], None
+    for line in diff.splitlines():
+        if line.startswith(("---", "+++")):
+            continue
+        if line.startswith("@@"):
+            header = HUNK_HEADER_RE.match(line)
+            current = ([], [], int(header.group(1)) if header else None)
+            hunks.append(current)
+            continue
+        if current is None:
+            continue
+        marker, body = (line[:1], line[1:]) if line else (" ", "")
+        if marker in (" ", "-"):
+            current[0].append(body)
+        if marker in (" ", "+"):
+            current[1].append(body)
+
+    if not hunks:
+        raise PatchError("Diff contains no hunks.")
+
+    position, offset = 0, 0
+    for old_block, new_block, old_start in hunks:
+        if not old_block:
+            # ✅ A pure insertion has no lines to match; "-N,0" means "after line N" of the original text
+            if old_start is None:
+                raise PatchError("Hunk adds lines without context or line numbers.")
+            start = old_start + offset
+            if not position <= start <= len(lines):
+                raise PatchError(f"Hunk inserts at line {old_start}, outside the text.")
+        else:
+            stripped = [line.rstrip("\r\n") for line in lines]
+            for start in range(position, len(stripped) - len(old_block) + 1):
+                if stripped[start:start + len(old_block)] == old_block:
+                    break
+            else:
+                raise PatchError(f"Hunk context not found: {old_block[:2]!r}")
+        if start and not lines[start - 1].endswith("\n"):
+            lines[start - 1] += "\n"
+        lines[start:start + len(old_block)] = [line + "\n" for line in new_block]
+        position = start + len(new_block)
+        offset += len(new_block) - len(old_block)
+
+    patched = "".join(lines)
+    if not text.endswith("\n"):
+        patched = patched.rstrip("\n")
+    return patched
+
+
+def apply_section_edits(sections, edits):
+    """
+    Applies structured edits ({"section_id", "replacement"} or {"section_id", "diff"}) to split sections.
+    Every edit is validated before anything is changed; a PatchError is raised on the first bad edit.
+    Returns the new list of sections.
+    """
+    by_id = {section["id"]: dict(section) for section in sections}
+    new_texts = {}
+
+    for edit in edits:
+        section_id = str(edit.get("section_id", "")).strip()
+        if section_id not in by_id:
+            raise PatchError(f"Unknown section ID: {section_id!r}")
+        if section_id in new_texts:
+            raise PatchError(f"Section {section_id!r} edited more than once.")
+
+        original = by_id[section_id]["text"]
+        if edit.get("diff"):
+            updated = apply_unified_diff(original, edit["diff"])
+        elif edit.get("replacement", "").strip():
+            updated = edit["replacement"].strip("\n")
+            heading = original.lstrip("\n").splitlines()[0] if by_id[section_id]["level"] else ""
+            # ✅ Keep the original heading when the model returns only the section body
+            if heading and not HEADING_RE.match(updated.splitlines()[0]):
+                updated = f"{heading}\n{updated}"
+            trailing = original[len(original.rstrip()):]
+            updated = updated.rstrip() + (trailing or "\n")
+        else:
+            raise PatchError(f"Edit for {section_id!r} has neither 'replacement' nor 'diff'.")
+
+        new_texts[section_id] = updated
+
+    patched = []
+    for section in sections:
+        section = dict(section)
+        if section["id"] in new_texts:
+            section["text"] = new_texts[section["id"]]
+            section["hash"] = hash_text(section["text"])
+        patched.append(section)
+    return patched
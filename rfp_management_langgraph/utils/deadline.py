@@ -0,0 +1,148 @@
+import contextvars
+import os
+import time
+from functools import wraps
+
+SAFETY_MARGIN_SECONDS = 5.0
+LOW_BUDGET_FRACTION = 0.25  # Below this share of the run budget, steps switch to their cheaper strategy
+DEGRADED_CHUNKS_PER_SUPPLIER = int(os.getenv("DEGRADED_CHUNKS_PER_SUPPLIER", "12"))
+MIN_DEGRADED_OUTPUT_TOKENS = 256
+
+_current_deadline = contextvars.ContextVar("run_deadline", default=None)
+_current_degradations = contextvars.ContextVar("deadline_degradations", default=None)
+
+
+class RunDeadline:
+    def __init__(self, deadline_at, budget_s):
+        self.deadline_at = deadline_at
+        self.budget_s = budget_s
+
+    def remaining(self):
+        """Seconds left before the deadline, minus the safety margin kept for saving results."""
+        return self.deadline_at - time.time() - SAFETY_MARGIN_SECONDS
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def low(self):
+        """True once less than LOW_BUDGET_FRACTION of the run budget is left."""
+        return self.remaining() < LOW_BUDGET_FRACTION * self.budget_s
+
+
+def start_deadline(state, seconds):
+    """Sets a run-level deadline of seconds from now in state["deadline"], where every node wrapper picks it up."""
+    state["deadline"] = {"budget_s": seconds, "deadline_at": time.time() + seconds, "nodes": {}, "skipped": []}
+    return state["deadline"]
+
+
+def current_deadline():
+    """The RunDeadline of the node running in this context, or None for runs without a deadline."""
+    return _current_deadline.get()
+
+
+def remaining_seconds():
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline else None
+
+
+def deadline_from_state(state):
+    """RunDeadline from a graph state, for code that runs outside a node (e.g. conditional edge routers)."""
+    report = state.get("deadline")
+    return RunDeadline(report["deadline_at"], report["budget_s"]) if report else None
+
+
+def degrade(reason):
+    """Records that the current node took a cheaper strategy because of the deadline."""
+    degradations = _current_degradations.get()
+    if degradations is not None and reason not in degradations:
+        degradations.append(reason)
+        print(f"🐢 Degraded ({remaining_seconds():.0f}s left): {reason}")
+
+
+def chunk_limit():
+    """Chunks to keep per supplier: all of them, or DEGRADED_CHUNKS_PER_SUPPLIER once the budget is low."""
+    deadline = _current_deadline.get()
+    return DEGRADED_CHUNKS_PER_SUPPLIER if deadline and deadline.low() else None
+
+
+def limit_chunks(documents, label):
+    """Truncates a supplier's chunks to chunk_limit(), recording the degradation when anything is dropped."""
+    limit = chunk_limit()
+    if limit is None or len(documents) <= limit:
+        return documents
+    degrade(f"{label}: used the first {limit} chunks per supplier")
+    return documents[:limit]
+
+
+def fit_output_tokens(output_tokens, estimated_latency_s):
+    """
+    Generation limit that fits the remaining budget: output_tokens scaled down by remaining / estimated
+    latency (never below MIN_DEGRADED_OUTPUT_TOKENS). Returns None when no cap is needed.
+    """
+    remaining = remaining_seconds()
+    if remaining is None or not estimated_latency_s or estimated_latency_s <= remaining:
+        return None
+    tokens = int(output_tokens * max(remaining, 0) / estimated_latency_s) // 128 * 128  # Few distinct caps, few cached clients
+    return max(MIN_DEGRADED_OUTPUT_TOKENS, tokens)
+
+
+def deadline_node(node_name, node_fn):
+    """
+    Wraps a graph node so that it runs under the run's deadline. The deadline is started from
+    state["config"]["deadline_s"] by the first node, carried in state["deadline"] and exposed to tools through
+    a context variable. Records per node: runs, seconds used, share of the budget, seconds left and the
+    degradations taken; a completed node that degraded is marked "degraded" in state["steps"].
+    """
+
+    @wraps(node_fn)
+    def wrapper(state):
+        report = state.get("deadline")
+        if report is None and (state.get("config") or {}).get("deadline_s"):
+            report = start_deadline(state, float(state["config"]["deadline_s"]))
+        if not report:
+            return node_fn(state)
+
+        deadline = RunDeadline(report["deadline_at"], report["budget_s"])
+        degradations = []
+        deadline_token = _current_deadline.set(deadline)
+        degradations_token = _current_degradations.set(degradations)
+        remaining_at_start = deadline.remaining()
+        started = time.perf_counter()
+        try:
+            result = node_fn(state)
+        finally:
+            _current_deadline.reset(deadline_token)
+            _current_degradations.reset(degradations_token)
+
+        used = time.perf_counter() - started
+        entry = report["nodes"].setdefault(node_name, {"runs": 0, "used_s": 0.0, "degraded": []})
+        entry["runs"] += 1
+        entry["used_s"] = round(entry["used_s"] + used, 2)
+        entry["budget_share"] = round(entry["used_s"] / report["budget_s"], 3)
+        entry["remaining_at_start_s"] = round(remaining_at_start, 1)
+        entry["remaining_s"] = round(deadline.remaining(), 1)
+        entry["degraded"] += [reason for reason in degradations if reason not in entry["degraded"]]
+        if degradations and result["steps"].get(node_name) == "completed":
+            result["steps"][node_name] = "degraded"
+        print(f"⏱ {node_name} used {used:.1f}s ({entry['budget_share']:.0%} of budget), {entry['remaining_s']:.0f}s left")
+        return result
+
+    return wrapper
+
+
+def format_deadline_report(report):
+    """Markdown table of per-node budget use from state["deadline"]."""
+    lines = [
+        f"# Deadline Report ({report['budget_s']:.0f}s budget)",
+        "",
+        "| Node | Runs | Used (s) | Share of budget | Left at start (s) | Left after (s) | Degradations |",
+        "|------|------|----------|-----------------|-------------------|----------------|--------------|",
+    ]
+    for name, entry in report["nodes"].items():
+        lines.append(
+            f"| {name} | {entry['runs']} | {entry['used_s']} | {entry['budget_share']:.0%} | {entry['remaining_at_start_s']} "
+            f"| {entry['remaining_s']} | {'; '.join(entry['degraded']) or '-'} |"
+        )
+    for skipped in report["skipped"]:
+        lines.append(f"- ⏭ Skipped: {skipped}")
+    return "\n".join(lines)
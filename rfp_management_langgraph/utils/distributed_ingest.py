@@ -0,0 +1,453 @@
+"""
+Distributed PDF ingestion through a shared, persistent SQLite task queue.
+
+    python -m utils.distributed_ingest enqueue ./data/proposals/            # coordinator: one task per PDF
+    python -m utils.distributed_ingest worker --processes 4                 # on every host that sees the queue file
+    python -m utils.distributed_ingest writer                               # exactly one, next to the vector store
+    python -m utils.distributed_ingest status
+    python -m utils.distributed_ingest run ./data/proposals/ --processes 4  # all of the above on one host
+
+Workers lease a task, extract (through the PDF text cache), chunk and embed it, and park the result in the
+queue. A lease that is not renewed expires, so a task held by a crashed worker is picked up again; failed
+tasks are retried with backoff up to MAX_ATTEMPTS. A single writer (guarded by its own lease) commits the
+embedded chunks to the rfp_proposals store and the BM25 index in large batches.
+Queues on a shared filesystem need working file locks and INGEST_QUEUE_JOURNAL_MODE=DELETE (WAL needs shared memory).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+from utils.vector_store import MAX_WRITE_BATCH_SIZE
+
+INGEST_QUEUE_PATH = "./ingest_tasks.sqlite3"
+JOURNAL_MODE = os.getenv("INGEST_QUEUE_JOURNAL_MODE", "WAL")
+LEASE_SECONDS = float(os.getenv("INGEST_LEASE_SECONDS", "300"))
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 30
+EMBED_BATCH_SIZE = 100
+IDLE_POLL_SECONDS = 2.0
+PROGRESS_WINDOW_SECONDS = 300
+WRITER_LEASE = "writer"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_tasks (
+    id TEXT PRIMARY KEY,           -- sha256 of the PDF, so a re-enqueued or duplicate file is ingested once
+    file_path TEXT NOT NULL,
+    status TEXT NOT NULL,          -- queued | leased | embedded | stored | failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    available_at REAL NOT NULL,
+    chunks INTEGER,
+    payload BLOB,                  -- zlib JSON {ids, documents, embeddings, metadatas, sidecar} until the writer commits it
+    error TEXT,
+    created_at REAL NOT NULL,
+    embedded_at REAL,
+    stored_at REAL
+);
+CREATE INDEX IF NOT EXISTS ingest_tasks_status ON ingest_tasks (status, available_at);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class IngestQueue:
+    """
+    Per-PDF ingestion tasks with leases. Like JobQueue, every operation opens its own short-lived
+    connection, so one file can be shared by threads, processes and (on a shared filesystem) hosts.
+    """
+
+    def __init__(self, path=INGEST_QUEUE_PATH):
+        self.path = path
+        with self._connection() as conn:
+            conn.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """A write transaction taken up front (BEGIN IMMEDIATE), so two claimers never read the same row."""
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, file_paths):
+        """Adds one task per PDF not seen before (by content). Returns how many were added."""
+        from utils.pdf_text_cache import file_hash
+
+        now = time.time()
+        rows = [(file_hash(path), os.path.abspath(path), now, now) for path in file_paths]
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO ingest_tasks (id, file_path, status, available_at, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                rows,
+            )
+            return conn.total_changes - before
+
+    def retry_failed(self):
+        """Puts failed tasks back in the queue with a fresh attempt budget. Returns how many."""
+        with self._connection() as conn:
+            return conn.execute(
+                "UPDATE ingest_tasks SET status = 'queued', attempts = 0, error = NULL, available_at = ? WHERE status = 'failed'",
+                (time.time(),),
+            ).rowcount
+
+    def claim(self, owner):
+        """
+        Leases the oldest available task to owner: a queued task whose backoff has passed, or a leased task
+        whose lease expired (its worker died). Tasks that used up MAX_ATTEMPTS are failed instead.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE ingest_tasks SET status = 'failed', error = COALESCE(error, 'Lease expired ' || attempts || ' times'), "
+                "lease_owner = NULL WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= ?",
+                (now, MAX_ATTEMPTS),
+            )
+            row = conn.execute(
+                "SELECT id, file_path, attempts FROM ingest_tasks WHERE (status = 'queued' AND available_at <= ?) "
+                "OR (status = 'leased' AND lease_expires_at < ?) ORDER BY created_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE ingest_tasks SET status = 'leased', lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (owner, now + LEASE_SECONDS, row["id"]),
+            )
+        return {"id": row["id"], "file_path": row["file_path"], "attempt": row["attempts"] + 1}
+
+    def heartbeat(self, task_id, owner):
+        """Extends the lease. False means it expired and the task was leased to another worker meanwhile."""
+        with self._connection() as conn:
+            return conn.execute(
+                "UPDATE ingest_tasks SET lease_expires_at = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (time.time() + LEASE_SECONDS, task_id, owner),
+            ).rowcount == 1
+
+    def complete(self, task_id, owner, result):
+        """Parks the embedded chunks for the writer. Returns False if owner no longer holds the lease."""
+        payload = zlib.compress(json.dumps(result).encode("utf-8"))
+        with self._connection() as conn:
+            return conn.execute(
+                "UPDATE ingest_tasks SET status = 'embedded', payload = ?, chunks = ?, embedded_at = ?, error = NULL, "
+                "lease_owner = NULL, lease_expires_at = NULL WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (payload, len(result["ids"]), time.time(), task_id, owner),
+            ).rowcount == 1
+
+    def fail(self, task_id, owner, error):
+        """Requeues the task with exponential backoff, or fails it once MAX_ATTEMPTS are used up."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM ingest_tasks WHERE id = ? AND lease_owner = ? AND status = 'leased'", (task_id, owner),
+            ).fetchone()
+            if row is None:
+                return
+            if row["attempts"] >= MAX_ATTEMPTS:
+                conn.execute(
+                    "UPDATE ingest_tasks SET status = 'failed', error = ?, lease_owner = NULL, lease_expires_at = NULL WHERE id = ?",
+                    (error, task_id),
+                )
+            else:
+                conn.execute(
+                    "UPDATE ingest_tasks SET status = 'queued', error = ?, available_at = ?, lease_owner = NULL, "
+                    "lease_expires_at = NULL WHERE id = ?",
+                    (error, time.time() + RETRY_BACKOFF_SECONDS * 2 ** (row["attempts"] - 1), task_id),
+                )
+
+    def embedded(self, max_chunks=MAX_WRITE_BATCH_SIZE):
+        """Oldest embedded tasks, at least one and otherwise up to max_chunks chunks: [(task_id, result)]."""
+        with self._connection() as conn:
+            # ✅ Pick the batch from chunk counts first; only its payloads are read and decompressed
+            rows = conn.execute("SELECT id, chunks FROM ingest_tasks WHERE status = 'embedded' ORDER BY embedded_at").fetchall()
+            task_ids, total = [], 0
+            for row in rows:
+                if task_ids and total + row["chunks"] > max_chunks:
+                    break
+                task_ids.append(row["id"])
+                total += row["chunks"]
+            tasks = []
+            for task_id in task_ids:
+                payload = conn.execute("SELECT payload FROM ingest_tasks WHERE id = ?", (task_id,)).fetchone()["payload"]
+                tasks.append((task_id, json.loads(zlib.decompress(payload))))
+        return tasks
+
+    def mark_stored(self, task_ids):
+        with self._connection() as conn:
+            conn.executemany(
+                "UPDATE ingest_tasks SET status = 'stored', payload = NULL, stored_at = ? WHERE id = ?",
+                [(time.time(), task_id) for task_id in task_ids],
+            )
+
+    def acquire_lease(self, name, owner):
+        """Takes (or renews) a named lease; False while another owner holds an unexpired one."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row["owner"] != owner and row["expires_at"] >= now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)", (name, owner, now + LEASE_SECONDS))
+        return True
+
+    def release_lease(self, name, owner):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def outstanding(self):
+        """Tasks not yet stored or failed."""
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM ingest_tasks WHERE status IN ('queued', 'leased', 'embedded')").fetchone()[0]
+
+    def progress(self):
+        """Counts per status, stored chunks, recent throughput, ETA, active leases and failures."""
+        now = time.time()
+        with self._connection() as conn:
+            counts = {row["status"]: row["n"] for row in conn.execute("SELECT status, COUNT(*) AS n FROM ingest_tasks GROUP BY status")}
+            stored_chunks = conn.execute("SELECT COALESCE(SUM(chunks), 0) FROM ingest_tasks WHERE status = 'stored'").fetchone()[0]
+            recent = conn.execute(
+                "SELECT COUNT(*) FROM ingest_tasks WHERE status = 'stored' AND stored_at >= ?", (now - PROGRESS_WINDOW_SECONDS,),
+            ).fetchone()[0]
+            retried = conn.execute("SELECT COUNT(*) FROM ingest_tasks WHERE attempts > 1").fetchone()[0]
+            leases = {
+                row["lease_owner"]: row["n"] for row in conn.execute(
+                    "SELECT lease_owner, COUNT(*) AS n FROM ingest_tasks WHERE status = 'leased' AND lease_expires_at >= ? GROUP BY lease_owner",
+                    (now,),
+                )
+            }
+            failures = [dict(row) for row in conn.execute(
+                "SELECT file_path, attempts, error FROM ingest_tasks WHERE status = 'failed' ORDER BY created_at LIMIT 20",
+            )]
+        total = sum(counts.values())
+        remaining = total - counts.get("stored", 0) - counts.get("failed", 0)
+        files_per_minute = recent * 60 / PROGRESS_WINDOW_SECONDS
+        return {
+            "total": total,
+            "counts": counts,
+            "stored_chunks": stored_chunks,
+            "retried": retried,
+            "files_per_minute": round(files_per_minute, 1),
+            "eta_minutes": round(remaining / files_per_minute, 1) if remaining and files_per_minute else None,
+            "active_leases": leases,
+            "failures": failures,
+        }
+
+
+def format_progress(progress):
+    counts = progress["counts"]
+    lines = [
+        f"📊 {counts.get('stored', 0)}/{progress['total']} PDFs stored ({progress['stored_chunks']} chunks) | "
+        + " | ".join(f"{status}: {counts.get(status, 0)}" for status in ("queued", "leased", "embedded", "failed"))
+        + f" | retried: {progress['retried']}",
+        f"   {progress['files_per_minute']} PDFs/min over the last {PROGRESS_WINDOW_SECONDS // 60} min"
+        + (f", ETA ~{progress['eta_minutes']} min" if progress["eta_minutes"] is not None else ""),
+    ]
+    for owner, leased in progress["active_leases"].items():
+        lines.append(f"   🔒 {owner}: {leased} task(s)")
+    for failure in progress["failures"]:
+        lines.append(f"   ❌ {failure['file_path']} after {failure['attempts']} attempt(s): {failure['error']}")
+    return "\n".join(lines)
+
+
+def embed_task(queue, task, owner, text_splitter, embeddings):
+    """
+    Extracts, chunks and embeds one PDF, renewing the lease between embedding batches. Nothing is written
+    on the worker's host: the fields sidecar travels in the result and is saved by the writer.
+    """
+    from tools.pdf_vectorizer import extract_pdf
+
+    filename = os.path.basename(task["file_path"])
+    document_metadata, fields, metadata, chunks = extract_pdf(task["file_path"], text_splitter, write_cache=False)
+    vectors = []
+    for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+        if not queue.heartbeat(task["id"], owner):
+            raise TimeoutError(f"Lost the lease on {filename}")
+        vectors.extend(embeddings.embed_documents(chunks[start:start + EMBED_BATCH_SIZE]))
+    return {
+        "ids": [f"{filename}_chunk_{i}" for i in range(len(chunks))],
+        "documents": chunks,
+        "embeddings": vectors,
+        "metadatas": [metadata] * len(chunks),
+        "sidecar": {"supplier": document_metadata["supplier"], "source_file": filename, "metadata": document_metadata, "fields": fields},
+    }
+
+
+def run_worker(queue_path=INGEST_QUEUE_PATH, follow=False):
+    """Processes tasks until the queue has nothing left to lease (or forever with follow). Returns tasks embedded."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_openai import OpenAIEmbeddings
+    from tools.pdf_vectorizer import CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL
+
+    queue, owner = IngestQueue(queue_path), worker_id()
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+    done = 0
+    while True:
+        task = queue.claim(owner)
+        if task is None:
+            progress = queue.progress()["counts"]
+            if not follow and not progress.get("queued") and not progress.get("leased"):
+                break
+            time.sleep(IDLE_POLL_SECONDS)
+            continue
+        started = time.perf_counter()
+        try:
+            result = embed_task(queue, task, owner, text_splitter, embeddings)
+        except Exception as e:
+            queue.fail(task["id"], owner, f"{type(e).__name__}: {e}")
+            print(f"❌ [{owner}] {task['file_path']} (attempt {task['attempt']}): {e}")
+            continue
+        if queue.complete(task["id"], owner, result):
+            done += 1
+            print(f"🧩 [{owner}] Embedded {len(result['ids'])} chunks of {os.path.basename(task['file_path'])} in {time.perf_counter() - started:.1f}s")
+        else:
+            print(f"⚠️ [{owner}] Lease on {task['file_path']} expired before completion; result discarded")
+    print(f"✅ [{owner}] Worker finished after {done} task(s)")
+    return done
+
+
+def run_writer(queue_path=INGEST_QUEUE_PATH, follow=False, batch_chunks=MAX_WRITE_BATCH_SIZE, workers=None):
+    """
+    The single writer: commits embedded chunks to the vector store and BM25 index in batches of about
+    batch_chunks, and saves each PDF's fields sidecar, until no task is outstanding (or forever with follow).
+    With workers (local worker processes), it also stops once they have all exited and nothing embedded is
+    left. Writes are idempotent by chunk id, so a batch replayed after a crash before mark_stored is harmless.
+    Returns chunks written.
+    """
+    from utils.bm25_index import BM25Index
+    from utils.field_extractor import save_supplier_fields
+    from utils.vector_store import get_vector_store
+
+    queue, owner = IngestQueue(queue_path), worker_id()
+    if not queue.acquire_lease(WRITER_LEASE, owner):
+        raise RuntimeError(f"Another writer holds the lease on {queue_path}")
+    vector_store, bm25_index = get_vector_store(), BM25Index.load()
+    written, last_report = 0, 0.0
+    try:
+        while True:
+            if not queue.acquire_lease(WRITER_LEASE, owner):
+                raise RuntimeError("Writer lease was taken over by another writer")
+            workers_exited = workers is not None and not any(worker.is_alive() for worker in workers)
+            tasks = queue.embedded(batch_chunks)
+            if not tasks:
+                if not follow and not queue.outstanding():
+                    break
+                if workers_exited:
+                    print(f"⚠️ All workers exited with {queue.outstanding()} task(s) outstanding")
+                    break
+                if time.time() - last_report > 30:
+                    print(format_progress(queue.progress()))
+                    last_report = time.time()
+                time.sleep(IDLE_POLL_SECONDS)
+                continue
+
+            batch = {key: [] for key in ("ids", "documents", "embeddings", "metadatas")}
+            for _, result in tasks:
+                for key in batch:
+                    batch[key].extend(result[key])
+            vector_store.add(**batch)
+            bm25_index.add(batch["ids"], batch["documents"], batch["metadatas"])
+            bm25_index.save()
+            for _, result in tasks:
+                sidecar = result["sidecar"]
+                save_supplier_fields(sidecar["supplier"], sidecar["source_file"], sidecar["metadata"], sidecar["fields"])
+            queue.mark_stored([task_id for task_id, _ in tasks])
+            written += len(batch["ids"])
+            print(f"💾 Stored {len(batch['ids'])} chunks from {len(tasks)} PDF(s) ({written} this session)")
+    finally:
+        queue.release_lease(WRITER_LEASE, owner)
+    return written
+
+
+def start_workers(queue_path, processes, follow=False):
+    workers = [multiprocessing.Process(target=run_worker, args=(queue_path, follow), name=f"ingest-worker-{i + 1}") for i in range(processes)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def run_ingestion(pdf_dir, queue_path=INGEST_QUEUE_PATH, processes=4):
+    """Coordinator for one host: enqueues the directory, runs worker processes and the writer. Returns progress()."""
+    queue = IngestQueue(queue_path)
+    pdfs = [os.path.join(pdf_dir, name) for name in sorted(os.listdir(pdf_dir)) if name.endswith(".pdf")]
+    print(f"📥 Enqueued {queue.enqueue(pdfs)} new of {len(pdfs)} PDF(s)")
+    workers = start_workers(queue_path, processes)
+    try:
+        run_writer(queue_path, workers=workers)
+    finally:
+        for worker in workers:
+            worker.join()
+    progress = queue.progress()
+    print(format_progress(progress))
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed PDF ingestion through a shared task queue.")
+    parser.add_argument("--queue", default=INGEST_QUEUE_PATH, help="SQLite file holding the task queue")
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue = commands.add_parser("enqueue")
+    enqueue.add_argument("pdf_dir")
+    worker = commands.add_parser("worker")
+    worker.add_argument("--processes", type=int, default=1)
+    worker.add_argument("--follow", action="store_true", help="Keep waiting for new tasks instead of exiting when drained")
+    writer = commands.add_parser("writer")
+    writer.add_argument("--follow", action="store_true")
+    writer.add_argument("--batch-chunks", type=int, default=MAX_WRITE_BATCH_SIZE)
+    commands.add_parser("status")
+    commands.add_parser("retry-failed")
+    run = commands.add_parser("run")
+    run.add_argument("pdf_dir")
+    run.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        pdfs = [os.path.join(args.pdf_dir, name) for name in sorted(os.listdir(args.pdf_dir)) if name.endswith(".pdf")]
+        print(f"📥 Enqueued {IngestQueue(args.queue).enqueue(pdfs)} new of {len(pdfs)} PDF(s)")
+    elif args.command == "worker":
+        if args.processes == 1:
+            run_worker(args.queue, args.follow)
+        else:
+            for process in start_workers(args.queue, args.processes, args.follow):
+                process.join()
+    elif args.command == "writer":
+        run_writer(args.queue, args.follow, args.batch_chunks)
+    elif args.command == "status":
+        print(format_progress(IngestQueue(args.queue).progress()))
+    elif args.command == "retry-failed":
+        print(f"↩️ Requeued {IngestQueue(args.queue).retry_failed()} failed task(s)")
+    elif args.command == "run":
+        run_ingestion(args.pdf_dir, args.queue, args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint, for exercising the LLM gateway without quota.
+
+    python -m utils.fake_llm_server --port 8089 --latency 0.3 --throttle-rate 0.2 --capacity 8
+    LLM_GATEWAY_BASE_URL=http://127.0.0.1:8089/v1 python app.py
+
+Requests beyond --capacity concurrent calls, plus a random --throttle-rate share of the rest, get 429.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(latency, throttle_rate, error_rate, capacity):
+    in_flight = {"count": 0}
+    lock = threading.Lock()
+
+    class FakeChatCompletions(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            # ✅ The random throttle is decided before a slot is taken, so throttled calls never hold one
+            throttled = random.random() < throttle_rate
+            if not throttled:
+                with lock:
+                    throttled = in_flight["count"] >= capacity
+                    if not throttled:
+                        in_flight["count"] += 1
+            if throttled:
+                self._reply(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}, {"retry-after": "0.2"})
+                return
+            try:
+                time.sleep(latency)
+                if random.random() < error_rate:
+                    self._reply(503, {"error": {"message": "Service unavailable", "type": "server_error"}})
+                    return
+                prompt = " ".join(str(m.get("content", "")) for m in request.get("messages", []))
+                prompt_tokens, completion_tokens = max(1, len(prompt) // 4), 8
+                self._reply(200, {
+                    "id": f"chatcmpl-fake-{random.getrandbits(32):x}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "fake"),
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": f"fake response ({prompt_tokens} prompt tokens)"}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+                })
+            finally:
+                with lock:
+                    in_flight["count"] -= 1
+
+    return FakeChatCompletions
+
+
+def make_server(port=8089, latency=0.3, throttle_rate=0.0, error_rate=0.0, capacity=8):
+    """The fake endpoint's server, not yet serving; port 0 picks a free port (see server.server_address)."""
+    return ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, throttle_rate, error_rate, capacity))
+
+
+def serve(port=8089, latency=0.3, throttle_rate=0.0, error_rate=0.0, capacity=8):
+    server = make_server(port, latency, throttle_rate, error_rate, capacity)
+    print(f"Fake chat completions endpoint on http://127.0.0.1:{server.server_address[1]}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions endpoint.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds per successful call.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of calls answered with 429.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with 503.")
+    parser.add_argument("--capacity", type=int, default=8, help="Concurrent calls served before answering 429.")
+    args = parser.parse_args()
+    serve(args.port, args.latency, args.throttle_rate, args.error_rate, args.capacity)
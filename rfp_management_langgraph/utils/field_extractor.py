@@ -0,0 +1,135 @@
+import json
+import os
+import re
+from utils.artifact_store import atomic_write, file_lock
+from utils.contract_sections import slugify
+
+SUPPLIER_FIELDS_DIR = "./outputs/supplier_fields/"
+
+_AMOUNT = r"[$€£]\s?\d[\d,]*(?:\.\d+)?(?:\s?(?:[kKmM]\b|million|thousand))?"
+_UNITS = r"TB|GB|vCPU|CPU|core|hour|hr|user|seat|instance|node|license|model execution|execution|policy package|request|month|year"
+
+# ✅ One precompiled alternation, scanned once per page. Specific patterns come first so they win
+# over the generic currency amount at the same position.
+FIELD_PATTERN = re.compile(
+    rf"""
+    (?P<setup_fee>(?:setup|set-up|implementation|onboarding)\s+fees?\b[^$€£\n]{{0,40}}?(?P<setup_amount>{_AMOUNT}))
+    |(?P<unit_price>(?P<unit_amount>{_AMOUNT})\s*(?:/|per)\s*(?P<unit>{_UNITS})(?:\s*(?:/|per)\s*(?P<period>month|hour|year))?)
+    |(?P<contract_term>\b(?:contract|terms?|lock-in|lock\s+in|commitment|minimum)\b[^.\n\d]{{0,40}}?(?P<term_value>\d{{1,3}})[\s-]*(?P<term_unit>months?|years?)\b)
+    |(?P<sla>(?:uptime|availability|SLA)[^%\n\d]{{0,30}}?(?P<sla_value>\d{{2}}(?:\.\d+)?)\s?%|(?P<sla_value_pre>\d{{2}}(?:\.\d+)?)\s?%\s*(?:uptime|availability|SLA))
+    |(?P<currency_amount>{_AMOUNT})
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+_MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "m": 1e6, "million": 1e6}
+
+
+def parse_amount(text):
+    """'$1,200.50' -> 1200.5, '€2.5m' -> 2500000.0"""
+    match = re.search(r"(\d[\d,]*(?:\.\d+)?)\s?([kKmM]\b|million|thousand)?", text)
+    value = float(match.group(1).replace(",", ""))
+    return value * _MULTIPLIERS.get((match.group(2) or "").lower(), 1)
+
+
+def _currency(text):
+    return {"$": "USD", "€": "EUR", "£": "GBP"}.get(text.strip()[:1], None)
+
+
+def extract_fields(pages):
+    """
+    Single-pass extraction of pricing and contract fields from per-page text.
+    Returns a list of {"field", "value", "unit", "currency", "text", "page"} dicts (pages are 1-based).
+    """
+    fields = []
+    for page_number, page_text in enumerate(pages, start=1):
+        for match in FIELD_PATTERN.finditer(page_text):
+            groups = match.groupdict()
+            field = {"text": " ".join(match.group(0).split()), "page": page_number, "unit": None, "currency": None}
+
+            if groups["setup_fee"]:
+                field.update(field="setup_fee", value=parse_amount(groups["setup_amount"]), currency=_currency(groups["setup_amount"]))
+            elif groups["unit_price"]:
+                unit = groups["unit"] + (f"/{groups['period']}" if groups["period"] else "")
+                field.update(field="unit_price", value=parse_amount(groups["unit_amount"]), unit=unit, currency=_currency(groups["unit_amount"]))
+            elif groups["contract_term"]:
+                months = int(groups["term_value"]) * (12 if groups["term_unit"].lower().startswith("year") else 1)
+                field.update(field="contract_term", value=months, unit="months")
+            elif groups["sla"]:
+                field.update(field="sla_uptime", value=float(groups["sla_value"] or groups["sla_value_pre"]), unit="%")
+            elif groups["currency_amount"]:
+                field.update(field="currency_amount", value=parse_amount(groups["currency_amount"]), currency=_currency(groups["currency_amount"]))
+            else:
+                continue
+            fields.append(field)
+    return fields
+
+
+def summarize_fields(fields):
+    """
+    Flattens extracted fields into scalar metadata (vector stores only accept str/int/float/bool values).
+    """
+    def values(kind):
+        return [f["value"] for f in fields if f["field"] == kind]
+
+    summary = {"currency_amount_count": len(values("currency_amount")) + len(values("unit_price")) + len(values("setup_fee"))}
+    if values("setup_fee"):
+        summary["setup_fee"] = values("setup_fee")[0]
+    unit_prices = [f for f in fields if f["field"] == "unit_price"]
+    units = {f["unit"] for f in unit_prices}
+    if len(units) == 1:  # A minimum across per-hour and per-seat prices would mean nothing
+        summary["min_unit_price"] = min(f["value"] for f in unit_prices)
+        summary["unit_price_unit"] = units.pop()
+    if values("contract_term"):
+        summary["contract_term_months"] = max(values("contract_term"))
+    if values("sla_uptime"):
+        summary["sla_uptime_pct"] = max(values("sla_uptime"))
+    return summary
+
+
+def sidecar_path(supplier):
+    return os.path.join(SUPPLIER_FIELDS_DIR, f"{slugify(supplier)}.json")
+
+
+def _read_sidecar(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_supplier_fields(supplier, source_file, metadata, fields):
+    """
+    Records one proposal's extracted fields (with page locations) in the supplier's JSON sidecar.
+    Entries are kept per source file, so several PDFs from one supplier (or several "Unknown" ones) add up.
+    """
+    path = sidecar_path(supplier)
+    with file_lock(f"{path}.lock"):  # Ingestion workers and writers may record the same supplier at once
+        payload = _read_sidecar(path) or {"supplier": supplier, "sources": {}}
+        payload["sources"][source_file] = {"metadata": metadata, "fields": fields}
+        atomic_write(path, json.dumps(payload, indent=2))
+
+
+def load_supplier_fields(supplier, field=None):
+    """
+    Reads a supplier's sidecar as {"supplier", "sources", "fields"}, where fields merges every source file's
+    fields (each tagged with its source_file). Optionally returns only fields of one kind (e.g. "unit_price").
+    """
+    payload = _read_sidecar(sidecar_path(supplier))
+    if payload is None:
+        return None if field is None else []
+    payload["fields"] = [
+        {**entry, "source_file": source_file}
+        for source_file, source in payload["sources"].items() for entry in source["fields"]
+    ]
+    return payload if field is None else [f for f in payload["fields"] if f["field"] == field]
+
+
+def sidecar_scoring_fields(supplier):
+    """Maps a supplier's sidecar to the typed scoring fields (setup_fee, lock_in_months, sla_uptime_pct)."""
+    payload = load_supplier_fields(supplier)
+    if not payload:
+        return {}
+    summary = summarize_fields(payload["fields"])
+    mapping = {"setup_fee": "setup_fee", "contract_term_months": "lock_in_months", "sla_uptime_pct": "sla_uptime_pct"}
+    return {target: summary[source] for source, target in mapping.items() if source in summary}
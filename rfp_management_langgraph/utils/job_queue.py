@@ -0,0 +1,128 @@
+import json
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+
+JOB_QUEUE_PATH = "./service_jobs.sqlite3"
+MAX_ATTEMPTS = 3  # Runs a job may start before an interruption fails it instead of requeueing it
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,          -- queued | running | succeeded | failed
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobQueue:
+    """
+    Persistent FIFO job queue in a local SQLite file. Safe to use from several threads: every operation
+    opens its own short-lived connection, and claiming a job is a single write transaction.
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH):
+        self.path = path
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, kind, payload):
+        job_id = uuid.uuid4().hex
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(payload), time.time()),
+            )
+        return job_id
+
+    def claim(self):
+        """Marks the oldest queued job as running and returns it, or None when the queue is empty."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            started_at = time.time()
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?", (started_at, row["id"]))
+            conn.execute("COMMIT")
+            return {**self._job(row), "status": "running", "started_at": started_at, "attempts": row["attempts"] + 1}
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def complete(self, job_id, result):
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'succeeded', result = ?, finished_at = ? WHERE id = ?",
+                (json.dumps(result, default=str), time.time(), job_id),
+            )
+
+    def fail(self, job_id, error):
+        with self._connection() as conn:
+            conn.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?", (error, time.time(), job_id))
+
+    def requeue_interrupted(self, max_attempts=MAX_ATTEMPTS):
+        """
+        Puts jobs left running by a previous process (crash or restart) back in the queue, and fails those that
+        already started max_attempts times, so a job that crashes the process cannot loop forever.
+        Returns (requeued, failed).
+        """
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            failed = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted ' || attempts || ' times', finished_at = ? "
+                "WHERE status = 'running' AND attempts >= ?",
+                (time.time(), max_attempts),
+            ).rowcount
+            requeued = conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'").rowcount
+            conn.execute("COMMIT")
+            return requeued, failed
+
+    def get(self, job_id):
+        with self._connection() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def list(self, limit=50):
+        with self._connection() as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._job(row, include_result=False) for row in rows]
+
+    def counts(self):
+        with self._connection() as conn:
+            return {row["status"]: row["n"] for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+    @staticmethod
+    def _job(row, include_result=True):
+        job = {key: row[key] for key in ("id", "kind", "status", "error", "attempts", "created_at", "started_at", "finished_at")}
+        job["payload"] = json.loads(row["payload"])
+        if include_result:
+            job["result"] = json.loads(row["result"]) if row["result"] else None
+        return job
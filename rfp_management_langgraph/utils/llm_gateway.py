@@ -0,0 +1,286 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+from utils.token_utils import DEFAULT_MODEL, count_tokens
+from utils.model_router import choose_model, record_route_latency
+from utils.batch_mode import active_batch_run, request_body, to_openai_messages
+from utils.run_planner import DryRunError, is_dry_run, record_planned_call, record_throughput, stub_response
+from utils.deadline import degrade, fit_output_tokens, remaining_seconds
+
+# ✅ Gateway settings (environment-driven so the whole workflow can point at a local fake endpoint)
+LLM_BASE_URL = os.getenv("LLM_GATEWAY_BASE_URL") or None  # e.g. http://127.0.0.1:8089/v1
+INITIAL_CONCURRENCY = float(os.getenv("LLM_GATEWAY_INITIAL_CONCURRENCY", "4"))
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = int(os.getenv("LLM_GATEWAY_MAX_CONCURRENCY", "32"))
+DECREASE_FACTOR = 0.5
+MAX_RETRIES = int(os.getenv("LLM_GATEWAY_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+REQUEST_TIMEOUT_SECONDS = 120
+MAX_RECORDED_LATENCIES = 1000
+
+# ✅ Priority classes: lower value is served first when callers are queued
+PRIORITIES = {"interactive": 0, "default": 1, "bulk": 2}
+THROTTLE_STATUS_CODES = {429}
+TRANSIENT_STATUS_CODES = {408, 409, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError", "Timeout"}
+
+
+def _status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def classify_error(error):
+    """Returns "throttled" (429), "transient" (timeouts, connection errors, 5xx) or None (not retryable)."""
+    status = _status_code(error)
+    if status in THROTTLE_STATUS_CODES or type(error).__name__ == "RateLimitError":
+        return "throttled"
+    if status in TRANSIENT_STATUS_CODES or type(error).__name__ in TRANSIENT_ERROR_NAMES:
+        return "transient"
+    return None
+
+
+def _prompt_text(input):
+    """Flattens a prompt value, string or message list into the text that would be sent."""
+    if hasattr(input, "to_string"):
+        return input.to_string()
+    if isinstance(input, str):
+        return input
+    return "\n".join(str(getattr(message, "content", message)) for message in input)
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit with a priority queue of waiters. Every successful call raises the limit by
+    1/limit (about +1 per window of calls), and every throttled call multiplies it by DECREASE_FACTOR.
+    Waiters are admitted in (priority, arrival) order whenever in-flight calls drop below the limit.
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def acquire(self, priority=PRIORITIES["default"]):
+        with self._condition:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            while self._waiters[0] != ticket or self.in_flight >= int(self.limit):
+                self._condition.wait()
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            self._condition.notify_all()
+
+    def release(self, outcome="success"):
+        with self._condition:
+            self.in_flight -= 1
+            if outcome == "success":
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            elif outcome == "throttled":
+                self.limit = max(self.minimum, self.limit * DECREASE_FACTOR)
+            self._condition.notify_all()
+
+    def snapshot(self):
+        with self._condition:
+            return {"limit": round(self.limit, 2), "in_flight": self.in_flight, "queued": len(self._waiters)}
+
+
+class LLMGateway:
+    """Process-wide entry point for chat model calls: admission control, retries and metrics."""
+
+    def __init__(self, base_url=LLM_BASE_URL, max_retries=MAX_RETRIES):
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.limiter = AdaptiveLimiter()
+        self._clients = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def client(self, model, temperature, **kwargs):
+        """One ChatOpenAI client per (model, temperature, options); the gateway owns retries, so the client's are off."""
+        key = (model, temperature, tuple(sorted(kwargs.items())))
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = ChatOpenAI(
+                    model=model, temperature=temperature, base_url=self.base_url,
+                    max_retries=0, timeout=REQUEST_TIMEOUT_SECONDS, **kwargs,
+                )
+            return self._clients[key]
+
+    def _record(self, model, priority, **updates):
+        with self._lock:
+            entry = self._metrics.setdefault((model, priority), {
+                "requests": 0, "succeeded": 0, "failed": 0, "retries": 0, "throttled": 0,
+                "latencies_ms": deque(maxlen=MAX_RECORDED_LATENCIES), "queue_ms": deque(maxlen=MAX_RECORDED_LATENCIES),
+            })
+            for key, value in updates.items():
+                if key in ("latency_ms", "wait_ms"):
+                    entry["latencies_ms" if key == "latency_ms" else "queue_ms"].append(value)
+                else:
+                    entry[key] += value
+
+    def call(self, model, priority, fn, on_success=None):
+        """
+        Runs fn() under the concurrency limit, retrying throttled and transient failures with jittered backoff.
+        on_success(result, latency_s) receives the latency of the successful attempt alone, without queue wait
+        or earlier attempts and backoff.
+        """
+        if is_dry_run():
+            raise DryRunError(f"Refusing a {model} call during a dry run")
+        priority_rank = PRIORITIES.get(priority, PRIORITIES["default"])
+        self._record(model, priority, requests=1)
+        for attempt in range(self.max_retries + 1):
+            queued = time.perf_counter()
+            self.limiter.acquire(priority_rank)
+            started = time.perf_counter()
+            self._record(model, priority, wait_ms=(started - queued) * 1000)
+            try:
+                result = fn()
+            except Exception as error:
+                kind = classify_error(error)
+                self.limiter.release("throttled" if kind == "throttled" else "error")
+                delay = _retry_after(error) or random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                remaining = remaining_seconds()
+                if kind is None or attempt == self.max_retries or (remaining is not None and delay >= remaining):
+                    self._record(model, priority, failed=1)
+                    raise
+                self._record(model, priority, retries=1, throttled=int(kind == "throttled"))
+                time.sleep(delay)
+                continue
+            latency_s = time.perf_counter() - started
+            self.limiter.release("success")
+            self._record(model, priority, succeeded=1, latency_ms=latency_s * 1000)
+            usage = getattr(result, "usage_metadata", None)
+            if usage:
+                record_throughput(model, usage.get("input_tokens"), usage.get("output_tokens"), latency_s)
+            if on_success:
+                on_success(result, latency_s)
+            return result
+
+    def metrics(self):
+        """Per (model, priority) request counts and latency percentiles, plus the current limiter state."""
+        def percentile(values, q):
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1) if ordered else None
+
+        with self._lock:
+            routes = {
+                f"{model}:{priority}": {
+                    **{key: value for key, value in entry.items() if not isinstance(value, deque)},
+                    "p50_ms": percentile(entry["latencies_ms"], 0.5),
+                    "p95_ms": percentile(entry["latencies_ms"], 0.95),
+                    "p95_queue_ms": percentile(entry["queue_ms"], 0.95),
+                }
+                for (model, priority), entry in self._metrics.items()
+            }
+        return {"limiter": self.limiter.snapshot(), "routes": routes}
+
+
+class GatewayChatModel(Runnable):
+    """
+    Runnable chat model whose every call goes through the shared LLMGateway. With a step name the model is
+    picked per call by utils.model_router from the prompt size, expected output and the step's latency budget.
+    """
+
+    def __init__(self, model=DEFAULT_MODEL, temperature=0.7, priority="default", step=None, **kwargs):
+        self.model = model
+        self.temperature = temperature
+        self.priority = priority
+        self.step = step
+        self.kwargs = kwargs
+
+    def invoke(self, input, config=None, **kwargs):
+        prompt_text = _prompt_text(input)
+        model, decision, client_kwargs = self.model, {}, self.kwargs
+        if self.step:
+            model, decision = choose_model(
+                self.step, count_tokens(prompt_text, self.model), self.model, self.kwargs.get("max_tokens"), deadline_s=remaining_seconds(),
+            )
+            if decision["reason"] in ("within deadline", "fallback: deadline exceeded"):
+                degrade(f"{self.step}: routed to {model} to meet the deadline")
+            # ✅ Shorter generation when even the chosen model would overrun the run deadline
+            max_tokens = fit_output_tokens(decision.get("output_tokens"), decision.get("estimated_latency_s"))
+            if max_tokens and max_tokens < (self.kwargs.get("max_tokens") or float("inf")):
+                client_kwargs = {**self.kwargs, "max_tokens": max_tokens}
+                degrade(f"{self.step}: output limited to {max_tokens} tokens")
+
+        if is_dry_run():
+            # ✅ Render and count the prompt locally; the model is never contacted
+            record_planned_call(model, prompt_text, self.kwargs.get("max_tokens") or decision.get("output_tokens"))
+            return AIMessage(content=stub_response(prompt_text))
+
+        batch_run = active_batch_run()
+        if batch_run is not None:
+            # ✅ Deferred mode: serve the result from an earlier batch round, or queue the request for the next one
+            body = request_body(model, self.temperature, to_openai_messages(input), **client_kwargs)
+            content, _ = batch_run.resolve(body, prompt_text)
+            return AIMessage(content=content)
+
+        gateway = get_gateway()
+        client = gateway.client(model, self.temperature, **client_kwargs)
+
+        def record_latency(result, latency_s):
+            usage = getattr(result, "usage_metadata", None) or {}
+            record_route_latency(
+                self.step, model,
+                usage.get("input_tokens") or count_tokens(prompt_text, model),
+                usage.get("output_tokens") or count_tokens(str(getattr(result, "content", result)), model),
+                latency_s,
+            )
+
+        return gateway.call(model, self.priority, lambda: client.invoke(input, config, **kwargs), on_success=record_latency if self.step else None)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+
+def configure_gateway(**kwargs):
+    """Replaces the process-wide gateway, e.g. configure_gateway(base_url="http://127.0.0.1:8089/v1")."""
+    global _gateway
+    with _gateway_lock:
+        _gateway = LLMGateway(**kwargs)
+        return _gateway
+
+
+def get_llm(model=DEFAULT_MODEL, temperature=0.7, priority="default", step=None, **kwargs):
+    """
+    Chat model for tool modules. priority is "interactive" (review/revision loops), "default" or "bulk"
+    (per-supplier extraction, document digests). step names the route in utils.model_router.ROUTES;
+    model is used for unrouted steps or when MODEL_ROUTING is off.
+    """
+    return GatewayChatModel(model=model, temperature=temperature, priority=priority, step=step, **kwargs)
+
+
+def gateway_metrics():
+    return get_gateway().metrics()
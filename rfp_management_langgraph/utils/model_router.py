@@ -0,0 +1,107 @@
+import json
+import os
+from functools import lru_cache
+from utils.run_planner import model_spec
+from utils.stats_store import StatsFile
+
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "true").lower() == "true"
+MODEL_ROUTES_FILE = os.getenv("MODEL_ROUTES_FILE")  # Optional JSON overrides for ROUTES
+ROUTE_STATS_FILE = "./outputs/.model_route_stats.json"
+PREFILL_TOKENS_PER_SECOND = 5000.0
+
+# ✅ Speed profile used until a route has measurements of its own
+MODEL_PROFILES = {
+    "gpt-4.1-nano": {"output_tokens_per_second": 150.0, "overhead_s": 0.3},
+    "gpt-4o-mini": {"output_tokens_per_second": 90.0, "overhead_s": 0.4},
+    "gpt-4.1-mini": {"output_tokens_per_second": 80.0, "overhead_s": 0.5},
+    "gpt-4o": {"output_tokens_per_second": 60.0, "overhead_s": 0.6},
+    "gpt-4.1": {"output_tokens_per_second": 50.0, "overhead_s": 0.7},
+}
+
+# ✅ Routing table: step -> candidate models (preferred first), expected output tokens and latency budget.
+# Extraction and digests go to the fastest model; larger models are reserved for the synthesis steps.
+ROUTES = {
+    "supplier_extraction": {"models": ["gpt-4.1-nano", "gpt-4o-mini"], "output_tokens": 700, "latency_budget_s": 20},
+    "document_digest": {"models": ["gpt-4.1-nano", "gpt-4o-mini"], "output_tokens": 600, "latency_budget_s": 20},
+    "supplier_group_comparison": {"models": ["gpt-4o-mini"], "output_tokens": 1200, "latency_budget_s": 40},
+    "comparison_report": {"models": ["gpt-4o-mini"], "output_tokens": 2000, "latency_budget_s": 60},
+    "pricing_risk": {"models": ["gpt-4o-mini"], "output_tokens": 1200, "latency_budget_s": 45},
+    "negotiation_charter": {"models": ["gpt-4o-mini"], "output_tokens": 1500, "latency_budget_s": 45},
+    "negotiation_email": {"models": ["gpt-4o-mini"], "output_tokens": 600, "latency_budget_s": 30},
+    "counteroffer": {"models": ["gpt-4o-mini"], "output_tokens": 1200, "latency_budget_s": 45},
+    "contract_generation": {"models": ["gpt-4o", "gpt-4o-mini"], "output_tokens": 5000, "latency_budget_s": 150},
+    "contract_review": {"models": ["gpt-4o", "gpt-4o-mini"], "output_tokens": 800, "latency_budget_s": 30},
+    "contract_revision": {"models": ["gpt-4o", "gpt-4o-mini"], "output_tokens": 3000, "latency_budget_s": 90},
+    "json_repair": {"models": ["gpt-4o-mini"], "output_tokens": 3000, "latency_budget_s": 60},
+}
+
+_route_stats = StatsFile(ROUTE_STATS_FILE, maxima=("max_latency_s",))
+
+
+@lru_cache(maxsize=1)
+def load_routes():
+    """ROUTES with any per-step overrides from MODEL_ROUTES_FILE merged in (read once per process)."""
+    routes = {step: dict(route) for step, route in ROUTES.items()}
+    if MODEL_ROUTES_FILE and os.path.exists(MODEL_ROUTES_FILE):
+        with open(MODEL_ROUTES_FILE, "r", encoding="utf-8") as f:
+            for step, override in json.load(f).items():
+                routes[step] = {**routes.get(step, {}), **override}
+    return routes
+
+
+def load_route_stats():
+    return _route_stats.snapshot()
+
+
+def record_route_latency(step, model, prompt_tokens, output_tokens, latency_s):
+    """Adds one measured call under "<step>:<model>"; flushed to ./outputs/.model_route_stats.json periodically."""
+    _route_stats.add(
+        f"{step}:{model}", calls=1, prompt_tokens=prompt_tokens or 0, output_tokens=output_tokens or 0,
+        latency_s=latency_s, max_latency_s=round(latency_s, 3),
+    )
+
+
+def estimate_latency(step, model, prompt_tokens, output_tokens, route_stats=None):
+    """Seconds for one call: measured seconds per output token on this route if available, else the model profile."""
+    measured = (route_stats or {}).get(f"{step}:{model}")
+    if measured and measured["output_tokens"]:
+        return output_tokens * measured["latency_s"] / measured["output_tokens"]
+    profile = MODEL_PROFILES.get(model, MODEL_PROFILES["gpt-4o-mini"])
+    return profile["overhead_s"] + prompt_tokens / PREFILL_TOKENS_PER_SECOND + output_tokens / profile["output_tokens_per_second"]
+
+
+def choose_model(step, prompt_tokens, default_model, output_tokens=None, latency_budget_s=None, deadline_s=None):
+    """
+    Picks the model for one call of step. Returns (model, decision) where decision records the estimate and why.
+    The first candidate that fits the context window and the latency budget wins; when none meets the budget,
+    the fastest candidate that fits is used. deadline_s (seconds left in the run) tightens the budget.
+    Steps without a route (or with MODEL_ROUTING off) use default_model.
+    """
+    route = load_routes().get(step) if MODEL_ROUTING and step else None
+    if not route:
+        return default_model, {"step": step, "model": default_model, "reason": "unrouted"}
+
+    output_tokens = output_tokens or route.get("output_tokens", 800)
+    budget = latency_budget_s or route.get("latency_budget_s")
+    deadline_bound = deadline_s is not None and (budget is None or deadline_s < budget)
+    if deadline_bound:
+        budget = max(deadline_s, 0.0)
+    route_stats = load_route_stats()
+
+    fitting = []
+    for model in route["models"]:
+        if prompt_tokens + output_tokens > model_spec(model)["context_window"]:
+            continue
+        estimate = estimate_latency(step, model, prompt_tokens, output_tokens, route_stats)
+        if budget is None or estimate <= budget:
+            reason = "within deadline" if deadline_bound and model != route["models"][0] else "within budget"
+            return model, {"step": step, "model": model, "output_tokens": output_tokens, "estimated_latency_s": round(estimate, 2), "reason": reason}
+        fitting.append((estimate, model))
+
+    if fitting:
+        estimate, model = min(fitting)
+        reason = "fallback: deadline exceeded" if deadline_bound else "fallback: budget exceeded"
+        return model, {"step": step, "model": model, "output_tokens": output_tokens, "estimated_latency_s": round(estimate, 2), "reason": reason}
+    # Nothing fits the context window; use the largest window and let the provider surface the error
+    model = max(route["models"], key=lambda candidate: model_spec(candidate)["context_window"])
+    return model, {"step": step, "model": model, "output_tokens": output_tokens, "reason": "fallback: context window exceeded"}
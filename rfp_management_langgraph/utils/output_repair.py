@@ -0,0 +1,164 @@
+import json
+import re
+import threading
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import Runnable
+
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+MARKDOWN_FENCE_RE = re.compile(r"^\s*```(?:markdown|md)\s*\n(.*?)\n```\s*$", re.DOTALL)
+FIX_JSON_PROMPT = """The following JSON is malformed. Return it as valid JSON with exactly these top-level keys: {keys}.
+Keep every value's content unchanged; only fix quoting, escaping, commas and brackets.
+Return only the JSON object, without a code fence or commentary.
+
+{broken}"""
+
+_repair_counts = {}
+_counts_lock = threading.Lock()
+
+
+def _count(name, outcome):
+    with _counts_lock:
+        counts = _repair_counts.setdefault(name, {"parsed": 0, "repaired": 0, "retried": 0, "truncated": 0, "failed": 0})
+        counts[outcome] += 1
+
+
+def repair_stats():
+    """Per-parser counts: parsed (clean), repaired (locally), retried (fix-JSON call), truncated and failed."""
+    with _counts_lock:
+        return {name: dict(counts) for name, counts in _repair_counts.items()}
+
+
+class OutputTruncatedError(ValueError):
+    """The model stopped at its output token limit, so the JSON object it was writing is incomplete."""
+
+
+def _json_candidates(text, close_unterminated=True):
+    """
+    The outermost {...} of the text, ignoring fences and surrounding prose, as a list of candidates to parse.
+    An object missing only its closing brace is closed when close_unterminated is set: first with the brace
+    alone, then with a closing quote as well, for text cut off inside a string. Without close_unterminated (the
+    output hit its token limit) such an object yields no candidate.
+    """
+    start = text.find("{")
+    if start == -1:
+        return []
+    end = text.rfind("}")
+    if end < start:
+        if not close_unterminated:
+            return []
+        body = text[start:].rstrip().rstrip("`").rstrip()
+        return [body + "\n}", body + '"\n}']
+    return [text[start:end + 1]]
+
+
+def _escape_strings(candidate):
+    """
+    Escapes raw newlines, tabs and stray double quotes inside JSON strings. A quote closes a string only
+    when the next non-blank character is structural (, : } ]); otherwise it is treated as content.
+    """
+    out, in_string, i = [], False, 0
+    while i < len(candidate):
+        char = candidate[i]
+        if not in_string:
+            in_string = char == '"'
+            out.append(char)
+        elif char == "\\":
+            out.append(candidate[i:i + 2])
+            i += 1
+        elif char == '"':
+            rest = candidate[i + 1:].lstrip()
+            if not rest or rest[0] in ",:}]":
+                in_string = False
+                out.append(char)
+            else:
+                out.append('\\"')
+        else:
+            out.append({"\n": "\\n", "\r": "\\r", "\t": "\\t"}.get(char, char))
+        i += 1
+    return "".join(out)
+
+
+def repair_json(text, keys, truncated=False):
+    """
+    Tolerant local parse of a JSON object that should contain keys. Returns the dict or None.
+    Tries the raw candidate, then escaping fixes, then trailing-comma removal. With truncated=True (the
+    response hit its token limit) an unterminated object is not closed, since its last value is cut off.
+    """
+    for candidate in _json_candidates(text, close_unterminated=not truncated):
+        escaped = _escape_strings(candidate)
+        for attempt in (candidate, escaped, TRAILING_COMMA_RE.sub(r"\1", escaped)):
+            try:
+                parsed = json.loads(attempt, strict=False)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(parsed, dict) and all(key in parsed for key in keys):
+                return parsed
+    fenced = MARKDOWN_FENCE_RE.match(text)
+    document = fenced.group(1).strip() if fenced else text.strip() if text.lstrip().startswith("#") else None
+    if len(keys) == 1 and document and not truncated:
+        # ✅ A single-field schema answered as a markdown document (fenced, or starting with a heading) is that
+        # field. Other prose, e.g. a refusal, is not taken as the value.
+        return {keys[0]: document}
+    return None
+
+
+class RepairingOutputParser(Runnable):
+    """
+    Wraps a StructuredOutputParser. When the parser rejects the model output, the JSON is repaired
+    locally; only if that fails is a short "fix this JSON" call made (with the broken JSON, not the
+    original prompt), instead of re-running the whole generation.
+    """
+
+    def __init__(self, parser, name, fix_llm=None):
+        self.parser = parser
+        self.name = name
+        self.fix_llm = fix_llm
+        self.keys = [schema.name for schema in parser.response_schemas]
+
+    def get_format_instructions(self):
+        return self.parser.get_format_instructions()
+
+    def parse(self, text, truncated=False):
+        """
+        Parses text, repairing it when needed. truncated=True means the response stopped at its token limit:
+        an incomplete object then raises OutputTruncatedError instead of being closed or sent for a fix.
+        """
+        try:
+            if truncated:  # The LangChain parser closes partial JSON itself, so a cut-off object would pass it
+                raise OutputParserException(f"{self.name}: output stopped at the token limit")
+            result = self.parser.parse(text)
+            _count(self.name, "parsed")
+            return result
+        except Exception as parse_error:
+            repaired = repair_json(text, self.keys, truncated)
+            if repaired is not None:
+                _count(self.name, "repaired")
+                return repaired
+            if truncated:
+                _count(self.name, "truncated")
+                raise OutputTruncatedError(f"{self.name}: output stopped at the token limit before the JSON object was complete") from parse_error
+            candidates = _json_candidates(text)
+            if self.fix_llm is not None and candidates:  # Only broken JSON is sent for a fix, never prose
+                _count(self.name, "retried")
+                fixed = self.fix_llm.invoke(FIX_JSON_PROMPT.format(keys=", ".join(self.keys), broken=candidates[0]))
+                repaired = repair_json(getattr(fixed, "content", fixed), self.keys)
+                if repaired is not None:
+                    return repaired
+            _count(self.name, "failed")
+            raise parse_error
+
+    def invoke(self, input, config=None, **kwargs):
+        finish_reason = (getattr(input, "response_metadata", None) or {}).get("finish_reason")
+        return self.parse(getattr(input, "content", input), truncated=finish_reason == "length")
+
+
+_fix_llm = None
+
+
+def repairing_parser(parser, name):
+    """RepairingOutputParser that falls back to the shared low-temperature "json_repair" model route."""
+    global _fix_llm
+    if _fix_llm is None:
+        from utils.llm_gateway import get_llm
+        _fix_llm = get_llm(temperature=0.0, step="json_repair")
+    return RepairingOutputParser(parser, name, _fix_llm)
@@ -1,4 +1,8 @@
 import os
+from utils.run_planner import is_dry_run, outputs_suppressed, stage_output, staged_output
+from utils.artifact_store import atomic_write, get_artifact_store
+
+OUTPUT_DIR = "./outputs"
 
 def save_markdown(content, filename):
     """
@@ -8,11 +12,37 @@ def save_markdown(content, filename):
     if not isinstance(content, str):  # ✅ Convert CrewOutput to string if needed
         content = str(content)
 
-    output_dir = "./outputs"
-    os.makedirs(output_dir, exist_ok=True)  # ✅ Ensure ./outputs directory exists
+    if is_dry_run():
+        stage_output(filename, content)  # ✅ Later planned steps read it instead of a stale ./outputs file
+        print(f"\n🧪 Not writing {filename} (dry run)")
+        return
+    if outputs_suppressed():
+        print(f"\n🧪 Not writing {filename} (deferred results still pending)")
+        return
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)  # ✅ Ensure ./outputs directory exists
 
-    output_path = os.path.join(output_dir, filename)
-    with open(output_path, "w", encoding="utf-8") as md_file:
-        md_file.write(content)
+    output_path = os.path.join(OUTPUT_DIR, filename)
+    atomic_write(output_path, content)
+    # ✅ Versioned, deduplicated copy in the artifact archive (see utils.artifact_store)
+    get_artifact_store().save(filename, content)
 
     print(f"\n Output saved to {output_path}")
+    return output_path
+
+def load_markdown(path):
+    """
+    Reads a markdown output from disk, or returns None when it does not exist; a bare filename is read from
+    ./outputs. The file on disk is the source of truth, so restored or hand-edited outputs are used as they are
+    (the artifact archive only keeps history). During a dry run, outputs of earlier planned steps take precedence.
+    """
+    if not os.path.dirname(path):
+        path = os.path.join(OUTPUT_DIR, path)
+    if is_dry_run() and os.path.abspath(os.path.dirname(path)) == os.path.abspath(OUTPUT_DIR):
+        content = staged_output(os.path.basename(path))
+        if content is not None:
+            return content
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as md_file:
+        return md_file.read()
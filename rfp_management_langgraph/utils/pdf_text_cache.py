@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+import time
+import zlib
+import fitz  # PyMuPDF for reading PDFs
+
+PDF_TEXT_CACHE_DIR = "./outputs/.pdf_text_cache/"
+HASH_BLOCK_SIZE = 1 << 20
+PYMUPDF_VERSION = getattr(fitz, "VersionBind", None) or fitz.version[0]
+
+
+def file_hash(file_path):
+    """sha256 of the file contents, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(content_hash):
+    # ✅ The extractor version is part of the key: a PyMuPDF upgrade may change the extracted text
+    return os.path.join(PDF_TEXT_CACHE_DIR, f"{content_hash}.pymupdf-{PYMUPDF_VERSION}.json.z")
+
+
+def extract_pages(file_path):
+    """Parses the PDF with PyMuPDF and returns the per-page text."""
+    with fitz.open(file_path) as doc:
+        return [page.get_text("text") for page in doc]
+
+
+def load_pdf_pages(file_path, write_cache=True):
+    """
+    Returns {"pages", "page_count", "timings", "cached"} for a PDF. The per-page text comes from the
+    zlib-compressed JSON cache when this exact file was already parsed by the same PyMuPDF version;
+    otherwise the PDF is parsed and (with write_cache) the cache entry written. timings holds hash_ms,
+    extract_ms (recorded at first extraction) and load_ms.
+    """
+    started = time.perf_counter()
+    content_hash = file_hash(file_path)
+    hash_ms = round((time.perf_counter() - started) * 1000, 1)
+    path = cache_path(content_hash)
+
+    if os.path.exists(path):
+        load_started = time.perf_counter()
+        with open(path, "rb") as f:
+            entry = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+        entry["timings"].update(hash_ms=hash_ms, load_ms=round((time.perf_counter() - load_started) * 1000, 1))
+        return {**entry, "cached": True}
+
+    extract_started = time.perf_counter()
+    pages = extract_pages(file_path)
+    entry = {
+        "sha256": content_hash,
+        "pymupdf_version": PYMUPDF_VERSION,
+        "page_count": len(pages),
+        "pages": pages,
+        "timings": {"extract_ms": round((time.perf_counter() - extract_started) * 1000, 1)},
+    }
+
+    if not write_cache:
+        entry["timings"].update(hash_ms=hash_ms, load_ms=0.0)
+        return {**entry, "cached": False}
+
+    os.makedirs(PDF_TEXT_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(zlib.compress(json.dumps(entry, separators=(",", ":")).encode("utf-8"), 6))
+    os.replace(tmp_path, path)
+
+    entry["timings"].update(hash_ms=hash_ms, load_ms=0.0)
+    return {**entry, "cached": False}
@@ -0,0 +1,165 @@
+import cProfile
+import contextvars
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+PROFILE_DIR = "./profiles"
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples for the collapsed-stack file
+TOP_STATS = 40
+
+_profile_run_dir = None
+_node_runs = Counter()  # Runs per node in this profiling session, so nodes that run in a loop keep every profile
+_node_runs_lock = threading.Lock()
+_current_node = contextvars.ContextVar("current_node", default="unknown")
+
+
+def enable_profiling(output_dir=PROFILE_DIR):
+    """
+    Turns on profiling for every subsequent graph node run.
+    Artifacts are written to a timestamped folder inside output_dir, which is returned.
+    """
+    global _profile_run_dir
+    run_dir = os.path.join(output_dir, time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(run_dir, exist_ok=True)
+    _profile_run_dir = run_dir
+    _node_runs.clear()
+    print(f"\n🔬 Profiling enabled, artifacts will be saved to {run_dir}")
+    return run_dir
+
+
+def disable_profiling():
+    """Turns profiling off again (artifacts already written are kept)."""
+    global _profile_run_dir
+    _profile_run_dir = None
+
+
+def is_profiling():
+    return _profile_run_dir is not None
+
+
+def _artifact_path(name):
+    return os.path.join(_profile_run_dir, name)
+
+
+def _next_run_label(node_name):
+    """"<node>.<n>" for the n-th run of node_name, e.g. ContractReview.2 for the second review iteration."""
+    with _node_runs_lock:
+        _node_runs[node_name] += 1
+        return f"{node_name}.{_node_runs[node_name]}"
+
+
+class _StackSampler(threading.Thread):
+    """
+    Samples the call stack of a single thread at a fixed interval.
+    cProfile only records caller/callee pairs, so full stacks for flame graphs are sampled separately.
+    """
+
+    def __init__(self, target_ident, root_label, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.target_ident = target_ident
+        self.root_label = root_label
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_ident)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            stack.append(self.root_label)
+            self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _write_profile_artifacts(run_label, profiler, sampler):
+    profiler.dump_stats(_artifact_path(f"{run_label}.prof"))
+
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats("cumulative").print_stats(TOP_STATS)
+    with open(_artifact_path(f"{run_label}.pstats.txt"), "w", encoding="utf-8") as f:
+        f.write(summary.getvalue())
+
+    # ✅ Collapsed stacks ("frame;frame;frame count"), readable by flamegraph.pl / speedscope
+    with open(_artifact_path(f"{run_label}.collapsed"), "w", encoding="utf-8") as f:
+        for stack, count in sampler.samples.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+def profile_node(node_name, node_fn):
+    """
+    Wraps a graph node so that, when profiling is enabled, each run produces
+    <node>.<n>.prof, <node>.<n>.pstats.txt and <node>.<n>.collapsed in the profiling folder, where n counts
+    the node's runs (the review/revision loop runs the same node several times).
+    When profiling is disabled the node is called directly.
+    """
+
+    @wraps(node_fn)
+    def wrapper(state):
+        if not is_profiling():
+            return node_fn(state)
+
+        run_label = _next_run_label(node_name)
+        token = _current_node.set(run_label)
+        profiler = cProfile.Profile()
+        sampler = _StackSampler(threading.get_ident(), node_name)
+        sampler.start()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            return node_fn(state)
+        finally:
+            profiler.disable()
+            sampler.stop()
+            _current_node.reset(token)
+            _write_profile_artifacts(run_label, profiler, sampler)
+            print(f"🔬 {run_label} profiled in {time.perf_counter() - start:.2f}s")
+
+    return wrapper
+
+
+@contextmanager
+def memory_snapshot(label):
+    """
+    Takes tracemalloc snapshots before and after the wrapped block and writes the
+    top allocation differences to <node>.<n>.<label>.tracemalloc.txt. No-op unless profiling.
+    """
+    if not is_profiling():
+        yield
+        return
+
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    try:
+        yield
+    finally:
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if started_here:
+            tracemalloc.stop()
+
+        node_name = _current_node.get()
+        with open(_artifact_path(f"{node_name}.{label}.tracemalloc.txt"), "w", encoding="utf-8") as f:
+            f.write(f"# {node_name} / {label}\n")
+            f.write(f"# traced current={current / 1024:.1f} KiB peak={peak / 1024:.1f} KiB\n\n")
+            for stat in after.compare_to(before, "lineno")[:TOP_STATS]:
+                f.write(f"{stat}\n")
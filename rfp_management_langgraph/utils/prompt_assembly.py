@@ -0,0 +1,93 @@
+import threading
+from collections import deque
+from langchain.prompts import PromptTemplate
+from langchain.schema.runnable import RunnableLambda
+from utils.token_utils import count_tokens, DEFAULT_MODEL
+
+MAX_RECORDED_CALLS = 1000
+PROVIDER_MIN_CACHEABLE_TOKENS = 1024  # OpenAI only caches prompt prefixes of at least this many tokens
+
+_call_stats = deque(maxlen=MAX_RECORDED_CALLS)
+_stats_lock = threading.Lock()
+
+
+def _escape_braces(text):
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _cached_tokens(message):
+    """Reads the provider-reported cached prompt tokens from an AIMessage, if present."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    details = usage.get("input_token_details") or {}
+    if "cache_read" in details:
+        return details["cache_read"]
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    return (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+
+
+def _prompt_tokens(message):
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("input_tokens")
+
+
+class StablePrefixPrompt:
+    """
+    A prompt laid out as <static prefix><dynamic suffix>.
+    Instructions, templates and format instructions go into the static prefix, which is rendered
+    byte-identically on every call, so provider-side prompt caching can reuse it. Only the suffix
+    contains input variables. Token counts for the prefix are computed once at construction.
+    """
+
+    def __init__(self, name, static_parts, dynamic_template, input_variables, model=DEFAULT_MODEL):
+        self.name = name
+        self.static_prefix = "\n\n".join(part.strip("\n") for part in static_parts if part) + "\n\n"
+        self.static_tokens = count_tokens(self.static_prefix, model)
+        self.template = PromptTemplate(
+            input_variables=input_variables,
+            template=_escape_braces(self.static_prefix) + dynamic_template,
+        )
+
+    def _invoke_llm(self, llm, prompt_value, config=None):
+        prompt_tokens = count_tokens(prompt_value.to_string())
+        message = llm.invoke(prompt_value, config)
+        record_call(self.name, self.static_tokens, _prompt_tokens(message) or prompt_tokens, _cached_tokens(message))
+        return message
+
+    def chain(self, llm, output_parser=None):
+        """Builds template | llm (| parser), recording prefix/cached-token stats for every call."""
+        chain = self.template | RunnableLambda(lambda prompt_value, config: self._invoke_llm(llm, prompt_value, config))
+        return chain | output_parser if output_parser is not None else chain
+
+
+def record_call(prompt_name, static_tokens, prompt_tokens, cached_tokens=None):
+    stats = {
+        "prompt": prompt_name,
+        "prompt_tokens": prompt_tokens,
+        "static_tokens": static_tokens,
+        "static_ratio": round(static_tokens / prompt_tokens, 3) if prompt_tokens else 0.0,
+        "cacheable": static_tokens >= PROVIDER_MIN_CACHEABLE_TOKENS,
+        "cached_tokens": cached_tokens,
+        "cached_ratio": round(cached_tokens / prompt_tokens, 3) if cached_tokens is not None and prompt_tokens else None,
+    }
+    with _stats_lock:
+        _call_stats.append(stats)
+    return stats
+
+
+def prompt_call_stats(prompt_name=None):
+    """Per-call stats (most recent last), optionally filtered by prompt name."""
+    with _stats_lock:
+        return [stats for stats in _call_stats if prompt_name is None or stats["prompt"] == prompt_name]
+
+
+def prompt_cache_summary():
+    """Aggregates recorded calls per prompt: calls, prompt tokens, cached tokens and the cached-token ratio."""
+    summary = {}
+    for stats in prompt_call_stats():
+        entry = summary.setdefault(stats["prompt"], {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "static_tokens": stats["static_tokens"]})
+        entry["calls"] += 1
+        entry["prompt_tokens"] += stats["prompt_tokens"] or 0
+        entry["cached_tokens"] += stats["cached_tokens"] or 0
+    for entry in summary.values():
+        entry["cached_ratio"] = round(entry["cached_tokens"] / entry["prompt_tokens"], 3) if entry["prompt_tokens"] else 0.0
+    return summary
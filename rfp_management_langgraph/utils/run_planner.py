@@ -0,0 +1,256 @@
+import contextvars
+import json
+import re
+import threading
+from contextlib import contextmanager
+from utils.token_utils import count_tokens, DEFAULT_MODEL
+from utils.stats_store import StatsFile
+
+THROUGHPUT_FILE = "./outputs/.llm_throughput.json"
+DEFAULT_EXPECTED_OUTPUT_TOKENS = 800
+DEFAULT_OUTPUT_TOKENS_PER_SECOND = 50.0
+DEFAULT_OVERHEAD_SECONDS = 0.5
+STUB_TEXT = "[dry run]"
+
+# ✅ Context window and list price (USD per 1M tokens) per model; unknown models are planned as DEFAULT_MODEL
+MODEL_SPECS = {
+    "gpt-4o-mini": {"context_window": 128_000, "input_usd_per_1m": 0.15, "output_usd_per_1m": 0.60},
+    "gpt-4o": {"context_window": 128_000, "input_usd_per_1m": 2.50, "output_usd_per_1m": 10.00},
+    "gpt-4.1": {"context_window": 1_047_576, "input_usd_per_1m": 2.00, "output_usd_per_1m": 8.00},
+    "gpt-4.1-mini": {"context_window": 1_047_576, "input_usd_per_1m": 0.40, "output_usd_per_1m": 1.60},
+    "gpt-4.1-nano": {"context_window": 1_047_576, "input_usd_per_1m": 0.10, "output_usd_per_1m": 0.40},
+    "gpt-3.5-turbo": {"context_window": 16_385, "input_usd_per_1m": 0.50, "output_usd_per_1m": 1.50},
+}
+
+# Matches StructuredOutputParser format instructions, e.g. `"final_verdict": string  // ...`
+FORMAT_KEY_RE = re.compile(r'^\s*"([^"]+)":\s*([\w\[\]]+)\s*//', re.MULTILINE)
+
+# The active plan of this context ({"calls", "outputs", "stale_inputs"}), so a dry run never affects a real
+# run in another thread (e.g. a service job)
+_current_plan = contextvars.ContextVar("dry_run_plan", default=None)
+# Output suppression of the current deferred run ({"suppressed": bool}), shared by the threads the run starts
+_output_suppression = contextvars.ContextVar("output_suppression", default=None)
+_current_step = contextvars.ContextVar("dry_run_step", default="unknown")
+_lock = threading.Lock()
+_throughput = StatsFile(THROUGHPUT_FILE)
+
+
+class DryRunError(RuntimeError):
+    """Raised when something tries to reach the model API while a dry run is active."""
+
+
+@contextmanager
+def dry_run():
+    """
+    Within the block (and the threads it starts through LangChain), chat model calls are rendered and recorded
+    instead of sent, and outputs are kept in the plan instead of being written. Yields the plan.
+    """
+    plan = {"calls": [], "outputs": {}, "stale_inputs": {}}
+    token = _current_plan.set(plan)
+    try:
+        yield plan
+    finally:
+        _current_plan.reset(token)
+
+
+def is_dry_run():
+    return _current_plan.get() is not None
+
+
+@contextmanager
+def suppressible_outputs():
+    """
+    Scope for suppress_outputs(). The flag is shared by this context and the threads it starts (a placeholder
+    seen by a per-supplier worker must also stop the caller's writes), but not by other runs in the process.
+    """
+    flag = {"suppressed": False}
+    token = _output_suppression.set(flag)
+    try:
+        yield flag
+    finally:
+        _output_suppression.reset(token)
+
+
+def suppress_outputs(suppressed=True):
+    """Stops (or resumes) writes of outputs and caches, e.g. while a deferred run still has placeholder results."""
+    flag = _output_suppression.get()
+    if flag is None:
+        raise RuntimeError("suppress_outputs() must be called inside suppressible_outputs()")
+    flag["suppressed"] = suppressed
+
+
+def outputs_suppressed():
+    """True when tools must not write outputs or caches: during a dry run or while results are still pending."""
+    flag = _output_suppression.get()
+    return is_dry_run() or (flag is not None and flag["suppressed"])
+
+
+def stage_output(filename, content):
+    """Keeps an output written during a dry run in the plan, where later planned steps read it."""
+    plan = _current_plan.get()
+    with _lock:
+        plan["outputs"][filename] = content
+
+
+def staged_output(filename):
+    """
+    Output of an earlier step of the current dry run, or None. A read that misses is recorded as a stale input
+    of the current step: it falls back to whatever an earlier real run left in ./outputs.
+    """
+    plan = _current_plan.get()
+    with _lock:
+        if filename in plan["outputs"]:
+            return plan["outputs"][filename]
+        stale = plan["stale_inputs"].setdefault(_current_step.get(), [])
+        if filename not in stale:
+            stale.append(filename)
+    return None
+
+
+@contextmanager
+def dry_run_step(name):
+    """Labels planned calls made inside the block with a workflow step name."""
+    token = _current_step.set(name)
+    try:
+        yield
+    finally:
+        _current_step.reset(token)
+
+
+def model_spec(model):
+    return MODEL_SPECS.get(model, MODEL_SPECS[DEFAULT_MODEL])
+
+
+def load_throughput():
+    """Per-model totals recorded from real calls: {model: {calls, prompt_tokens, completion_tokens, latency_s}}."""
+    return _throughput.snapshot()
+
+
+def record_throughput(model, prompt_tokens, completion_tokens, latency_s):
+    """Adds one completed call to the per-model throughput totals used for latency projections (flushed periodically)."""
+    _throughput.add(model, calls=1, prompt_tokens=prompt_tokens or 0, completion_tokens=completion_tokens or 0, latency_s=latency_s)
+
+
+def project_call(model, prompt_tokens, max_tokens=None, throughput=None):
+    """Expected output tokens, cost and latency of one call, from recorded throughput when available."""
+    recorded = (throughput or {}).get(model)
+    if recorded and recorded["calls"] and recorded["completion_tokens"]:
+        output_tokens = max_tokens or round(recorded["completion_tokens"] / recorded["calls"])
+        latency_s = output_tokens * recorded["latency_s"] / recorded["completion_tokens"]
+    else:
+        output_tokens = max_tokens or DEFAULT_EXPECTED_OUTPUT_TOKENS
+        latency_s = DEFAULT_OVERHEAD_SECONDS + output_tokens / DEFAULT_OUTPUT_TOKENS_PER_SECOND
+    spec = model_spec(model)
+    cost = (prompt_tokens * spec["input_usd_per_1m"] + output_tokens * spec["output_usd_per_1m"]) / 1_000_000
+    return {
+        "expected_output_tokens": output_tokens,
+        "projected_cost_usd": round(cost, 6),
+        "projected_latency_s": round(latency_s, 2),
+        "context_window": spec["context_window"],
+        "overflow": prompt_tokens + output_tokens > spec["context_window"],
+    }
+
+
+def record_planned_call(model, prompt_text, max_tokens=None):
+    call = {"step": _current_step.get(), "model": model, "prompt_tokens": count_tokens(prompt_text, model), "max_tokens": max_tokens}
+    with _lock:
+        _current_plan.get()["calls"].append(call)
+    return call
+
+
+def stub_response(prompt_text, placeholder=STUB_TEXT):
+    """
+    Placeholder model output that still satisfies a StructuredOutputParser schema in the prompt, so that
+    downstream steps keep running (and rendering their own prompts) without a real model response.
+    """
+    keys = FORMAT_KEY_RE.findall(prompt_text)
+    if not keys:
+        return placeholder
+    values = {key: [] if kind.lower().startswith(("list", "array")) else placeholder for key, kind in keys}
+    return f"```json\n{json.dumps(values, indent=2)}\n```"
+
+
+def plan_summary(plan, step_errors=None):
+    """Projects every call of a plan and aggregates per step. Latency is summed as if calls ran one after another."""
+    throughput = load_throughput()
+    calls = [{**call, **project_call(call["model"], call["prompt_tokens"], call["max_tokens"], throughput)} for call in plan["calls"]]
+
+    steps = {}
+    for call in calls:
+        step = steps.setdefault(call["step"], {"calls": 0, "prompt_tokens": 0, "expected_output_tokens": 0, "max_prompt_tokens": 0,
+                                               "projected_cost_usd": 0.0, "projected_latency_s": 0.0, "overflows": 0})
+        step["calls"] += 1
+        step["prompt_tokens"] += call["prompt_tokens"]
+        step["expected_output_tokens"] += call["expected_output_tokens"]
+        step["max_prompt_tokens"] = max(step["max_prompt_tokens"], call["prompt_tokens"])
+        step["projected_cost_usd"] = round(step["projected_cost_usd"] + call["projected_cost_usd"], 6)
+        step["projected_latency_s"] = round(step["projected_latency_s"] + call["projected_latency_s"], 2)
+        step["overflows"] += int(call["overflow"])
+    for name, error in (step_errors or {}).items():
+        steps.setdefault(name, {"calls": 0})["error"] = error
+    for name, filenames in plan["stale_inputs"].items():
+        steps.setdefault(name, {"calls": 0})["stale_inputs"] = filenames
+
+    return {
+        "steps": steps,
+        "calls": calls,
+        "total_calls": len(calls),
+        "total_prompt_tokens": sum(call["prompt_tokens"] for call in calls),
+        "total_cost_usd": round(sum(call["projected_cost_usd"] for call in calls), 4),
+        "total_latency_s": round(sum(call["projected_latency_s"] for call in calls), 1),
+        "overflows": [call for call in calls if call["overflow"]],
+        "throughput_source": "recorded" if throughput else "defaults",
+    }
+
+
+def format_plan(summary):
+    """Markdown report of a plan_summary()."""
+    lines = [
+        "# Dry Run Plan",
+        "",
+        "| Step | Calls | Prompt tokens | Largest prompt | Expected output tokens | Cost (USD) | LLM time (s) | Overflows |",
+        "|------|-------|---------------|----------------|------------------------|------------|--------------|-----------|",
+    ]
+    for name, step in summary["steps"].items():
+        if not step["calls"]:
+            reason = f"not planned: {step['error']}" if "error" in step else "no model calls"
+            lines.append(f"| {name} | - | - | - | - | - | - | {reason} |")
+            continue
+        lines.append(
+            f"| {name} | {step['calls']} | {step['prompt_tokens']:,} | {step['max_prompt_tokens']:,} | {step['expected_output_tokens']:,} "
+            f"| {step['projected_cost_usd']:.4f} | {step['projected_latency_s']} | {step['overflows']} |"
+        )
+    lines += [
+        "",
+        f"**Total:** {summary['total_calls']} calls, {summary['total_prompt_tokens']:,} prompt tokens, "
+        f"~${summary['total_cost_usd']} and ~{summary['total_latency_s']}s of sequential LLM time "
+        f"(latency from {summary['throughput_source']} throughput).",
+    ]
+    for name, step in summary["steps"].items():
+        if step.get("stale_inputs"):
+            lines.append(f"- ⚠️ **{name}** read {', '.join(step['stale_inputs'])} from an earlier run, not from this plan")
+    for call in summary["overflows"]:
+        lines.append(f"- ⚠️ **{call['step']}**: {call['prompt_tokens']:,} prompt tokens + {call['expected_output_tokens']:,} output exceed the {call['context_window']:,}-token window of {call['model']}")
+    return "\n".join(lines)
+
+
+def plan_workflow(steps=None):
+    """
+    Runs the workflow's LLM steps in dry-run mode: each tool renders its prompts as usual, the gateway records
+    them instead of calling the model, and nothing is written to ./outputs. Outputs are kept in the plan, so
+    each step reads the placeholder outputs of the steps before it; inputs no planned step produced are read
+    from ./outputs and reported as stale. PDF ingestion only uses the embeddings endpoint and is not planned.
+    Returns plan_summary().
+    """
+    from workflow import run_tool_step, save_step_output, workflow_steps
+
+    step_errors = {}
+    with dry_run() as plan:
+        for name, module_name, attribute in steps or workflow_steps():
+            print(f"🧪 Planning {name}...")
+            with dry_run_step(name):
+                try:
+                    save_step_output(name, run_tool_step(module_name, attribute))
+                except Exception as e:  # Missing inputs or placeholder output a step cannot consume
+                    step_errors[name] = f"{type(e).__name__}: {e}"
+    return plan_summary(plan, step_errors)
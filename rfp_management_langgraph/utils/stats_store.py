@@ -0,0 +1,70 @@
+import atexit
+import copy
+import json
+import os
+import threading
+import time
+from utils.artifact_store import atomic_write, file_lock
+
+STATS_FLUSH_SECONDS = float(os.getenv("STATS_FLUSH_SECONDS", "30"))
+
+
+def _merge(target, deltas, maxima):
+    """Adds per-key counter deltas into target; fields in maxima keep the larger value instead."""
+    for key, delta in deltas.items():
+        entry = target.setdefault(key, {})
+        for field, value in delta.items():
+            if field in maxima:
+                entry[field] = max(entry.get(field, value), value)
+            else:
+                entry[field] = round(entry.get(field, 0) + value, 3)
+    return target
+
+
+class StatsFile:
+    """
+    Per-key counters kept in memory and persisted as JSON. add() only updates memory; flush() runs every
+    STATS_FLUSH_SECONDS and at exit, and merges the deltas since the previous flush into the file under a file
+    lock, so processes sharing the file add to each other's totals instead of overwriting them.
+    """
+
+    def __init__(self, path, maxima=(), flush_seconds=STATS_FLUSH_SECONDS):
+        self.path = path
+        self.maxima = set(maxima)
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._persisted = None  # File contents as of the last load or flush
+        self._pending = {}
+        self._flushed_at = time.monotonic()
+        atexit.register(self.flush)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def snapshot(self):
+        """Totals from the file (read once, then refreshed by each flush) plus this process's unflushed deltas."""
+        with self._lock:
+            if self._persisted is None:
+                self._persisted = self._read()
+            return _merge(copy.deepcopy(self._persisted), self._pending, self.maxima)
+
+    def add(self, key, **counters):
+        with self._lock:
+            _merge(self._pending, {key: counters}, self.maxima)
+            due = time.monotonic() - self._flushed_at >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+            if not pending:
+                return
+            with file_lock(f"{self.path}.lock"):
+                totals = _merge(self._read(), pending, self.maxima)
+                atomic_write(self.path, json.dumps(totals, indent=2))
+            self._persisted = totals
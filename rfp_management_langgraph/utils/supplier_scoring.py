@@ -0,0 +1,130 @@
+import re
+import warnings
+import numpy as np
+
+# ✅ Typed supplier fields: name -> (type, description). Used for the extraction schema and for coercion.
+SUPPLIER_FIELDS = {
+    "base_monthly_price": ("number", "Base monthly price in USD (number only, null if not stated)."),
+    "enterprise_monthly_price": ("number", "Enterprise plan monthly price in USD (number only, null if not stated)."),
+    "setup_fee": ("number", "One-time implementation/setup fee in USD (0 if waived, null if not stated)."),
+    "discount_pct": ("number", "Largest discount offered, in percent (number only, null if none)."),
+    "lock_in_months": ("number", "Minimum contract lock-in period in months (number only, null if not stated)."),
+    "sla_uptime_pct": ("number", "Guaranteed uptime SLA in percent, e.g. 99.9 (null if not stated)."),
+    "support_response_hours": ("number", "Guaranteed support response time in hours (null if not stated)."),
+    "certifications": ("array", "List of compliance certifications/standards, e.g. [\"ISO 27001\", \"SOC 2\", \"GDPR\"]."),
+}
+
+# ✅ Scoring criteria: field -> direction (+1 higher is better, -1 lower is better)
+SCORING_DIRECTIONS = {
+    "base_monthly_price": -1,
+    "setup_fee": -1,
+    "discount_pct": 1,
+    "lock_in_months": -1,
+    "sla_uptime_pct": 1,
+    "support_response_hours": -1,
+    "certification_count": 1,
+}
+
+DEFAULT_SCORING_WEIGHTS = {
+    "base_monthly_price": 0.30,
+    "setup_fee": 0.10,
+    "discount_pct": 0.05,
+    "lock_in_months": 0.15,
+    "sla_uptime_pct": 0.20,
+    "support_response_hours": 0.05,
+    "certification_count": 0.15,
+}
+
+NUMBER_RE = re.compile(r"-?\d[\d,]*(?:\.\d+)?")
+
+
+def to_number(value):
+    """Parses numbers from LLM output such as 1200, "$1,200/month" or "99.95%". Returns None if absent."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = NUMBER_RE.search(str(value))
+    return float(match.group(0).replace(",", "")) if match else None
+
+
+def coerce_supplier_fields(raw):
+    """Converts an extracted field dict into typed values (floats, list of strings, or None)."""
+    fields = {}
+    for name, (field_type, _) in SUPPLIER_FIELDS.items():
+        value = raw.get(name)
+        if field_type == "array":
+            if isinstance(value, str):
+                value = [item.strip() for item in re.split(r"[,;]", value) if item.strip()]
+            fields[name] = sorted({str(item).strip() for item in value or [] if str(item).strip()})
+        else:
+            fields[name] = to_number(value)
+    return fields
+
+
+def score_suppliers(fields_by_supplier, weights=None):
+    """
+    Scores suppliers locally on a 0-10 scale. Each criterion is min-max normalised across suppliers
+    (inverted where lower is better); missing values get the neutral score 0.5. The overall score is
+    the weighted mean. Returns a list of dicts sorted best-first, each with per-criterion scores.
+    """
+    weights = {**DEFAULT_SCORING_WEIGHTS, **(weights or {})}
+    suppliers = list(fields_by_supplier)
+    criteria = [name for name in SCORING_DIRECTIONS if weights.get(name, 0) > 0]
+    if not suppliers or not criteria:
+        return []
+
+    def value(fields, criterion):
+        if criterion == "certification_count":
+            return float(len(fields.get("certifications") or []))
+        number = fields.get(criterion)
+        return np.nan if number is None else float(number)
+
+    matrix = np.array([[value(fields_by_supplier[s], c) for c in criteria] for s in suppliers], dtype=float)
+    directions = np.array([SCORING_DIRECTIONS[c] for c in criteria], dtype=float)
+    weight_vector = np.array([weights[c] for c in criteria], dtype=float)
+
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN columns are handled below
+        lows, highs = np.nanmin(matrix, axis=0), np.nanmax(matrix, axis=0)
+        spread = highs - lows
+        normalised = (matrix - lows) / spread
+    normalised = np.where(directions > 0, normalised, 1.0 - normalised)
+    normalised = np.where(spread > 0, normalised, 1.0)  # ✅ Everyone ties on a criterion with a single value
+    normalised = np.where(np.isnan(matrix), 0.5, normalised)
+    # ✅ Columns where nobody reported a value carry no information
+    normalised[:, np.all(np.isnan(matrix), axis=0)] = 0.5
+
+    overall = normalised @ weight_vector / weight_vector.sum() * 10
+    order = np.argsort(-overall, kind="stable")
+
+    return [
+        {
+            "rank": rank + 1,
+            "supplier": suppliers[i],
+            "overall_score": round(float(overall[i]), 2),
+            "criterion_scores": {c: round(float(normalised[i, j] * 10), 1) for j, c in enumerate(criteria)},
+            "fields": fields_by_supplier[suppliers[i]],
+        }
+        for rank, i in enumerate(order)
+    ]
+
+
+def _fmt(number, suffix=""):
+    return "n/a" if number is None else f"{number:,.2f}".rstrip("0").rstrip(".") + suffix
+
+
+def format_ranking_table(ranked):
+    """Compact markdown table of the ranked suppliers and their key fields."""
+    lines = [
+        "| Rank | Supplier | Score (10) | Base $/month | Setup fee $ | Lock-in (months) | SLA uptime | Certifications |",
+        "|------|----------|-----------|--------------|-------------|------------------|------------|----------------|",
+    ]
+    for row in ranked:
+        fields = row["fields"]
+        lines.append(
+            f"| {row['rank']} | {row['supplier']} | {row['overall_score']} | {_fmt(fields['base_monthly_price'])} "
+            f"| {_fmt(fields['setup_fee'])} | {_fmt(fields['lock_in_months'])} | {_fmt(fields['sla_uptime_pct'], '%')} "
+            f"| {', '.join(fields['certifications']) or 'none'} |"
+        )
+    return "\n".join(lines)
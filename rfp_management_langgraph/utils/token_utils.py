@@ -0,0 +1,35 @@
+from functools import lru_cache
+
+DEFAULT_MODEL = "gpt-4o-mini"
+CHARS_PER_TOKEN = 4  # Rough fallback when tiktoken is not available
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text, model=DEFAULT_MODEL):
+    """Counts tokens locally with tiktoken, falling back to a character-based estimate."""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens, model=DEFAULT_MODEL):
+    """Cuts text down to at most max_tokens tokens."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return text[: max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
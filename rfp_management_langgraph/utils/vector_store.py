@@ -0,0 +1,340 @@
+import json
+import os
+import threading
+import numpy as np
+
+# ✅ Backend selection: "chroma" (default) or "numpy" (embedded, memory-mapped, quantized)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+CHROMA_PATH = "./chroma_db"
+NUMPY_STORE_PATH = "./vector_index"
+COLLECTION_NAME = "rfp_proposals"
+NUMPY_STORE_DTYPE = os.getenv("VECTOR_STORE_DTYPE", "float16")  # "float16" or "int8"
+QUERY_BLOCK_ROWS = 8192
+MAX_WRITE_BATCH_SIZE = int(os.getenv("VECTOR_STORE_MAX_BATCH_SIZE", "1000"))
+
+# ✅ One Chroma client per store path and one store object per (backend, path) for the whole process
+_chroma_clients = {}
+_stores = {}
+_registry_lock = threading.Lock()
+
+
+def get_chroma_client(path=CHROMA_PATH):
+    """Returns the process-wide chromadb.PersistentClient for path, creating it on first use."""
+    key = os.path.abspath(path)
+    with _registry_lock:
+        if key not in _chroma_clients:
+            import chromadb
+            _chroma_clients[key] = chromadb.PersistentClient(path=path)
+        return _chroma_clients[key]
+
+
+def batched(items, batch_size):
+    for start in range(0, len(items), batch_size):
+        yield start, items[start:start + batch_size]
+
+
+def group_by_metadata(results, key="supplier"):
+    """Groups get() results by a metadata field: {value: {"ids": [...], "documents": [...], "metadatas": [...]}}."""
+    groups = {}
+    documents = results.get("documents") or [None] * len(results["ids"])
+    for doc_id, document, metadata in zip(results["ids"], documents, results["metadatas"]):
+        group = groups.setdefault(metadata.get(key), {"ids": [], "documents": [], "metadatas": []})
+        group["ids"].append(doc_id)
+        group["documents"].append(document)
+        group["metadatas"].append(metadata)
+    return groups
+
+
+def matches_where(metadata, where):
+    """Evaluates a Chroma-style equality filter, e.g. {"supplier": "Acme"} or {"supplier": {"$in": [...]}}."""
+    if not where:
+        return True
+    if "$and" in where:
+        return all(matches_where(metadata, clause) for clause in where["$and"])
+    if "$or" in where:
+        return any(matches_where(metadata, clause) for clause in where["$or"])
+    for key, condition in where.items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+            if "$ne" in condition and value == condition["$ne"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class ChromaVectorStore:
+    """Vector store backed by a persistent ChromaDB collection (client created on first use)."""
+
+    def __init__(self, path=CHROMA_PATH, collection_name=COLLECTION_NAME):
+        self.path = path
+        self.collection_name = collection_name
+        self._collection = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            client = get_chroma_client(self.path)
+            self._collection = client.get_or_create_collection(name=self.collection_name)
+        return self._collection
+
+    def add(self, ids, documents, embeddings, metadatas, batch_size=MAX_WRITE_BATCH_SIZE):
+        """
+        Writes in chunks of at most batch_size (capped by Chroma's own maximum batch size). Upserts, so writing
+        the same ids again (e.g. a batch replayed after a crash) replaces them instead of duplicating them.
+        """
+        client = get_chroma_client(self.path)
+        max_batch = getattr(client, "get_max_batch_size", None)
+        batch_size = min(batch_size, max_batch()) if max_batch else batch_size
+        for start, batch_ids in batched(list(ids), batch_size):
+            end = start + len(batch_ids)
+            self.collection.upsert(
+                ids=batch_ids, documents=documents[start:end],
+                embeddings=embeddings[start:end], metadatas=metadatas[start:end],
+            )
+
+    def get(self, where=None, include=("documents", "metadatas")):
+        results = self.collection.get(where=where, include=list(include))
+        return {"ids": results["ids"], "documents": results.get("documents"), "metadatas": results.get("metadatas")}
+
+    def query(self, embedding, top_k=5, where=None):
+        results = self.collection.query(
+            query_embeddings=[embedding], n_results=top_k, where=where,
+            include=["documents", "metadatas", "distances"],
+        )
+        return {key: results[key][0] for key in ("ids", "documents", "metadatas", "distances")}
+
+    def get_grouped(self, key="supplier", values=None, include=("documents", "metadatas")):
+        """Fetches chunks for many groups in a single read, grouped by the metadata field key."""
+        where = {key: {"$in": list(values)}} if values else None
+        include = tuple(dict.fromkeys((*include, "metadatas")))
+        return group_by_metadata(self.get(where=where, include=include), key)
+
+    def count(self):
+        return self.collection.count()
+
+
+class NumpyVectorStore:
+    """
+    Embedded vector store for small and medium corpora. Unit-normalised embeddings are kept in memory-mapped
+    float16 matrices, or int8 with a per-row scale, next to JSON files of ids, documents and metadata.
+    Nothing is read until the first query. Search is a filtered brute-force matrix multiply, and distances
+    are cosine distances.
+
+    Every add() writes a new segment (<segment>.embeddings.npy, .scales.npy, .records.json) and then publishes
+    it with a single atomic swap of manifest.json, which also records rows replaced by later segments. Like a
+    binary counter, the newest segment is merged with the previous one while that one is not larger, so each
+    row is rewritten O(log N) times instead of on every add.
+
+    Readers work on an immutable snapshot (manifest, segments, records) that add() replaces in one assignment,
+    so a query running during an add sees either the old or the new state, never a half-rebuilt one.
+    """
+
+    def __init__(self, path=NUMPY_STORE_PATH, dtype=NUMPY_STORE_DTYPE):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported vector store dtype: {dtype}")
+        self.path = path
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _segment_file(self, segment, kind):
+        return self._file(f"{segment}.{kind}")
+
+    def _read_manifest(self):
+        if not os.path.exists(self._file("manifest.json")):
+            return {"next_segment": 1, "segments": [], "deleted": {}}
+        with open(self._file("manifest.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _load_segment(self, entry, deleted):
+        name = entry["name"]
+        with open(self._segment_file(name, "records.json"), "r", encoding="utf-8") as f:
+            records = json.load(f)
+        scales_path = self._segment_file(name, "scales.npy")
+        return {
+            "name": name,
+            "matrix": np.load(self._segment_file(name, "embeddings.npy"), mmap_mode="r"),
+            "scales": np.load(scales_path, mmap_mode="r") if os.path.exists(scales_path) else None,
+            "records": records,
+            "live": np.array([i for i in range(entry["rows"]) if i not in deleted], dtype=int),
+        }
+
+    def _build_snapshot(self, manifest):
+        segments, records, offset = [], {"ids": [], "documents": [], "metadatas": []}, 0
+        for entry in manifest["segments"]:
+            segment = self._load_segment(entry, set(manifest["deleted"].get(entry["name"], [])))
+            segment["offset"] = offset
+            for key in records:
+                records[key].extend(segment["records"][key][i] for i in segment["live"])
+            offset += segment["live"].size
+            segments.append(segment)
+        return {"manifest": manifest, "segments": segments, "records": records}
+
+    def _load(self):
+        """The current snapshot, read from disk on first use. Callers keep the returned object for the whole call."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = self._build_snapshot(self._read_manifest())
+            return self._snapshot
+
+    def _quantize(self, matrix):
+        if self.dtype == "int8":
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return matrix.astype(np.float16), None
+
+    def _write_segment(self, name, quantized, scales, records):
+        np.save(self._segment_file(name, "embeddings.npy"), quantized)
+        if scales is not None:
+            np.save(self._segment_file(name, "scales.npy"), scales)
+        with open(self._segment_file(name, "records.json"), "w", encoding="utf-8") as f:
+            json.dump(records, f)
+
+    def _merge_tail(self, manifest):
+        """Merges the newest segment into the previous one while the previous one has no more live rows."""
+        def live_rows(entry):
+            return entry["rows"] - len(manifest["deleted"].get(entry["name"], []))
+
+        while len(manifest["segments"]) >= 2 and live_rows(manifest["segments"][-2]) <= live_rows(manifest["segments"][-1]):
+            pair = manifest["segments"][-2:]
+            loaded = [self._load_segment(entry, set(manifest["deleted"].get(entry["name"], []))) for entry in pair]
+            if all(entry["dtype"] == self.dtype for entry in pair):
+                # ✅ Same encoding: quantized rows and scales are copied as they are
+                quantized = np.concatenate([np.asarray(seg["matrix"][seg["live"]]) for seg in loaded])
+                scales = np.concatenate([np.asarray(seg["scales"][seg["live"]]) for seg in loaded]) if self.dtype == "int8" else None
+            else:
+                quantized, scales = self._quantize(np.concatenate([
+                    np.asarray(seg["matrix"][seg["live"]], dtype=np.float32)
+                    * (np.asarray(seg["scales"][seg["live"]], dtype=np.float32)[:, None] if seg["scales"] is not None else 1.0)
+                    for seg in loaded
+                ]))
+            records = {key: [seg["records"][key][i] for seg in loaded for i in seg["live"]] for key in ("ids", "documents", "metadatas")}
+            name = f"seg-{manifest['next_segment']:06d}"
+            manifest["next_segment"] += 1
+            self._write_segment(name, quantized, scales, records)
+            for entry in pair:
+                manifest["deleted"].pop(entry["name"], None)
+            manifest["segments"][-2:] = [{"name": name, "rows": len(records["ids"]), "dtype": self.dtype}]
+
+    def _remove_unreferenced(self, manifest):
+        referenced = {entry["name"] for entry in manifest["segments"]}
+        for filename in os.listdir(self.path):
+            if filename.startswith("seg-") and filename.split(".", 1)[0] not in referenced:
+                try:
+                    os.remove(self._file(filename))
+                except OSError:  # Still memory-mapped by a reader of an older snapshot (Windows); removed by a later add
+                    pass
+
+    def add(self, ids, documents, embeddings, metadatas):
+        new = np.asarray(embeddings, dtype=np.float32)
+        new /= np.maximum(np.linalg.norm(new, axis=1, keepdims=True), 1e-12)
+        quantized, scales = self._quantize(new)
+        records = {"ids": list(ids), "documents": list(documents), "metadatas": [dict(m) for m in metadatas]}
+
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = self._build_snapshot(self._read_manifest())
+            current = self._snapshot
+            manifest = json.loads(json.dumps(current["manifest"]))
+            name = f"seg-{manifest['next_segment']:06d}"
+            manifest["next_segment"] += 1
+            self._write_segment(name, quantized, scales, records)
+
+            # ✅ Re-adding an ID replaces the stored version: its older rows are marked deleted
+            replaced = set(ids)
+            for segment in current["segments"]:
+                rows = [int(segment["live"][i]) for i, doc_id in enumerate(
+                    current["records"]["ids"][segment["offset"]:segment["offset"] + segment["live"].size]) if doc_id in replaced]
+                if rows:
+                    manifest["deleted"].setdefault(segment["name"], []).extend(rows)
+            manifest["segments"].append({"name": name, "rows": len(ids), "dtype": self.dtype})
+            self._merge_tail(manifest)
+
+            # ✅ One atomic manifest swap publishes the new segment, the merge and the deletions together
+            with open(self._file("manifest.tmp.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(self._file("manifest.tmp.json"), self._file("manifest.json"))
+            self._snapshot = self._build_snapshot(manifest)
+            current = None  # Drop this call's memory maps of the replaced segments before removing their files
+            self._remove_unreferenced(manifest)
+
+    @staticmethod
+    def _filtered_rows(records, where):
+        return [i for i, metadata in enumerate(records["metadatas"]) if matches_where(metadata, where)]
+
+    def get(self, where=None, include=("documents", "metadatas")):
+        records = self._load()["records"]
+        rows = self._filtered_rows(records, where)
+        return {
+            "ids": [records["ids"][i] for i in rows],
+            "documents": [records["documents"][i] for i in rows] if "documents" in include else None,
+            "metadatas": [records["metadatas"][i] for i in rows] if "metadatas" in include else None,
+        }
+
+    def query(self, embedding, top_k=5, where=None):
+        snapshot = self._load()
+        records = snapshot["records"]
+        empty = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        rows = np.arange(len(records["ids"])) if not where else np.array(self._filtered_rows(records, where), dtype=int)
+        if rows.size == 0:
+            return empty
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= max(np.linalg.norm(query), 1e-12)
+        # ✅ Score segment by segment, in blocks, so only QUERY_BLOCK_ROWS rows are ever upcast to float32 at once
+        similarities = np.full(rows.size, -np.inf, dtype=np.float32)  # Every row is scored below; -inf never ranks
+        for segment in snapshot["segments"]:
+            positions = np.nonzero((rows >= segment["offset"]) & (rows < segment["offset"] + segment["live"].size))[0]
+            local_rows = segment["live"][rows[positions] - segment["offset"]]
+            for start in range(0, local_rows.size, QUERY_BLOCK_ROWS):
+                block = local_rows[start:start + QUERY_BLOCK_ROWS]
+                scores = np.asarray(segment["matrix"][block], dtype=np.float32) @ query
+                if segment["scales"] is not None:
+                    scores *= np.asarray(segment["scales"][block], dtype=np.float32)
+                similarities[positions[start:start + block.size]] = scores
+
+        k = min(top_k, rows.size)
+        best = np.argpartition(-similarities, k - 1)[:k]
+        best = best[np.argsort(-similarities[best])]
+        return {
+            "ids": [records["ids"][rows[i]] for i in best],
+            "documents": [records["documents"][rows[i]] for i in best],
+            "metadatas": [records["metadatas"][rows[i]] for i in best],
+            "distances": [float(1.0 - similarities[i]) for i in best],
+        }
+
+    def get_grouped(self, key="supplier", values=None, include=("documents", "metadatas")):
+        """Fetches chunks for many groups in a single pass, grouped by the metadata field key."""
+        where = {key: {"$in": list(values)}} if values else None
+        include = tuple(dict.fromkeys((*include, "metadatas")))
+        return group_by_metadata(self.get(where=where, include=include), key)
+
+    def count(self):
+        return len(self._load()["records"]["ids"])
+
+
+def get_vector_store(backend=None):
+    """Returns the shared store for the configured backend ("chroma" or "numpy"), one per path per process."""
+    backend = backend or VECTOR_STORE_BACKEND
+    factories = {"chroma": (ChromaVectorStore, CHROMA_PATH), "numpy": (NumpyVectorStore, NUMPY_STORE_PATH)}
+    if backend not in factories:
+        raise ValueError(f"Unknown vector store backend: {backend}")
+    factory, path = factories[backend]
+    key = (backend, os.path.abspath(path))
+    with _registry_lock:
+        if key not in _stores:
+            _stores[key] = factory(path)
+        return _stores[key]
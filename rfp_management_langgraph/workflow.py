@@ -0,0 +1,38 @@
+import importlib
+from utils.output_utils import save_markdown
+
+# ✅ Steps whose tool returns its document rather than saving it (in a full run the crew task writes the file)
+STEP_OUTPUT_FILES = {
+    "SupplierAnalysis": "1.rfp_comparative_analysis.md",
+    "PricingRiskAnalysis": "2.pricing_risk_analysis.md",
+    "NegotiationCharter": "3.negotiation_charter.md",
+    "ContractGeneration": "6.final_contract.md",
+}
+
+
+def workflow_steps():
+    """(step name, module, tool attribute) for every LLM-backed workflow step, in run order."""
+    return [
+        ("SupplierAnalysis", "tools.rfp_analyzer", "supplier_analysis_tool"),
+        ("PricingRiskAnalysis", "tools.analyze_pricing_risk", "pricing_risk_analysis_tool"),
+        ("NegotiationCharter", "tools.negotiationchartercreator", "negotiation_charter_creator_tool"),
+        ("NegotiationEmails", "tools.negotiation_email_writer", "generate_negotiation_emails_per_supplier"),
+        ("FinalNegotiationEmails", "tools.counter_offer_generator", "generate_final_negotiation_emails_per_supplier"),
+        ("ContractGeneration", "tools.contract_generator", "generate_contract"),
+        ("ContractReview", "tools.legal_review", "review_contract_by_section"),
+    ]
+
+
+def run_tool_step(module_name, attribute):
+    """Imports a tool module and calls the undecorated tool function."""
+    tool = getattr(importlib.import_module(module_name), attribute)
+    return getattr(tool, "func", tool)()
+
+
+def save_step_output(name, result):
+    """Saves the document a step's tool returned under the step's output filename. Returns the filename or None."""
+    filename = STEP_OUTPUT_FILES.get(name)
+    if filename is None or result is None:
+        return None
+    save_markdown(result, filename=filename)
+    return filename
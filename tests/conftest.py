@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The application modules import each other as top-level packages ("from utils.x import ..."), as they do
+# when run from rfp_management_langgraph/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rfp_management_langgraph"))
+
+# Some tool modules create their OpenAI clients at import time; no test reaches the API
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
@@ -0,0 +1,61 @@
+import os
+import pytest
+from utils import artifact_store
+from utils.artifact_store import ArtifactStore, start_run
+from utils.output_utils import load_markdown, save_markdown
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(artifact_store, "_store", None)
+    return tmp_path
+
+
+def test_identical_content_is_stored_once_and_manifests_track_each_run(tmp_path):
+    store = ArtifactStore(str(tmp_path / "archive"))
+    store.save("report.md", "same text", run_id="run-a")
+    store.save("report.md", "same text", run_id="run-b")
+    store.save("notes.md", "ÄÖÜ", run_id="run-b")
+    blobs = [name for _, _, names in os.walk(tmp_path / "archive" / "blobs") for name in names]
+    assert len(blobs) == 2
+    assert store.manifest("run-b")["artifacts"]["notes.md"]["size"] == 6  # Bytes, not characters
+    assert store.latest("report.md") == "same text" and store.index()["report.md"]["run_id"] == "run-b"
+    assert [run["run_id"] for run in store.runs()] == ["run-a", "run-b"]
+    with pytest.raises(KeyError):
+        store.manifest("run-c")
+
+
+def test_diff_compares_runs_by_digest(tmp_path):
+    store = ArtifactStore(str(tmp_path / "archive"))
+    store.save("a.md", "one\n", run_id="r1")
+    store.save("b.md", "same\n", run_id="r1")
+    store.save("a.md", "two\n", run_id="r2")
+    store.save("b.md", "same\n", run_id="r2")
+    store.save("c.md", "new\n", run_id="r2")
+    diff = store.diff("r1", "r2")
+    assert diff["added"] == ["c.md"] and diff["unchanged"] == ["b.md"] and diff["removed"] == []
+    assert "-one" in diff["changed"]["a.md"] and "+two" in diff["changed"]["a.md"]
+
+
+def test_inputs_come_from_disk_after_a_restore_or_a_hand_edit(workspace):
+    start_run("first")
+    save_markdown("first contract", "6.final_contract.md")
+    start_run("second")
+    save_markdown("second contract", "6.final_contract.md")
+
+    artifact_store.get_artifact_store().restore("first")
+    assert load_markdown("6.final_contract.md") == "first contract"
+    assert artifact_store.get_artifact_store().latest("6.final_contract.md") == "first contract"
+
+    (workspace / "outputs" / "6.final_contract.md").write_text("edited by hand", encoding="utf-8")
+    assert load_markdown("6.final_contract.md") == "edited by hand"
+    assert load_markdown("missing.md") is None
+
+
+def test_load_markdown_reads_the_directory_it_is_given(workspace):
+    save_markdown("current", "6.final_contract.md")
+    os.makedirs(workspace / "previous")
+    (workspace / "previous" / "6.final_contract.md").write_text("previous", encoding="utf-8")
+    assert load_markdown(os.path.join("previous", "6.final_contract.md")) == "previous"
+    assert load_markdown("./outputs/6.final_contract.md") == "current"
@@ -0,0 +1,92 @@
+import os
+import pytest
+from langchain_core.messages import AIMessage
+from utils import artifact_store, llm_gateway
+from utils.batch_mode import DEFERRED_MARKER, run_deferred
+
+LAYERS = 10  # More dependent calls in one step than any fixed round limit of the past
+
+TOOLS = f'''
+from utils.llm_gateway import get_llm
+from utils.output_utils import load_markdown
+
+
+def layered_analysis():
+    text = "start"
+    for layer in range({LAYERS}):
+        text = get_llm().invoke(f"layer {{layer}}: {{text}}").content
+    return text
+
+
+def charter():
+    return get_llm().invoke("charter from: " + load_markdown("2.pricing_risk_analysis.md")).content
+'''
+STEPS = [
+    ("PricingRiskAnalysis", "deferred_test_tools", "layered_analysis"),
+    ("NegotiationCharter", "deferred_test_tools", "charter"),
+]
+
+
+class StubGateway:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.prompts = []
+
+    def client(self, model, temperature, **kwargs):
+        gateway = self
+
+        class Client:
+            def invoke(self, messages):
+                prompt = messages[-1][1]
+                gateway.prompts.append(prompt)
+                if gateway.fail:
+                    raise RuntimeError("endpoint down")
+                return AIMessage(content=f"answer[{prompt.split(':')[0]}]")
+
+        return Client()
+
+    def call(self, model, priority, fn, on_success=None):
+        return fn()
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    (tmp_path / "deferred_test_tools.py").write_text(TOOLS, encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(artifact_store, "_store", None)
+    return tmp_path
+
+
+def test_local_batches_run_every_dependent_layer_and_write_real_outputs(workspace, monkeypatch):
+    gateway = StubGateway()
+    monkeypatch.setattr(llm_gateway, "get_gateway", lambda: gateway)
+    state = run_deferred(run_id="e2e", steps=STEPS, backend="local")
+
+    assert state["steps"] == {"PricingRiskAnalysis": "completed", "NegotiationCharter": "completed"}
+    assert len(state["batch_rounds"]) == LAYERS + 1
+    assert all(round_["requests"] == round_["results"] == 1 for round_ in state["batch_rounds"])
+    assert not any(DEFERRED_MARKER in prompt for prompt in gateway.prompts)  # Only prompts built from real results
+    assert sorted(state["output_files"]) == ["2.pricing_risk_analysis.md", "3.negotiation_charter.md"]
+    with open(workspace / "outputs" / "2.pricing_risk_analysis.md", encoding="utf-8") as f:
+        assert f.read() == f"answer[layer {LAYERS - 1}]"
+    with open(workspace / "outputs" / "3.negotiation_charter.md", encoding="utf-8") as f:
+        assert f.read() == "answer[charter from]"
+
+
+def test_resumed_run_reuses_stored_results(workspace, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "get_gateway", StubGateway)
+    run_deferred(run_id="resume", steps=STEPS, backend="local")
+    gateway = StubGateway(fail=True)
+    monkeypatch.setattr(llm_gateway, "get_gateway", lambda: gateway)
+    state = run_deferred(run_id="resume", steps=STEPS, backend="local")
+    assert state["batch_rounds"] == [] and not gateway.prompts
+    assert state["steps"]["NegotiationCharter"] == "completed"
+
+
+def test_run_stops_when_rounds_return_nothing(workspace, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "get_gateway", lambda: StubGateway(fail=True))
+    state = run_deferred(run_id="down", steps=STEPS, backend="local")
+    assert len(state["batch_rounds"]) == 2 and all(round_["results"] == 0 for round_ in state["batch_rounds"])
+    assert state["steps"] == {"PricingRiskAnalysis": "pending"}
+    assert state["output_files"] == {} and not os.path.exists(workspace / "outputs" / "2.pricing_risk_analysis.md")
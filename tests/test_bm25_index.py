@@ -0,0 +1,45 @@
+from utils.bm25_index import BM25Index, tokenize
+
+
+def test_tokenize_keeps_identifiers_intact():
+    assert tokenize("ISO 27001, SOC-2 and gpt-4o v4.2") == ["iso", "27001", "soc-2", "and", "gpt-4o", "v4.2"]
+
+
+def _index():
+    index = BM25Index()
+    index.add(
+        ["a1", "a2", "b1"],
+        ["Acme offers ISO 27001 certified hosting", "Acme pricing is $900 per month", "Beta offers SOC-2 hosting"],
+        [{"supplier": "Acme"}, {"supplier": "Acme"}, {"supplier": "Beta"}],
+    )
+    return index
+
+
+def test_search_ranks_matching_documents_and_filters_by_supplier():
+    index = _index()
+    assert index.search("27001 hosting")[0][0] == "a1"
+    assert [doc_id for doc_id, _ in index.search("hosting", supplier="Beta")] == ["b1"]
+    assert index.search("nothing matches") == []
+
+
+def test_re_adding_ids_is_idempotent():
+    index = _index()
+    before = (len(index), index.total_length, index.search("hosting"))
+    index.add(["a1", "b1"], ["Acme offers ISO 27001 certified hosting", "Beta offers SOC-2 hosting"],
+              [{"supplier": "Acme"}, {"supplier": "Beta"}])
+    assert (len(index), index.total_length, index.search("hosting")) == before
+
+
+def test_re_adding_an_id_replaces_its_text():
+    index = _index()
+    index.add(["b1"], ["Beta now offers managed kubernetes"], [{"supplier": "Beta"}])
+    assert index.search("SOC-2") == []
+    assert index.search("kubernetes")[0][0] == "b1"
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "bm25_index.json")
+    _index().save(path)
+    loaded = BM25Index.load(path)
+    assert len(loaded) == 3
+    assert loaded.search("27001 hosting") == _index().search("27001 hosting")
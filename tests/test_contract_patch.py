@@ -0,0 +1,23 @@
+import pytest
+from utils.contract_sections import PatchError, apply_unified_diff
+
+
+def test_apply_unified_diff_locates_hunks_by_context():
+    text = "a\nb\nc\nd\n"
+    diff = "--- a\n+++ b\n@@ -10,3 +10,3 @@\n b\n-c\n+C\n d\n"
+    assert apply_unified_diff(text, diff) == "a\nb\nC\nd\n"
+
+
+def test_apply_unified_diff_places_pure_insertions_by_header_line():
+    text = "one\ntwo\nthree\nfour\n"
+    assert apply_unified_diff(text, "@@ -3,0 +4,1 @@\n+inserted\n") == "one\ntwo\nthree\ninserted\nfour\n"
+    assert apply_unified_diff("one\ntwo", "@@ -2,0 +3 @@\n+three\n") == "one\ntwo\nthree"
+
+
+def test_apply_unified_diff_rejects_unknown_context_and_headerless_insertions():
+    with pytest.raises(PatchError):
+        apply_unified_diff("a\nb\n", "@@ -1,1 +1,1 @@\n-x\n+y\n")
+    with pytest.raises(PatchError):
+        apply_unified_diff("a\nb\n", "@@\n+y\n")
+    with pytest.raises(PatchError):
+        apply_unified_diff("a\nb\n", "no hunks here")
@@ -0,0 +1,34 @@
+from utils.contract_sections import join_sections, split_sections
+
+CONTRACT = """Agreement between Acme and Buyer.
+
+# Master Services Agreement
+
+## 1. Scope
+Acme provides hosting.
+
+## 2. Pricing & Payment
+Fees are $1,000 per month.
+
+### 2.1 Invoicing
+Monthly in arrears.
+
+## 2. Pricing & Payment
+Repeated heading.
+"""
+
+
+def test_split_sections_round_trips_and_keeps_ids_unique():
+    sections = split_sections(CONTRACT)
+    assert join_sections(sections) == CONTRACT
+    assert [section["id"] for section in sections] == [
+        "preamble", "master-services-agreement", "1-scope", "2-pricing-payment", "2-pricing-payment-2",
+    ]
+    # Level-3 headings stay inside their parent section
+    assert "### 2.1 Invoicing" in sections[3]["text"]
+
+
+def test_split_sections_hash_ignores_trailing_whitespace():
+    a = split_sections("## Terms\nNet 30.\n")[0]["hash"]
+    b = split_sections("## Terms   \nNet 30.   \n")[0]["hash"]
+    assert a == b
@@ -0,0 +1,64 @@
+import time
+import pytest
+import fitz
+from graph import graph
+from nodes import analysis_router, proposal_processor
+from utils.deadline import deadline_node, format_deadline_report, limit_chunks, start_deadline
+
+
+@pytest.fixture
+def proposals(tmp_path):
+    directory = tmp_path / "proposals"
+    directory.mkdir()
+    document = fitz.open()
+    document.new_page().insert_text((72, 72), "Company Name: Acme Cloud\nSetup fee: $1,000")
+    document.save(str(directory / "acme.pdf"))
+    return directory
+
+
+def _state(pdf_dir, **config):
+    return {"input_files": {"proposal_pdfs": str(pdf_dir)}, "output_files": {}, "steps": {}, "config": config}
+
+
+def test_ingestion_degrades_instead_of_crashing_when_the_deadline_has_already_expired(proposals, monkeypatch):
+    monkeypatch.chdir(proposals.parent)
+    result = graph.invoke(_state(proposals, deadline_s=1, supplier_analysis=True))  # Below the 5s safety margin
+    assert result["steps"] == {"ProposalProcessor": "degraded", "SupplierAnalysis": "skipped"}
+    assert result["deadline"]["skipped"] == ["SupplierAnalysis (deadline expired during ingestion)"]
+    node = result["deadline"]["nodes"]["ProposalProcessor"]
+    assert node["runs"] == 1 and node["degraded"] == ["ingestion stopped at the deadline before acme.pdf"]
+    assert "ingestion stopped at the deadline" in format_deadline_report(result["deadline"])
+
+
+def test_ingestion_of_an_empty_directory_is_recorded_and_ends_the_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    state = proposal_processor(_state(tmp_path, supplier_analysis=True))
+    assert state["steps"] == {"ProposalProcessor": "empty"}
+    assert analysis_router(state) == "done"
+
+
+def test_analysis_runs_only_when_requested_after_stored_chunks():
+    def state(status, requested=True):
+        return {"steps": {"ProposalProcessor": status}, "config": {"supplier_analysis": requested}}
+
+    assert analysis_router(state("completed")) == "analyze"
+    assert analysis_router(state("degraded")) == "analyze"
+    assert analysis_router(state("completed", requested=False)) == "done"
+    assert analysis_router(state("failed")) == "done"
+    skipped = state("degraded")
+    skipped["steps"]["SupplierAnalysis"] = "skipped"
+    assert analysis_router(skipped) == "done"
+
+
+def test_chunks_are_limited_once_the_budget_runs_low():
+    def node(state):
+        state["kept"] = len(limit_chunks(list(range(50)), "Analysis"))
+        state["steps"]["Analysis"] = "completed"
+        return state
+
+    state = {"steps": {}, "config": {}}
+    report = start_deadline(state, 100)
+    report["deadline_at"] = time.time() + 20  # 15s usable of a 100s budget: below the low-budget share
+    result = deadline_node("Analysis", node)(state)
+    assert result["kept"] == 12 and result["steps"]["Analysis"] == "degraded"
+    assert report["nodes"]["Analysis"]["degraded"] == ["Analysis: used the first 12 chunks per supplier"]
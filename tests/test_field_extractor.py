@@ -0,0 +1,45 @@
+from utils import field_extractor
+from utils.field_extractor import extract_fields, load_supplier_fields, save_supplier_fields, sidecar_scoring_fields, summarize_fields
+
+
+def test_extract_fields_finds_prices_terms_and_slas_with_pages():
+    pages = [
+        "Setup fee: $2,500 one-time. Storage at $0.02 per GB per month.",
+        "Contract term of 24 months. Uptime SLA of 99.95%.",
+    ]
+    fields = {field["field"]: field for field in extract_fields(pages)}
+    assert fields["setup_fee"]["value"] == 2500.0 and fields["setup_fee"]["currency"] == "USD"
+    assert fields["unit_price"]["value"] == 0.02 and fields["unit_price"]["unit"] == "GB/month"
+    assert fields["contract_term"]["value"] == 24 and fields["contract_term"]["page"] == 2
+    assert fields["sla_uptime"]["value"] == 99.95
+
+
+def test_contract_term_keywords_are_whole_words():
+    fields = extract_fields(["We determine a 3 years roadmap. Minimum commitment: 2 years."])
+    assert [field["value"] for field in fields if field["field"] == "contract_term"] == [24]
+
+
+def test_summarize_fields_flattens_to_scalars():
+    summary = summarize_fields(extract_fields(["Lock-in: 12 months, or a term of 36 months. 99.9% uptime. €1.5k setup fee"]))
+    assert summary["contract_term_months"] == 36
+    assert summary["sla_uptime_pct"] == 99.9
+    assert all(isinstance(value, (int, float)) for value in summary.values())
+
+
+def test_min_unit_price_only_compares_prices_in_the_same_unit():
+    same = summarize_fields(extract_fields(["Storage: $0.03 per GB per month, archive $0.01 per GB per month."]))
+    assert same["min_unit_price"] == 0.01 and same["unit_price_unit"] == "GB/month"
+    mixed = summarize_fields(extract_fields(["Compute at $2 per hour, licences at $40 per seat."]))
+    assert "min_unit_price" not in mixed and mixed["currency_amount_count"] == 2
+
+
+def test_sidecar_keeps_entries_per_source_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(field_extractor, "SUPPLIER_FIELDS_DIR", str(tmp_path))
+    save_supplier_fields("Acme Cloud", "a.pdf", {"supplier": "Acme Cloud"}, extract_fields(["Setup fee: $1,000"]))
+    save_supplier_fields("Acme Cloud", "b.pdf", {"supplier": "Acme Cloud"}, extract_fields(["Uptime SLA of 99.9%"]))
+    save_supplier_fields("Acme Cloud", "a.pdf", {"supplier": "Acme Cloud"}, extract_fields(["Setup fee: $1,500"]))
+    payload = load_supplier_fields("Acme Cloud")
+    assert sorted(payload["sources"]) == ["a.pdf", "b.pdf"]
+    assert [f["value"] for f in load_supplier_fields("Acme Cloud", "setup_fee")] == [1500.0]
+    assert sidecar_scoring_fields("Acme Cloud") == {"setup_fee": 1500.0, "sla_uptime_pct": 99.9}
+    assert load_supplier_fields("Nobody") is None
@@ -0,0 +1,117 @@
+import sqlite3
+import pytest
+from utils import distributed_ingest, field_extractor, vector_store
+from utils.bm25_index import BM25Index
+from utils.distributed_ingest import IngestQueue, run_writer
+
+
+@pytest.fixture
+def queue(tmp_path):
+    for name in ("a.pdf", "b.pdf"):
+        (tmp_path / name).write_bytes(name.encode())
+    queue = IngestQueue(str(tmp_path / "ingest.sqlite3"))
+    assert queue.enqueue([str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf")]) == 2
+    return queue
+
+
+def _result(chunks=1, prefix="c", supplier="Acme"):
+    return {
+        "ids": [f"{prefix}{i}" for i in range(chunks)], "documents": [f"{supplier} hosting offer"] * chunks,
+        "embeddings": [[1.0, 0.0]] * chunks, "metadatas": [{"supplier": supplier}] * chunks,
+        "sidecar": {"supplier": supplier, "source_file": f"{prefix}.pdf", "metadata": {"supplier": supplier},
+                    "fields": [{"field": "setup_fee", "value": 100.0, "page": 1}]},
+    }
+
+
+def test_enqueue_skips_files_already_seen(queue, tmp_path):
+    assert queue.enqueue([str(tmp_path / "a.pdf")]) == 0
+
+
+def test_claim_leases_each_task_once(queue):
+    first, second = queue.claim("w1"), queue.claim("w2")
+    assert {first["id"], second["id"]} == {row["id"] for row in (first, second)} and first["id"] != second["id"]
+    assert first["attempt"] == 1
+    assert queue.claim("w3") is None
+
+
+def test_only_the_lease_owner_can_heartbeat_or_complete(queue):
+    task = queue.claim("w1")
+    assert queue.heartbeat(task["id"], "w1")
+    assert not queue.heartbeat(task["id"], "w2")
+    assert not queue.complete(task["id"], "w2", _result())
+    assert queue.complete(task["id"], "w1", _result(2))
+    assert [(task_id, len(result["ids"])) for task_id, result in queue.embedded()] == [(task["id"], 2)]
+
+
+def test_expired_lease_is_claimed_by_another_worker(queue, monkeypatch):
+    monkeypatch.setattr(distributed_ingest, "LEASE_SECONDS", -1)
+    task = queue.claim("dead-worker")
+    queue.claim("w1")  # The other task
+    reclaimed = queue.claim("w2")
+    assert reclaimed["id"] == task["id"] and reclaimed["attempt"] == 2
+    assert not queue.complete(task["id"], "dead-worker", _result())
+
+
+def test_expired_lease_fails_after_max_attempts(queue, monkeypatch):
+    monkeypatch.setattr(distributed_ingest, "LEASE_SECONDS", -1)
+    monkeypatch.setattr(distributed_ingest, "MAX_ATTEMPTS", 1)
+    queue.claim("w1")
+    queue.claim("w1")
+    assert queue.claim("w2") is None
+    progress = queue.progress()
+    assert progress["counts"] == {"failed": 2}
+    assert all("Lease expired" in failure["error"] for failure in progress["failures"])
+
+
+def test_fail_retries_with_backoff_then_gives_up(queue, monkeypatch):
+    monkeypatch.setattr(distributed_ingest, "RETRY_BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(distributed_ingest, "MAX_ATTEMPTS", 2)
+    task = queue.claim("w1")
+    queue.fail(task["id"], "w1", "boom")
+    retried = [queue.claim("w1"), queue.claim("w1")]
+    again = next(t for t in retried if t["id"] == task["id"])
+    assert again["attempt"] == 2
+    queue.fail(again["id"], "w1", "boom again")
+    assert queue.progress()["counts"]["failed"] == 1
+    assert queue.retry_failed() == 1
+
+
+def test_mark_stored_clears_outstanding_work(queue):
+    for owner in ("w1", "w2"):
+        task = queue.claim(owner)
+        queue.complete(task["id"], owner, _result())
+    assert queue.outstanding() == 2
+    queue.mark_stored([task_id for task_id, _ in queue.embedded()])
+    assert queue.outstanding() == 0 and queue.progress()["stored_chunks"] == 2
+
+
+def test_writer_lease_is_exclusive(queue):
+    assert queue.acquire_lease("writer", "w1")
+    assert not queue.acquire_lease("writer", "w2")
+    queue.release_lease("writer", "w1")
+    assert queue.acquire_lease("writer", "w2")
+
+
+def test_embedded_reads_only_the_payloads_of_the_batch(queue):
+    first, second = queue.claim("w1"), queue.claim("w1")
+    queue.complete(first["id"], "w1", _result(3, "a"))
+    queue.complete(second["id"], "w1", _result(3, "b"))
+    with sqlite3.connect(queue.path) as conn:  # A payload outside the batch is never decompressed
+        conn.execute("UPDATE ingest_tasks SET payload = ? WHERE id = ?", (b"not zlib", second["id"]))
+    batch = queue.embedded(max_chunks=4)
+    assert [(task_id, result["ids"]) for task_id, result in batch] == [(first["id"], ["a0", "a1", "a2"])]
+
+
+def test_writer_stores_chunks_and_sidecars_then_stops(queue, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(vector_store, "VECTOR_STORE_BACKEND", "numpy")
+    monkeypatch.setattr(field_extractor, "SUPPLIER_FIELDS_DIR", str(tmp_path / "supplier_fields"))
+    for owner, supplier in (("w1", "Acme"), ("w2", "Beta")):
+        task = queue.claim(owner)
+        queue.complete(task["id"], owner, _result(2, supplier.lower(), supplier))
+
+    assert run_writer(queue.path, batch_chunks=2) == 4
+    assert queue.outstanding() == 0
+    assert vector_store.get_vector_store().count() == 4
+    assert [doc_id for doc_id, _ in BM25Index.load().search("hosting", supplier="Beta")] == ["beta0", "beta1"]
+    assert field_extractor.load_supplier_fields("Beta", "setup_fee")[0]["source_file"] == "beta.pdf"
@@ -0,0 +1,39 @@
+import sqlite3
+from utils.job_queue import JobQueue
+
+
+def test_jobs_are_claimed_oldest_first_and_once(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    first = queue.enqueue("procurement", {"config": {"a": 1}})
+    second = queue.enqueue("contract_review", {})
+    job = queue.claim()
+    assert (job["id"], job["status"], job["attempts"], job["payload"]) == (first, "running", 1, {"config": {"a": 1}})
+    assert queue.claim()["id"] == second
+    assert queue.claim() is None
+    queue.complete(first, {"steps": {"ProposalProcessor": "completed"}})
+    queue.fail(second, "ValueError: bad input")
+    assert queue.get(first)["result"] == {"steps": {"ProposalProcessor": "completed"}}
+    assert queue.get(second)["error"] == "ValueError: bad input"
+    assert queue.counts() == {"succeeded": 1, "failed": 1}
+    assert [job["id"] for job in queue.list()] == [second, first] and "result" not in queue.list()[0]
+
+
+def test_interrupted_jobs_are_requeued_until_they_reach_max_attempts(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path)
+    job_id = queue.enqueue("procurement", {})
+    for restart in range(1, 3):
+        assert queue.claim()["attempts"] == restart
+        assert JobQueue(path).requeue_interrupted(max_attempts=3) == (1, 0)  # The process restarted mid-run
+    queue.claim()
+    assert JobQueue(path).requeue_interrupted(max_attempts=3) == (0, 1)
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and job["error"] == "Interrupted 3 times"
+    assert queue.claim() is None
+
+
+def test_schema_counts_attempts(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    JobQueue(path)
+    with sqlite3.connect(path) as conn:
+        assert "attempts" in {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
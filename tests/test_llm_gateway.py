@@ -0,0 +1,105 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from utils import fake_llm_server, run_planner
+from utils.llm_gateway import AdaptiveLimiter, LLMGateway, classify_error
+from utils.stats_store import StatsFile
+
+
+@pytest.fixture
+def fake_endpoint():
+    servers = []
+
+    def start(**options):
+        server = fake_llm_server.make_server(port=0, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def throughput(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(run_planner, "_throughput", StatsFile(str(tmp_path / "throughput.json")))
+
+
+def _post(base_url):
+    request = urllib.request.Request(
+        f"{base_url}/chat/completions", data=json.dumps({"model": "fake", "messages": []}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+def test_random_throttles_do_not_hold_capacity(fake_endpoint, monkeypatch):
+    draws = iter([0.0, 0.0, 0.0])  # Three throttled calls, then none
+
+    class Random:
+        @staticmethod
+        def random():
+            return next(draws, 1.0)
+
+        @staticmethod
+        def getrandbits(bits):
+            return 0
+
+    monkeypatch.setattr(fake_llm_server, "random", Random)
+    base_url = fake_endpoint(latency=0.0, throttle_rate=0.5, capacity=1)
+    assert [_post(base_url) for _ in range(3)] == [429, 429, 429]
+    assert [_post(base_url) for _ in range(3)] == [200, 200, 200]
+
+
+def test_gateway_backs_off_and_completes_every_call_against_the_fake_endpoint(fake_endpoint):
+    gateway = LLMGateway(base_url=fake_endpoint(latency=0.05, capacity=2), max_retries=20)
+    client = gateway.client("gpt-4o-mini", 0)
+
+    def call(i):
+        return gateway.call("gpt-4o-mini", "bulk", lambda: client.invoke(f"request {i}"))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(call, range(12)))
+
+    assert all(result.content.startswith("fake response") for result in results)
+    metrics = gateway.metrics()
+    route = metrics["routes"]["gpt-4o-mini:bulk"]
+    assert route["requests"] == route["succeeded"] == 12 and route["failed"] == 0
+    assert route["throttled"] > 0  # The initial limit of 4 is above the endpoint's capacity of 2
+    assert metrics["limiter"]["in_flight"] == 0
+    assert run_planner.load_throughput()["gpt-4o-mini"]["calls"] == 12
+
+
+def test_gateway_does_not_retry_client_errors():
+    class BadRequest(Exception):
+        status_code = 400
+
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        raise BadRequest()
+
+    with pytest.raises(BadRequest):
+        LLMGateway(base_url=None).call("gpt-4o-mini", "default", fn)
+    assert len(attempts) == 1 and classify_error(BadRequest()) is None
+
+
+def test_limiter_grows_additively_and_halves_on_throttle():
+    limiter = AdaptiveLimiter(initial=4, minimum=1, maximum=8)
+    limiter.acquire()
+    limiter.release("success")
+    assert limiter.snapshot()["limit"] == 4.25
+    limiter.acquire()
+    limiter.release("throttled")
+    assert limiter.snapshot() == {"limit": 2.12, "in_flight": 0, "queued": 0}
@@ -0,0 +1,56 @@
+import pytest
+from utils import model_router
+from utils.model_router import choose_model, record_route_latency
+from utils.stats_store import StatsFile
+
+
+@pytest.fixture(autouse=True)
+def route_stats(tmp_path, monkeypatch):
+    stats = StatsFile(str(tmp_path / "route_stats.json"))
+    monkeypatch.setattr(model_router, "_route_stats", stats)
+    monkeypatch.setattr(model_router, "MODEL_ROUTING", True)
+    return stats
+
+
+def test_unrouted_steps_use_the_default_model():
+    model, decision = choose_model("no_such_step", 100, "gpt-4o")
+    assert model == "gpt-4o" and decision["reason"] == "unrouted"
+
+
+def test_preferred_model_wins_within_budget():
+    model, decision = choose_model("supplier_extraction", 1000, "gpt-4o-mini")
+    assert model == "gpt-4.1-nano" and decision["reason"] == "within budget"
+
+
+def test_fastest_fitting_model_is_the_fallback_when_over_budget():
+    model, decision = choose_model("contract_generation", 1000, "gpt-4o", latency_budget_s=1)
+    assert model == "gpt-4o-mini" and decision["reason"] == "fallback: budget exceeded"
+
+
+def test_deadline_tightens_the_budget():
+    model, decision = choose_model("contract_generation", 1000, "gpt-4o", deadline_s=70)
+    assert model == "gpt-4o-mini" and decision["reason"] == "within deadline"
+
+
+def test_context_window_overflow_skips_the_model():
+    model, decision = choose_model("contract_review", 127_500, "gpt-4o", output_tokens=1000)
+    assert decision["reason"] == "fallback: context window exceeded"
+
+
+def test_measured_route_latency_overrides_the_profile(route_stats):
+    # gpt-4o measured much faster than its profile: it now fits a budget the profile would not
+    for _ in range(3):
+        record_route_latency("contract_generation", "gpt-4o", 1000, 5000, 10.0)
+    model, decision = choose_model("contract_generation", 1000, "gpt-4o", latency_budget_s=20)
+    assert model == "gpt-4o" and decision["estimated_latency_s"] == pytest.approx(10.0)
+
+
+def test_route_stats_are_flushed_and_merged(route_stats, tmp_path):
+    record_route_latency("pricing_risk", "gpt-4o-mini", 10, 100, 2.0)
+    record_route_latency("pricing_risk", "gpt-4o-mini", 10, 100, 4.0)
+    route_stats.flush()
+    other_process = StatsFile(route_stats.path)
+    other_process.add("pricing_risk:gpt-4o-mini", calls=1, latency_s=1.0, max_latency_s=1.0)
+    other_process.flush()
+    entry = StatsFile(route_stats.path).snapshot()["pricing_risk:gpt-4o-mini"]
+    assert entry["calls"] == 3 and entry["latency_s"] == pytest.approx(7.0)
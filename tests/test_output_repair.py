@@ -0,0 +1,69 @@
+import pytest
+from langchain.output_parsers import ResponseSchema, StructuredOutputParser
+from langchain_core.messages import AIMessage
+from utils.output_repair import OutputTruncatedError, RepairingOutputParser, repair_json
+
+
+def test_repair_json_ignores_fences_and_surrounding_prose():
+    text = 'Here you go:\n```json\n{"verdict": "Acceptable", "notes": "ok"}\n```\nThanks!'
+    assert repair_json(text, ["verdict", "notes"]) == {"verdict": "Acceptable", "notes": "ok"}
+
+
+def test_repair_json_escapes_raw_newlines_and_stray_quotes():
+    text = '{"contract": "Line one\nThe "Supplier" agrees", "summary": "x"}'
+    assert repair_json(text, ["contract", "summary"]) == {"contract": 'Line one\nThe "Supplier" agrees', "summary": "x"}
+
+
+def test_repair_json_drops_trailing_commas():
+    assert repair_json('{"items": [1, 2,], "total": 3,}', ["items", "total"]) == {"items": [1, 2], "total": 3}
+
+
+def test_repair_json_requires_every_key():
+    assert repair_json('{"verdict": "Acceptable"}', ["verdict", "notes"]) is None
+
+
+def test_repair_json_closes_unterminated_object_only_when_not_truncated():
+    text = '{"contract": "The full text'
+    assert repair_json(text, ["contract"]) == {"contract": "The full text"}
+    assert repair_json(text, ["contract"], truncated=True) is None
+
+
+def test_repair_json_closes_an_object_cut_after_a_complete_value_without_adding_a_quote():
+    assert repair_json('{"a": "x"', ["a"]) == {"a": "x"}
+    assert repair_json('{"a": "x", "b": 3', ["a", "b"]) == {"a": "x", "b": 3}
+    assert repair_json('{"a": "x", "b": "cut', ["a", "b"]) == {"a": "x", "b": "cut"}
+
+
+def test_repair_json_takes_markdown_document_but_not_prose_for_single_field():
+    assert repair_json("```markdown\n# Contract\nBody\n```", ["contract"]) == {"contract": "# Contract\nBody"}
+    assert repair_json("# Contract\nBody", ["contract"]) == {"contract": "# Contract\nBody"}
+    assert repair_json("Sorry, I cannot help with that.", ["contract"]) is None
+
+
+def _parser(fix_llm=None):
+    schema = StructuredOutputParser.from_response_schemas([ResponseSchema(name="contract", description="The contract")])
+    return RepairingOutputParser(schema, "test_contract", fix_llm)
+
+
+def test_parser_raises_truncated_error_at_the_token_limit():
+    message = AIMessage(content='{"contract": "cut off mid', response_metadata={"finish_reason": "length"})
+    with pytest.raises(OutputTruncatedError):
+        _parser().invoke(message)
+
+
+def test_parser_does_not_send_prose_to_the_fix_model():
+    class FixLLM:
+        calls = 0
+
+        def invoke(self, prompt):
+            FixLLM.calls += 1
+            return AIMessage(content='{"contract": "invented"}')
+
+    with pytest.raises(Exception):
+        _parser(FixLLM()).invoke(AIMessage(content="Sorry, I cannot help with that."))
+    assert FixLLM.calls == 0
+
+
+def test_parser_accepts_a_complete_object_at_the_token_limit():
+    message = AIMessage(content='{"contract": "done"}', response_metadata={"finish_reason": "length"})
+    assert _parser().invoke(message) == {"contract": "done"}
@@ -0,0 +1,25 @@
+import os
+from utils.profiling import disable_profiling, enable_profiling, memory_snapshot, profile_node
+
+
+def test_each_node_run_keeps_its_own_artifacts(tmp_path):
+    def review(state):
+        with memory_snapshot("llm"):
+            sum(range(1000))
+        return state
+
+    node = profile_node("ContractReview", review)
+    run_dir = enable_profiling(str(tmp_path))
+    try:
+        node({})
+        node({})
+    finally:
+        disable_profiling()
+    files = set(os.listdir(run_dir))
+    for run in (1, 2):
+        for suffix in ("prof", "pstats.txt", "collapsed", "llm.tracemalloc.txt"):
+            assert f"ContractReview.{run}.{suffix}" in files
+
+
+def test_node_runs_unprofiled_when_disabled():
+    assert profile_node("Node", lambda state: state | {"done": True})({}) == {"done": True}
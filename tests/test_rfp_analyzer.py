@@ -0,0 +1,59 @@
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+try:
+    from tools import rfp_analyzer
+except Exception as error:  # Prompts are token-counted at import, which needs tiktoken's encoding files
+    pytest.skip(f"tools.rfp_analyzer cannot be imported here: {error}", allow_module_level=True)
+
+
+def test_score_rows_are_matched_by_normalised_name_then_position():
+    rows = [
+        {"supplier": "**Beta Cloud**", "overall": "8"},
+        {"supplier": "Acme corp.", "overall": 12},
+        {"supplier": "Gamma", "overall": "n/a"},
+    ]
+    scores = rfp_analyzer._coerce_scores(rows, ["Acme Corp", "Beta Cloud", "Delta"])
+    assert scores["Beta Cloud"]["overall"] == 8.0
+    assert scores["Acme Corp"]["overall"] == 10.0  # Clamped to [0, 10]
+    assert scores["Delta"]["overall"] is None  # The unmatched row takes the one unclaimed supplier
+    assert rfp_analyzer._coerce_scores("not a list", ["Acme"]) == {}
+
+
+class FakeBatch:
+    def __init__(self, fail_when):
+        self.fail_when = fail_when
+        self.calls = 0
+
+    def batch(self, inputs, config=None, return_exceptions=False):
+        assert return_exceptions
+        self.calls += 1
+        return [RuntimeError("model error") if self.fail_when(item) else self.answer(item) for item in inputs]
+
+
+class FakeGroups(FakeBatch):
+    def answer(self, item):
+        suppliers = [line[3:] for line in item["profiles"].splitlines() if line.startswith("## ")]
+        return {"summary": f"summary of {', '.join(suppliers)}", "scores": [{"supplier": s, "overall": 7} for s in suppliers]}
+
+
+class FakeMerges(FakeBatch):
+    def answer(self, item):
+        return AIMessage(content=f"merged({item['summaries'].count('summary of')})")
+
+
+def test_failed_groups_and_merges_fall_back_to_their_inputs(monkeypatch):
+    reports = []
+    monkeypatch.setattr(rfp_analyzer, "group_comparison_chain", FakeGroups(lambda item: "## S2\n" in item["profiles"]))
+    merges = FakeMerges(lambda item: "summary of S0" in item["summaries"])
+    monkeypatch.setattr(rfp_analyzer, "summary_merge_chain", merges)
+    monkeypatch.setattr(rfp_analyzer, "llm", RunnableLambda(lambda prompt: reports.append(prompt.to_string()) or AIMessage(content="report")))
+
+    suppliers = {f"S{i}": f"profile {i}" for i in range(8)}
+    assert rfp_analyzer.generate_hierarchical_comparison_report(suppliers, group_size=2) == "report"
+    comparison = reports[0]
+    assert merges.calls == 1
+    assert "summary of S0, S1\n\n---\n\n## S2\nprofile 2" in comparison  # Failed merge: its inputs, concatenated
+    assert "merged(2)" in comparison
+    assert "| S2 | " in comparison and "| S0 | " in comparison
@@ -0,0 +1,92 @@
+import threading
+import pytest
+from utils import run_planner
+from utils.output_utils import load_markdown, save_markdown
+from utils.run_planner import (
+    dry_run, dry_run_step, format_plan, is_dry_run, outputs_suppressed, plan_summary, project_call, stub_response,
+    suppress_outputs, suppressible_outputs,
+)
+from utils.stats_store import StatsFile
+
+FORMAT_INSTRUCTIONS = '''```json
+{
+	"final_verdict": string  // Acceptable or not
+	"key_deviations": list  // Deviations found
+}
+```'''
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(run_planner, "_throughput", StatsFile(str(tmp_path / "throughput.json")))
+
+
+def test_stub_response_satisfies_the_format_instructions():
+    assert stub_response("plain prompt") == run_planner.STUB_TEXT
+    assert '"key_deviations": []' in stub_response(f"Review this.\n{FORMAT_INSTRUCTIONS}")
+
+
+def test_dry_run_is_scoped_to_its_context():
+    seen_elsewhere = []
+    with dry_run():
+        assert is_dry_run() and outputs_suppressed()
+        other = threading.Thread(target=lambda: seen_elsewhere.append(is_dry_run()))
+        other.start()
+        other.join()
+    assert seen_elsewhere == [False] and not is_dry_run()
+
+
+def test_suppression_is_shared_with_the_runs_threads_only():
+    seen = {}
+    with suppressible_outputs():
+        suppress_outputs(True)
+        barrier = threading.Barrier(2)
+
+        def other_run():
+            barrier.wait()
+            seen["other run"] = outputs_suppressed()
+
+        other = threading.Thread(target=other_run)
+        other.start()
+        barrier.wait()
+        other.join()
+        assert outputs_suppressed()
+    assert seen == {"other run": False} and not outputs_suppressed()
+    with pytest.raises(RuntimeError):
+        suppress_outputs(True)
+
+
+def test_dry_run_stages_outputs_for_later_steps_and_reports_stale_inputs(tmp_path):
+    with dry_run() as plan:
+        with dry_run_step("Charter"):
+            save_markdown("planned charter", "3.negotiation_charter.md")
+        with dry_run_step("Emails"):
+            assert load_markdown("3.negotiation_charter.md") == "planned charter"
+            assert load_markdown("2.pricing_risk_analysis.md") is None
+    assert not (tmp_path / "outputs" / "3.negotiation_charter.md").exists()
+    assert plan["stale_inputs"] == {"Emails": ["2.pricing_risk_analysis.md"]}
+
+
+def test_plan_summary_projects_cost_and_flags_overflows():
+    plan = {
+        "calls": [
+            {"step": "Review", "model": "gpt-4o-mini", "prompt_tokens": 1000, "max_tokens": 500},
+            {"step": "Review", "model": "gpt-3.5-turbo", "prompt_tokens": 16_000, "max_tokens": 1000},
+        ],
+        "outputs": {}, "stale_inputs": {"Emails": ["3.negotiation_charter.md"]},
+    }
+    summary = plan_summary(plan, {"Charter": "ValueError: no proposals"})
+    assert summary["total_calls"] == 2 and summary["throughput_source"] == "defaults"
+    assert summary["steps"]["Review"]["overflows"] == 1
+    assert summary["total_cost_usd"] == round(project_call("gpt-4o-mini", 1000, 500)["projected_cost_usd"]
+                                              + project_call("gpt-3.5-turbo", 16_000, 1000)["projected_cost_usd"], 4)
+    report = format_plan(summary)
+    assert "| Charter | - |" in report and "not planned: ValueError: no proposals" in report
+    assert "**Emails** read 3.negotiation_charter.md" in report
+
+
+def test_recorded_throughput_drives_latency_projections():
+    run_planner.record_throughput("gpt-4o", 1000, 200, 4.0)
+    projection = project_call("gpt-4o", 1000, 100, run_planner.load_throughput())
+    assert projection["projected_latency_s"] == 2.0
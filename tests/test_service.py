@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+import pytest
+import service
+from utils import artifact_store
+from utils.artifact_store import start_run
+from utils.output_utils import save_markdown
+
+
+@pytest.fixture
+def workflow_service(tmp_path):
+    return service.WorkflowService(str(tmp_path / "jobs.sqlite3"))
+
+
+@pytest.fixture
+def api(workflow_service):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), service.make_handler(workflow_service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def request(method, path, body=None):
+        data = body.encode() if isinstance(body, str) else None if body is None else json.dumps(body).encode()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(base_url + path, data=data, method=method)) as response:
+                return response.status, response.read().decode()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read().decode()
+
+    yield request
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("body", ["[1, 2]", "not json", {"workflow": "unknown"}, {"config": [1]}, {"input_files": "x.pdf"}])
+def test_invalid_requests_are_rejected(api, body):
+    status, reply = api("POST", "/runs", body)
+    assert status == 400 and "error" in json.loads(reply)
+
+
+def test_submitted_job_runs_on_a_worker(api, workflow_service, monkeypatch):
+    done = threading.Event()
+
+    def run_job(job):
+        done.set()
+        return {"steps": {"ProposalProcessor": "completed"}, "config": job["payload"]["config"]}
+
+    monkeypatch.setattr(service, "run_job", run_job)
+    status, reply = api("POST", "/runs", {"workflow": "procurement", "config": {"deadline_s": 60}})
+    assert status == 202
+    job_id = json.loads(reply)["job_id"]
+    workflow_service.start()
+    assert done.wait(10)
+    for _ in range(100):
+        job = workflow_service.queue.get(job_id)
+        if job["status"] == "succeeded":
+            break
+        time.sleep(0.05)
+    assert job["result"] == {"steps": {"ProposalProcessor": "completed"}, "config": {"deadline_s": 60}}
+    status, reply = api("GET", f"/runs/{job_id}")
+    assert status == 200 and json.loads(reply)["status"] == "succeeded"
+    assert api("GET", "/runs/0123abcd")[0] == 404
+
+
+def test_artifacts_are_served_as_each_job_saved_them(api, workflow_service, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(artifact_store, "_store", None)
+    job_ids = []
+    for contract in ("contract of job 1", "contract of job 2"):
+        job_id = workflow_service.queue.enqueue("procurement", {})
+        start_run(job_id)  # As the worker does
+        save_markdown(contract, "6.final_contract.md")
+        workflow_service.queue.complete(job_id, {"output_files": {"ContractGeneration": "./outputs/6.final_contract.md"}})
+        job_ids.append(job_id)
+
+    assert api("GET", f"/runs/{job_ids[0]}/artifacts/ContractGeneration") == (200, "contract of job 1")
+    assert api("GET", f"/runs/{job_ids[0]}/artifacts/6.final_contract.md") == (200, "contract of job 1")
+    assert api("GET", f"/runs/{job_ids[1]}/artifacts/ContractGeneration") == (200, "contract of job 2")
+    status, reply = api("GET", f"/runs/{job_ids[0]}/artifacts")
+    assert status == 200 and json.loads(reply)["archived"] == ["6.final_contract.md"]
+    assert api("GET", f"/runs/{job_ids[0]}/artifacts/7.contract_review.md")[0] == 404
+
+
+def test_more_than_one_worker_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        service.WorkflowService(str(tmp_path / "jobs.sqlite3"), workers=2)
@@ -0,0 +1,39 @@
+import pytest
+from utils.supplier_scoring import coerce_supplier_fields, score_suppliers, to_number
+
+
+def test_to_number_parses_llm_formatted_values():
+    assert to_number("$1,200/month") == 1200.0
+    assert to_number("99.95%") == 99.95
+    assert to_number("n/a") is None
+    assert to_number(True) is None
+
+
+def test_coerce_supplier_fields_splits_certification_strings():
+    fields = coerce_supplier_fields({"base_monthly_price": "$900", "certifications": "SOC 2; ISO 27001, SOC 2"})
+    assert fields["base_monthly_price"] == 900.0
+    assert fields["certifications"] == ["ISO 27001", "SOC 2"]
+    assert fields["setup_fee"] is None
+
+
+def test_score_suppliers_ranks_cheaper_and_more_reliable_first():
+    cheap = coerce_supplier_fields({"base_monthly_price": 500, "sla_uptime_pct": 99.99, "certifications": ["SOC 2"]})
+    pricey = coerce_supplier_fields({"base_monthly_price": 900, "sla_uptime_pct": 99.5})
+    ranked = score_suppliers({"Pricey": pricey, "Cheap": cheap})
+    assert [row["supplier"] for row in ranked] == ["Cheap", "Pricey"]
+    assert ranked[0]["rank"] == 1 and 0 <= ranked[1]["overall_score"] < ranked[0]["overall_score"] <= 10
+    assert ranked[0]["criterion_scores"]["base_monthly_price"] == 10.0
+
+
+def test_score_suppliers_gives_missing_values_a_neutral_score():
+    ranked = score_suppliers({
+        "A": coerce_supplier_fields({"base_monthly_price": 100}),
+        "B": coerce_supplier_fields({}),
+    }, weights={name: 0 for name in ("setup_fee", "discount_pct", "lock_in_months", "sla_uptime_pct",
+                                     "support_response_hours", "certification_count")})
+    scores = {row["supplier"]: row["overall_score"] for row in ranked}
+    assert scores == {"A": pytest.approx(10.0), "B": pytest.approx(5.0)}
+
+
+def test_score_suppliers_handles_empty_input():
+    assert score_suppliers({}) == []
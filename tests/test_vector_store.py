@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import numpy as np
+import pytest
+from utils.vector_store import NumpyVectorStore, matches_where
+
+
+def _vectors(*angles):
+    return [[np.cos(angle), np.sin(angle), 0.0] for angle in angles]
+
+
+@pytest.fixture(params=["float16", "int8"])
+def store(request, tmp_path):
+    return NumpyVectorStore(str(tmp_path / "index"), dtype=request.param)
+
+
+def test_query_ranks_by_cosine_distance_and_filters(store):
+    store.add(["a", "b", "c"], ["A", "B", "C"], _vectors(0.0, 0.5, 1.5),
+              [{"supplier": "Acme"}, {"supplier": "Beta"}, {"supplier": "Acme"}])
+    result = store.query(_vectors(0.1)[0], top_k=2)
+    assert result["ids"] == ["a", "b"]
+    assert result["distances"][0] == pytest.approx(1 - np.cos(0.1), abs=1e-2)
+    assert store.query(_vectors(0.5)[0], top_k=5, where={"supplier": "Acme"})["ids"] == ["a", "c"]
+    assert store.query(_vectors(0.0)[0], where={"supplier": "Nobody"})["ids"] == []
+
+
+def test_re_adding_an_id_replaces_it(store):
+    store.add(["a", "b"], ["old A", "B"], _vectors(0.0, 1.0), [{}, {}])
+    store.add(["a"], ["new A"], _vectors(1.5), [{}])
+    assert store.count() == 2
+    assert store.get()["documents"] == ["B", "new A"]
+    assert store.query(_vectors(1.5)[0], top_k=1)["documents"] == ["new A"]
+
+
+def test_segments_merge_and_survive_reopening(store, tmp_path):
+    for i in range(8):
+        store.add([f"d{i}"], [f"doc {i}"], _vectors(i / 10), [{"n": i}])
+    with open(os.path.join(store.path, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert [entry["rows"] for entry in manifest["segments"]] == [8]
+    assert sorted(name for name in os.listdir(store.path) if name.startswith("seg-")) == sorted(
+        f"{manifest['segments'][0]['name']}.{kind}"
+        for kind in ("embeddings.npy", "records.json") + (("scales.npy",) if store.dtype == "int8" else ()))
+
+    reopened = NumpyVectorStore(store.path, dtype=store.dtype)
+    assert reopened.count() == 8
+    assert reopened.query(_vectors(0.3)[0], top_k=1)["ids"] == ["d3"]
+
+
+def test_queries_during_adds_see_a_consistent_store(store):
+    store.add(["seed"], ["seed"], _vectors(0.0), [{}])
+    errors = []
+
+    def query():
+        for _ in range(200):
+            result = store.query(_vectors(0.0)[0], top_k=50)
+            if len(result["ids"]) != len(set(result["ids"])) or not np.all(np.isfinite(result["distances"])):
+                errors.append(result)
+
+    reader = threading.Thread(target=query)
+    reader.start()
+    for i in range(30):
+        store.add([f"d{i}"], [f"doc {i}"], _vectors(i / 30), [{}])
+    reader.join()
+    assert not errors
+    assert store.count() == 31
+
+
+def test_query_in_the_middle_of_an_add_sees_a_complete_snapshot(store, monkeypatch):
+    store.add(["a", "b"], ["A", "B"], _vectors(0.0, 1.0), [{}, {}])
+    seen = []
+    remove_unreferenced = store._remove_unreferenced
+
+    def query_then_remove(manifest):
+        seen.append(store.query(_vectors(0.0)[0], top_k=5))
+        remove_unreferenced(manifest)
+
+    monkeypatch.setattr(store, "_remove_unreferenced", query_then_remove)
+    store.add(["c"], ["C"], _vectors(0.2), [{}])
+    assert seen[0]["ids"] == ["a", "c", "b"]
+    assert all(0 <= distance <= 1.01 for distance in seen[0]["distances"])
+
+
+def test_matches_where_supports_in_and_boolean_clauses():
+    metadata = {"supplier": "Acme", "page": 2}
+    assert matches_where(metadata, {"supplier": {"$in": ["Acme", "Beta"]}})
+    assert matches_where(metadata, {"$and": [{"supplier": "Acme"}, {"page": {"$ne": 3}}]})
+    assert not matches_where(metadata, {"$or": [{"supplier": "Beta"}, {"page": 3}]})